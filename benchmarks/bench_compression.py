@@ -0,0 +1,40 @@
+"""Report the compression ratio and time of the codecs in ipyvolume.serialize.codecs for typical buffers.
+
+Usage: python benchmarks/bench_compression.py [number of points]   (default: 10 000 000)
+"""
+from __future__ import print_function, division
+
+import sys
+import time
+
+import numpy as np
+
+import ipyvolume.serialize as serialize
+
+
+def buffers(N):
+    # random positions (worst case), positions on a grid (best case), and the tiles of a 256^3 volume
+    yield "random xyz", np.random.random((3, N)).astype(np.float32)
+    n = int(round(N ** (1 / 3.0)))
+    yield "grid xyz", np.array(np.meshgrid(*[np.linspace(0, 1, n, dtype=np.float32)] * 3)).reshape(3, -1)
+    x, y, z = np.ogrid[-1:1:256j, -1:1:256j, -1:1:256j]
+    cube = np.exp(-(x ** 2 + y ** 2 + z ** 2) * 4)
+    yield "volume tiles", serialize._cube_to_tiles(cube, 0, 1)[0]
+    yield "volume intensity", serialize._cube_to_tiles(cube, 0, 1, intensity_only=True)[0]
+
+
+def main(N):
+    print("%-18s %-6s %10s %8s %10s %12s" % ("buffer", "codec", "size [MB]", "ratio", "time [s]", "speed [MB/s]"))
+    for name, ar in buffers(N):
+        data = memoryview(np.ascontiguousarray(ar)).cast('B')
+        size = data.nbytes / 1024.0 ** 2
+        for codec, compress in sorted(serialize.codecs.items()):
+            t0 = time.time()
+            compressed = compress(data)
+            duration = time.time() - t0
+            ratio = data.nbytes / len(compressed)
+            print("%-18s %-6s %10.1f %8.2f %10.3f %12.1f" % (name, codec, size, ratio, duration, size / duration))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10 * 1000 * 1000)
@@ -0,0 +1,44 @@
+"""Report the time ipyvolume.utils needs to project points, and to select points inside a lasso, circle and rectangle.
+
+Usage: python benchmarks/bench_selection.py [number of points]   (default: 10 000 000)
+"""
+from __future__ import print_function, division
+
+import sys
+import time
+
+import numpy as np
+
+import ipyvolume.utils as utils
+
+
+def selections():
+    # a wobbly lasso with many vertices (as drawn by hand), a circle and a rectangle, all in device coordinates
+    angle = np.linspace(0, 2 * np.pi, 300, endpoint=False)
+    radius = 0.6 + 0.2 * np.sin(angle * 7)
+    lasso = np.array([radius * np.cos(angle), radius * np.sin(angle)]).T.tolist()
+    yield "lasso (300)", lambda x, y: utils.points_in_polygon(x, y, lasso)
+    yield "circle", lambda x, y: utils.points_in_circle(x, y, (0.1, -0.1), 0.5)
+    yield "rectangle", lambda x, y: utils.points_in_rectangle(x, y, -0.5, 0.3, -0.2, 0.7)
+
+
+def main(N):
+    x, y = (np.random.random((2, N)) * 2 - 1).astype(np.float32)
+    print("%-14s %10s %10s %14s" % ("selection", "selected", "time [s]", "speed [Mpts/s]"))
+    # a perspective projection, with the camera at z=3
+    world = [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, -3, 1]
+    projection = [1.5, 0, 0, 0, 0, 2, 0, 0, 0, 0, -1.1, -1, 0, 0, -2.1, 0]
+    matrix = utils.projection_matrix(world, projection)
+    t0 = time.time()
+    xy, depth, in_frustum = utils.project_points(matrix, x, y, y)
+    duration = time.time() - t0
+    print("%-14s %10d %10.3f %14.1f" % ("projection", np.sum(in_frustum), duration, N / duration / 1e6))
+    for name, inside in selections():
+        t0 = time.time()
+        mask = inside(x, y)
+        duration = time.time() - t0
+        print("%-14s %10d %10.3f %14.1f" % (name, np.sum(mask), duration, N / duration / 1e6))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10 * 1000 * 1000)
@@ -0,0 +1,78 @@
+"""Compare the volume tiling of ipyvolume.serialize against the original loop based implementation.
+
+Usage: python benchmarks/bench_tiles.py [size ...]   (default sizes: 128 256 512, 1024 needs > 30GB of RAM)
+"""
+from __future__ import print_function, division
+
+import sys
+import time
+import math
+
+import numpy as np
+
+import ipyvolume.serialize as serialize
+
+
+def _cube_to_tiles_loop(grid, vmin, vmax):
+    slices = grid.shape[0]
+    rows, columns, image_width, image_height = serialize._compute_tile_size(grid.shape)
+    image_height = rows * grid.shape[1]
+    data = np.zeros((image_height, image_width, 4), dtype=np.uint8)
+    grid_normalized = (grid * 1.0 - vmin) / (vmax - vmin)
+    grid_normalized[~np.isfinite(grid_normalized)] = 0
+    gradient = np.gradient(grid_normalized)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gradient = gradient / np.sqrt(gradient[0] ** 2 + gradient[1] ** 2 + gradient[2] ** 2)
+    for y2d in range(rows):
+        for x2d in range(columns):
+            zindex = x2d + y2d * columns
+            if zindex < slices:
+                Im = grid_normalized[zindex]
+                subdata = data[y2d * Im.shape[0] : (y2d + 1) * Im.shape[0], x2d * Im.shape[1] : (x2d + 1) * Im.shape[1]]
+                subdata[..., 3] = (Im * 255).astype(np.uint8)
+                for i in range(3):
+                    subdata[..., i] = ((gradient[i][zindex] / 2.0 + 0.5) * 255).astype(np.uint8)
+    return data
+
+
+def _tile_volume_loop(vol, tex_size, tile_shape, vol_size):
+    tex = np.zeros(tex_size, dtype=vol.dtype)
+    for tileY in range(tile_shape[1]):
+        for tileX in range(tile_shape[0]):
+            z = tileX + tileY * tile_shape[0]
+            if z >= vol_size[2]:
+                break
+            xoffset = tileX * vol_size[0]
+            yoffset = tileY * vol_size[1]
+            tex[yoffset : yoffset + vol_size[1], xoffset : xoffset + vol_size[0]] = vol[z]
+    return serialize.array_to_binary(tex)
+
+
+def timed(f, *args):
+    t0 = time.time()
+    result = f(*args)
+    return time.time() - t0, result
+
+
+def main(sizes):
+    print("%6s %-12s %10s %10s %8s %s" % ("size", "function", "loop [s]", "new [s]", "speedup", "identical"))
+    for size in sizes:
+        cube = np.random.random((size, size, size)).astype(np.float32)
+        t_old, old = timed(_cube_to_tiles_loop, cube, 0.1, 0.9)
+        t_new, (new, _, _, _, _) = timed(serialize._cube_to_tiles, cube, 0.1, 0.9)
+        identical = old.tobytes() == new.tobytes()
+        print("%6d %-12s %10.3f %10.3f %8.1f %s" % (size, "cube_to_tiles", t_old, t_new, t_old / t_new, identical))
+        del old, new
+
+        vol_shape = cube.shape[::-1]
+        a = math.sqrt(float(vol_shape[2]) / (float(vol_shape[0] * vol_shape[1])))
+        tile_shape = [int(math.ceil(vol_shape[1] * a)), int(math.ceil(vol_shape[0] * a))]
+        tex_size = [vol_shape[1] * tile_shape[1], vol_shape[0] * tile_shape[0]]
+        t_old, old = timed(_tile_volume_loop, cube, tex_size, tile_shape, vol_shape)
+        t_new, new = timed(serialize.tile_volume, cube, tex_size, tile_shape, vol_shape)
+        identical = old['data'].tobytes() == new['data'].tobytes()
+        print("%6d %-12s %10.3f %10.3f %8.1f %s" % (size, "tile_volume", t_old, t_new, t_old / t_new, identical))
+
+
+if __name__ == '__main__':
+    main([int(k) for k in sys.argv[1:]] or [128, 256, 512])
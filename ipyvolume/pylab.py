@@ -57,16 +57,14 @@ except:
 import six
 import numpy as np
 import PIL.Image
+import matplotlib.colors
 import matplotlib.style
 
-try:
-    import shapely.geometry
-except:
-    shapely = None
 try:
     import skimage.measure
 except:
     skimage = None
+import bqplot
 import ipywidgets
 import traitlets
 import IPython
@@ -92,12 +90,19 @@ _seq_snm = "If an (S, N, M) array, the first dimension will be used for frames i
 _doc_snippets = {}
 _doc_snippets["color"] = (
     "color for each point/vertex/symbol, can be string format, examples for red:'red', '#f00',"
-    "'#ff0000' or'rgb(1,0,0), or rgb array of shape (N, 3 or 4) or (S, N, 3 or 4)"
+    "'#ff0000' or'rgb(1,0,0), or rgb array of shape (N, 3 or 4) or (S, N, 3 or 4), with values between 0 and 1, or "
+    "between 0 and 255 for uint8 arrays"
 )
 _doc_snippets[
     "color2d"
 ] = "color for each point/vertex string format, examples for red:'red', '#f00', '#ff0000' or 'rgb(1,0,0), or rgb"
 " array of shape (2, N, 3 or 4) or (S, 2, N, 3 or 4)"
+_doc_snippets["colormap"] = (
+    "name of a matplotlib colormap (or a Colormap instance), when given, color should be a scalar for each "
+    "point/vertex of shape (N,) or (S, N), which is mapped to a color on the GPU"
+)
+_doc_snippets["vmin"] = "value mapped to the lowest color of the colormap, defaults to the minimum of color"
+_doc_snippets["vmax"] = "value mapped to the highest color of the colormap, defaults to the maximum of color"
 _doc_snippets[
     "size"
 ] = "float representing the size of the glyph in percentage of the viewport, where 100 is the full size of the viewport"
@@ -260,6 +265,22 @@ def _grow_limits(x, y, z):
     zlim(*_grow_limit(fig.zlim, z))
 
 
+def _color_scale(colormap, color, vmin=None, vmax=None, samples=32):
+    """Create a ColorScale from a matplotlib colormap, such that the colors are mapped in the shader.
+
+    Only the scalars (color) are send to the frontend once, changing the colors, min or max of the scale afterwards
+    only syncs a few values.
+    """
+    if isinstance(colormap, six.string_types):
+        colormap = matplotlib.colormaps[colormap]
+    colors = [matplotlib.colors.to_hex(rgba) for rgba in colormap(np.linspace(0, 1, samples))]
+    if vmin is None or vmax is None:
+        data_min, data_max = utils.nanminmax(np.asarray(color, dtype=np.float64))
+        vmin = float(data_min) if vmin is None else vmin
+        vmax = float(data_max) if vmax is None else vmax
+    return bqplot.ColorScale(colors=colors, min=vmin, max=vmax)
+
+
 def xlim(xmin, xmax):
     """Set limits of x axis."""
     fig = gcf()
@@ -309,7 +330,10 @@ default_size_selected = default_size * 1.3
 
 
 @_docsubst
-def plot_trisurf(x, y, z, triangles=None, lines=None, color=default_color, u=None, v=None, texture=None):
+def plot_trisurf(
+    x, y, z, triangles=None, lines=None, color=default_color, u=None, v=None, texture=None, colormap=None, vmin=None,
+    vmax=None
+):
     """Draw a polygon/triangle mesh defined by a coordinate and triangle indices.
 
     The following example plots a rectangle in the z==2 plane, consisting of 2 triangles:
@@ -337,14 +361,30 @@ def plot_trisurf(x, y, z, triangles=None, lines=None, color=default_color, u=Non
     :param u: {u}
     :param v: {v}
     :param texture: {texture}
+    :param colormap: {colormap}
+    :param vmin: {vmin}
+    :param vmax: {vmax}
     :return: :any:`Mesh`
     """
     fig = gcf()
+    color_scale = None if colormap is None else _color_scale(colormap, color, vmin, vmax)
     if triangles is not None:
         triangles = np.array(triangles).astype(dtype=np.uint32)
     if lines is not None:
         lines = np.array(lines).astype(dtype=np.uint32)
-    mesh = ipv.Mesh(x=x, y=y, z=z, triangles=triangles, lines=lines, color=color, u=u, v=v, texture=texture)
+    mesh = ipv.Mesh(
+        figure=fig,
+        x=x,
+        y=y,
+        z=z,
+        triangles=triangles,
+        lines=lines,
+        color=color,
+        color_scale=color_scale,
+        u=u,
+        v=v,
+        texture=texture,
+    )
     _grow_limits(np.array(x).reshape(-1), np.array(y).reshape(-1), np.array(z).reshape(-1))
     fig.meshes = fig.meshes + [mesh]
     return mesh
@@ -382,8 +422,22 @@ def plot_wireframe(x, y, z, color=default_color, wrapx=False, wrapy=False):
     return plot_mesh(x, y, z, color=color, wrapx=wrapx, wrapy=wrapy, wireframe=True, surface=False)
 
 
+@_docsubst
 def plot_mesh(
-    x, y, z, color=default_color, wireframe=True, surface=True, wrapx=False, wrapy=False, u=None, v=None, texture=None
+    x,
+    y,
+    z,
+    color=default_color,
+    wireframe=True,
+    surface=True,
+    wrapx=False,
+    wrapy=False,
+    u=None,
+    v=None,
+    texture=None,
+    colormap=None,
+    vmin=None,
+    vmax=None,
 ):
     """Draws a 2d wireframe+surface in 3d: generalization of :any:`plot_wireframe` and :any:`plot_surface`.
 
@@ -398,9 +452,13 @@ def plot_mesh(
     :param u: {u}
     :param v: {v}
     :param texture: {texture}
+    :param colormap: {colormap}, for plot_mesh of shape (N, M) or (S, N, M)
+    :param vmin: {vmin}
+    :param vmax: {vmax}
     :return: :any:`Mesh`
     """
     fig = gcf()
+    color_scale = None if colormap is None else _color_scale(colormap, color, vmin, vmax)
 
     # assert len(x.shape) == 2
     # assert len(y.shape) == 2
@@ -456,17 +514,21 @@ def plot_mesh(
         else:
             return ar.reshape(-1, ar.shape[-1])
 
-    if isinstance(color, np.ndarray):
+    if colormap is not None:  # scalars, like the positions
+        color = reshape(np.asarray(color))
+    elif isinstance(color, np.ndarray):
         color = reshape_color(color)
 
     _grow_limits(np.array(x).reshape(-1), np.array(y).reshape(-1), np.array(z).reshape(-1))
     triangles, lines = _make_triangles_lines((nx, ny), wrapx, wrapy)
     mesh = ipv.Mesh(
+        figure=fig,
         x=x,
         y=y,
         z=z,
         triangles=triangles if surface else None,
         color=color,
+        color_scale=color_scale,
         lines=lines if wireframe else None,
         u=u,
         v=v,
@@ -493,7 +555,7 @@ def plot(x, y, z, color=default_color, **kwargs):
         visible_lines=True, color_selected=None, size_selected=1, size=1, connected=True, visible_markers=False
     )
     kwargs = dict(defaults, **kwargs)
-    s = ipv.Scatter(x=x, y=y, z=z, color=color, **kwargs)
+    s = ipv.Scatter(x=x, y=y, z=z, color=color, figure=fig, **kwargs)
     s.material.visible = False
     fig.scatters = fig.scatters + [s]
     return s
@@ -511,6 +573,9 @@ def scatter(
     marker="diamond",
     selection=None,
     grow_limits=True,
+    colormap=None,
+    vmin=None,
+    vmax=None,
     **kwargs
 ):
     """Plot many markers/symbols in 3d.
@@ -523,15 +588,21 @@ def scatter(
     :param size_selected: like size, but for selected glyphs
     :param color_selected:  like color, but for selected glyphs
     :param marker: {marker}
-    :param selection: numpy array of shape (N,) or (S, N) with indices of x,y,z arrays of the selected markers, which
-                      can have a different size and color
+    :param selection: :any:`ipyvolume.utils.Bitset`, or numpy array of shape (N,) or (S, N) with indices of x,y,z arrays
+                      of the selected markers, which can have a different size and color
+    :param colormap: {colormap}
+    :param vmin: {vmin}
+    :param vmax: {vmax}
     :param kwargs:
     :return: :any:`Scatter`
     """
     fig = gcf()
     if grow_limits:
         _grow_limits(x, y, z)
+    if colormap is not None:
+        kwargs['color_scale'] = _color_scale(colormap, color, vmin, vmax)
     s = ipv.Scatter(
+        figure=fig,
         x=x,
         y=y,
         z=z,
@@ -540,7 +611,7 @@ def scatter(
         color_selected=color_selected,
         size_selected=size_selected,
         geo=marker,
-        selection=selection,
+        selected=selection,
         **kwargs
     )
     fig.scatters = fig.scatters + [s]
@@ -583,6 +654,7 @@ def quiver(
     if 'vx' in kwargs or 'vy' in kwargs or 'vz' in kwargs:
         raise KeyError('Please use u, v, w instead of vx, vy, vz')
     s = ipv.Scatter(
+        figure=fig,
         x=x,
         y=y,
         z=z,
@@ -617,8 +689,8 @@ def animate_glyphs(*args, **kwargs):
 def animation_control(object, sequence_length=None, add=True, interval=200):
     """Animate scatter, quiver or mesh by adding a slider and play button.
 
-    :param object: :any:`Scatter` or :any:`Mesh` object (having an sequence_index property), or a list of these to
-                   control multiple.
+    :param object: :any:`Scatter`, :any:`Mesh` or :any:`Volume` object (having an sequence_index property), or a list
+                   of these to control multiple.
     :param sequence_length: If sequence_length is None we try try our best to figure out, in case we do it badly,
             you can tell us what it should be. Should be equal to the S in the shape of the numpy arrays as for instance
             documented in :any:`scatter` or :any:`plot_mesh`.
@@ -637,6 +709,12 @@ def animation_control(object, sequence_length=None, add=True, interval=200):
         sequence_lengths = []
         for object in objects:
             sequence_lengths_previous = list(sequence_lengths)
+            if isinstance(object, ipv.Volume):
+                if object.data_original is not None and len(object.data_original.shape) == 4:
+                    sequence_lengths.append(object.data_original.shape[0])
+                else:
+                    raise ValueError('no frame dimension found for object: {}'.format(object))
+                continue
             values = [getattr(object, name) for name in "x y z aux vx vy vz".split() if hasattr(object, name)]
             values = [k for k in values if k is not None]
             # sort them such that the higest dim is first
@@ -726,7 +804,7 @@ def plot_isosurface(data, level=None, color=default_color, wireframe=True, surfa
     """Plot a surface at constant value (like a 2d contour).
 
     :param data: 3d numpy array
-    :param float level: value where the surface should lie
+    :param float level: value where the surface should lie, if None, the (approximate) median of the data
     :param color: color of the surface, although it can be an array, the length is difficult to predict beforehand,
                   if per vertex color are needed, it is better to set them on the returned mesh afterwards.
     :param bool wireframe: draw lines between the vertices
@@ -737,7 +815,7 @@ def plot_isosurface(data, level=None, color=default_color, wireframe=True, surfa
     :return: :any:`Mesh`
     """
     if level is None:
-        level = np.median(data)
+        level = utils.statistics(data).median()
     if hasattr(skimage.measure, 'marching_cubes_lewiner'):
         values = skimage.measure.marching_cubes_lewiner(data, level)
     else:
@@ -757,7 +835,8 @@ def plot_isosurface(data, level=None, color=default_color, wireframe=True, surfa
 
     mesh = plot_trisurf(x, y, z, triangles=triangles, color=color)
     if controls:
-        vmin, vmax = np.percentile(data, 1), np.percentile(data, 99)
+        stats = utils.statistics(data)  # cached, so computed once when it also gave the level
+        vmin, vmax = stats.quantile(0.01), stats.quantile(0.99)
         step = (vmax - vmin) / 250
         level_slider = ipywidgets.FloatSlider(value=level, min=vmin, max=vmax, step=step, icon='eye')
         recompute_button = ipywidgets.Button(description='update')
@@ -806,18 +885,23 @@ def volshow(
     max_opacity=0.2,
     memorder='C',
     extent=None,
+    pyramid=False,
+    brick_size=None,
 ):
     """Visualize a 3d array using volume rendering.
 
     Currently only 1 volume can be rendered.
 
 
-    :param data: 3d numpy array
+    :param data: 3d numpy array (or an array-like such as a h5py or zarr dataset, that will be read in chunks),
+                 or 4d for a time series, of which only the frame at sequence_index (and a few frames
+                 ahead) are sent to the frontend, see :any:`animation_control`
     :param origin: origin of the volume data, this is to match meshes which have a different origin
     :param domain_size: domain size is the size of the volume
     :param bool lighting: use lighting or not, if set to false, lighting parameters will be overriden
-    :param float data_min: minimum value to consider for data, if None, computed using np.nanmin
-    :param float data_max: maximum value to consider for data, if None, computed using np.nanmax
+    :param float data_min: minimum value to consider for data, if None, computed from the data (in chunks, and cached),
+                           see :any:`ipyvolume.utils.statistics`
+    :param float data_max: maximum value to consider for data, if None, computed like data_min
     :parap int max_shape: maximum shape for the 3d cube, if larger, the data is reduced by skipping/slicing (data[::N]),
                           set to None to disable.
     :param tf: transfer function (or a default one)
@@ -828,33 +912,42 @@ def volshow(
     :param specular_exponent: lighting parameter
     :param float downscale: downscale the rendering for better performance, for instance when set to 2, a 512x512
                             canvas will show a 256x256 rendering upscaled, but it will render twice as fast.
-    :param level: level(s) for the where the opacity in the volume peaks, maximum sequence of length 3
+    :param level: level(s) for the where the opacity in the volume peaks, maximum sequence of length 3, if None,
+                  the 10%, 50% and 90% quantiles of the data are used
     :param opacity: opacity(ies) for each level, scalar or sequence of max length 3
     :param level_width: width of the (gaussian) bumps where the opacity peaks, scalar or sequence of max length 3
     :param bool controls: add controls for lighting and transfer function or not
     :param float max_opacity: maximum opacity for transfer function controls
     :param extent: list of [[xmin, xmax], [ymin, ymax], [zmin, zmax]] values that define the bounds of the volume,
                    otherwise the viewport is used
+    :param bool pyramid: precompute downsampled versions of the data (1/2, 1/4, ...) once, which makes zooming into
+                         volumes larger than max_shape faster, at the cost of ~15% extra memory
+    :param int brick_size: if given, only send the bricks (cubes of this size) of the data with values above
+                           show_min, which saves bandwidth and texture memory for sparse data, see :any:`Volume`
     :return:
     """
     fig = gcf()
 
+    if data_min is None or data_max is None or level is None:
+        stats = utils.statistics(data)  # cached, and the histogram is only computed for the quantiles
+    if data_min is None or data_max is None:
+        data_min = stats.vmin if data_min is None else data_min
+        data_max = stats.vmax if data_max is None else data_max
+    if level is None:
+        level = [(stats.quantile(q) - data_min) / ((data_max - data_min) or 1) for q in [0.1, 0.5, 0.9]]
     if tf is None:
         tf = transfer_function(level, opacity, level_width, controls=controls, max_opacity=max_opacity)
-    if data_min is None:
-        data_min = np.nanmin(data)
-    if data_max is None:
-        data_max = np.nanmax(data)
     if memorder == 'F':
         data = data.T
 
     if extent is None:
-        extent = [(0, k) for k in data.shape[::-1]]
+        extent = [(0, k) for k in data.shape[-3:][::-1]]
 
     if extent:
         _grow_limits(*extent)
 
     vol = ipv.Volume(
+        figure=fig,
         data_original=data,
         tf=tf,
         data_min=data_min,
@@ -863,11 +956,13 @@ def volshow(
         show_max=data_max,
         extent_original=extent,
         data_max_shape=max_shape,
+        pyramid=pyramid,
+        brick_size=brick_size,
         ambient_coefficient=ambient_coefficient,
         diffuse_coefficient=diffuse_coefficient,
         specular_coefficient=specular_coefficient,
         specular_exponent=specular_exponent,
-        rendering_lighting=lighting,
+        lighting=lighting,
     )
 
     vol._listen_to(fig)
@@ -1375,6 +1470,9 @@ def selector_default(output_widget=None):
       * '|' for logically or mode
       * '-' for subtract mode
 
+    For large scatters, set `ipv.gcf().selection_frontend = True` to let the browser compute which points are selected,
+    so they do not need to be projected in Python.
+
     """
     fig = gcf()
     if output_widget is None:
@@ -1385,64 +1483,48 @@ def selector_default(output_widget=None):
         with output_widget:
             inside = None
             if data['device'] and data['type'] == 'lasso':
-                region = shapely.geometry.Polygon(data['device'])
+                region = data['device']
 
-                @np.vectorize
                 def inside_polygon(x, y):
-                    return region.contains(shapely.geometry.Point([x, y]))
+                    return utils.points_in_polygon(x, y, region)
 
                 inside = inside_polygon
 
             if data['device'] and data['type'] == 'circle':
                 x1, y1 = data['device']['begin']
                 x2, y2 = data['device']['end']
-                dx = x2 - x1
-                dy = y2 - y1
-                r = (dx ** 2 + dy ** 2) ** 0.5
+                r = ((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5
 
                 def inside_circle(x, y):
-                    return ((x - x1) ** 2 + (y - y1) ** 2) < r ** 2
+                    return utils.points_in_circle(x, y, (x1, y1), r)
 
                 inside = inside_circle
 
             if data['device'] and data['type'] == 'rectangle':
                 x1, y1 = data['device']['begin']
                 x2, y2 = data['device']['end']
-                x = [x1, x2]
-                y = [y1, y2]
-                xmin, xmax = min(x), max(x)
-                ymin, ymax = min(y), max(y)
 
                 def inside_rectangle(x, y):
-                    return (x > xmin) & (x < xmax) & (y > ymin) & (y < ymax)
+                    return utils.points_in_rectangle(x, y, min(x1, x2), max(x1, x2), min(y1, y2), max(y1, y2))
 
                 inside = inside_rectangle
 
-            def join(x, y, mode):
-                Nx = 0 if (x is None or len(x[0]) == 0) else np.max(x)
-                Ny = 0 if len(y[0]) == 0 else np.max(y)
-                N = max(Nx, Ny)
-                xmask = np.zeros(N + 1, np.bool)
-                ymask = np.zeros(N + 1, np.bool)
-                if x is not None:
-                    xmask[x] = True
-                ymask[y] = True
-                if mode == "replace":
-                    return np.where(ymask)
-                if mode == "and":
-                    mask = xmask & ymask
-                    return np.where(ymask if x is None else mask)
-                if mode == "or":
-                    mask = xmask | ymask
-                    return np.where(ymask if x is None else mask)
-                if mode == "subtract":
-                    mask = xmask & ~ymask
-                    return np.where(ymask if x is None else mask)
-
+            masks = data.get('masks', {})
+            unprojected = [scatter for scatter in fig.scatters if scatter.model_id not in masks]
+            projections = dict(zip([scatter.model_id for scatter in unprojected], fig.project_scatters(unprojected)))
             for scatter in fig.scatters:
-                x, y = fig.project(scatter.x, scatter.y, scatter.z)
-                mask = inside(x, y)
-                scatter.selected = join(scatter.selected, np.where(mask), fig.selection_mode)
+                if scatter.model_id in projections:
+                    (x, y), depth, in_frustum = projections[scatter.model_id]
+                    mask = inside(x, y) & in_frustum  # points behind the camera, or clipped, are not visible
+                else:
+                    mask = masks[scatter.model_id]
+                selection = utils.Bitset.from_mask(mask)
+                previous = scatter.selected
+                if previous is not None and not isinstance(previous, utils.Bitset):
+                    previous = utils.Bitset.from_indices(previous, selection.length)
+                if previous is not None and previous.length == selection.length:
+                    selection = previous.combine(selection, fig.selection_mode)
+                scatter.selected = selection
 
     fig.on_selection(lasso)
 
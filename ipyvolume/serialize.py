@@ -1,9 +1,15 @@
 from __future__ import division
 
+import os
+import zlib
+import weakref
+import functools
+import hashlib
 import logging
 import warnings
 import math
 from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
 
 try:
     from io import BytesIO as StringIO  # python3
@@ -22,16 +28,11 @@ from ipyvolume import utils
 logger = logging.getLogger("ipyvolume")
 
 
-def image_to_url(image, widget):
-    if image is None:
-        return None
-    if not isinstance(image, (list, tuple)):
-        images = [image]
-    else:
-        images = image
-
-    def flatten_frames(image):
-        frames = []
+def _image_frames(image):
+    """All frames of a (list of) PIL image(s), e.g. of an animated gif."""
+    images = image if isinstance(image, (list, tuple)) else [image]
+    frames = []
+    for image in images:
         index = 0
         while True:
             try:
@@ -40,32 +41,188 @@ def image_to_url(image, widget):
                 break
             frames.append(image.copy())
             index += 1
-        return frames
+    return frames
 
-    flattened = []
-    for image in images:
-        flattened += flatten_frames(image)
 
-    def encode(image):
+def _image_hash(image):
+    return hashlib.sha1(image.tobytes()).hexdigest() + '-%s-%dx%d' % ((image.mode,) + image.size)
+
+
+def _encode_png(image):
+    key = _image_hash(image)
+    url = texture_cache.get(key)
+    if url is None:
         f = StringIO()
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
             image.save(f, "png")
-        image_url = "data:image/png;base64," + b64encode(f.getvalue()).decode("ascii")
-        return image_url
+        url = "data:image/png;base64," + b64encode(f.getvalue()).decode("ascii")
+        texture_cache.set(key, url, len(url))
+    return url
+
+
+def _encode_rgba(image):
+    # textures are mipmapped, which WebGL1 only supports for power of two sizes, so we resize like three.js does
+    # for html images
+    width, height = [2 ** int(math.ceil(math.log2(max(length, 1)))) for length in image.size]
+    image = image.convert('RGBA')
+    if (width, height) != image.size:
+        image = image.resize((width, height), PIL.Image.BILINEAR)
+    # the first row in a WebGL texture is the bottom one
+    return np.ascontiguousarray(np.asarray(image)[::-1])
+
+
+def _map_frames(encode, frames):
+    workers = min(slab_workers or os.cpu_count() or 1, len(frames))
+    if workers <= 1:
+        return [encode(frame) for frame in frames]
+    with ThreadPoolExecutor(workers) as executor:  # PIL and hashlib release the GIL
+        return list(executor.map(encode, frames))
+
+
+def image_to_url(image, widget):
+    """Serialize a (list of) PIL image(s) as a list of PNG data urls, one for each frame."""
+    if image is None:
+        return None
+    return _map_frames(_encode_png, _image_frames(image))
+
+
+def _is_image(texture):
+    images = texture if isinstance(texture, (list, tuple)) else [texture]
+    return len(images) > 0 and all(isinstance(image, PIL.Image.Image) for image in images)
+
+
+def _textures_for(image):
+    """Return the Texture widgets for the frames of a (list of) PIL image(s), creating the ones not in texture_registry.
+
+    Frames are hashed and converted to raw RGBA pixels in parallel.
+    """
+    from ipyvolume.widgets import Texture  # ipyvolume.widgets imports this module
+
+    frames = _image_frames(image)
+    keys = _map_frames(_image_hash, frames)
+    missing = {}
+    for key, frame in zip(keys, frames):
+        texture = texture_registry.get(key)
+        if texture is None or texture.comm is None:  # closed widgets are created again
+            missing[key] = frame
+    for key, rgba in zip(missing, _map_frames(_encode_rgba, list(missing.values()))):
+        texture_registry[key] = Texture(data=rgba)
+        texture_registry[key]._key = key
+    return [texture_registry[key] for key in keys]
+
+
+def _release_texture(texture, widget):
+    texture._users.discard(widget)
+    if not texture._users:
+        if texture_registry.get(texture._key) is texture:
+            del texture_registry[texture._key]
+        texture.close()
+
+
+def update_texture_frames(widget):
+    """Let widget.texture_frames hold the Texture widgets for widget.texture, when it is a (list of) PIL image(s).
+
+    Since the Texture widgets are held by a trait, ipywidgets.embed finds them. Each Texture widget keeps track of the
+    widgets that use it, and is closed when the last one stops using it.
+    """
+    texture = widget.texture
+    if getattr(widget, '_texture_frames_source', None) is texture and texture is not None:
+        return
+    textures = _textures_for(texture) if texture_binary and _is_image(texture) else []
+    for texture_widget in textures:
+        texture_widget._users.add(widget)
+    previous = widget.texture_frames
+    widget._texture_frames_source = texture
+    widget.texture_frames = textures
+    for texture_widget in previous:
+        if texture_widget not in textures:
+            _release_texture(texture_widget, widget)
+
 
-    return [encode(image) for image in flattened]
+def release_texture_frames(widget):
+    """Stop using the Texture widgets of widget.texture_frames, e.g. when widget is closed."""
+    for texture_widget in widget.texture_frames:
+        _release_texture(texture_widget, widget)
+    widget._texture_frames_source = None
 
 
 def texture_to_json(texture, widget):
     if isinstance(texture, ipywebrtc.HasStream):
         return ipywidgets.widget_serialization['to_json'](texture, widget)
-    else:
-        return image_to_url(texture, widget)
+    # texture_frames is updated by the observer of widget.texture, see update_texture_frames
+    if texture_binary and getattr(widget, 'texture_frames', None):
+        return ipywidgets.widget_serialization['to_json'](widget.texture_frames, widget)
+    return image_to_url(texture, widget)
 
 
 max_texture_width = 2048 * 8  # this will nicely fit 512**3 textures
 min_texture_width = 256
+# volumes are normalized and tiled in slabs of slices, such that the temporary (float) arrays of all threads together
+# do not take more than slab_max_bytes of memory
+slab_max_bytes = 256 * 1024**2
+slab_workers = None  # number of threads used for tiling and casting, None means os.cpu_count()
+# casts of arrays larger than this are done in chunks of this size on slab_workers threads
+cast_chunk_bytes = 16 * 1024**2
+# array buffers that needed a cast, copy or compression are cached, see array_to_binary
+wire_cache_min_bytes = 1024**2
+wire_cache = utils.LRUCache(512 * 1024**2)
+# textures (PIL images) are send as raw RGBA pixels in binary buffers, or as PNG data urls when False
+texture_binary = True
+# raw RGBA pixels are compressed with this codec (like PNG, which uses deflate), None sends them uncompressed
+texture_codec = 'zlib'
+# content of an image frame -> Texture widget with its raw pixels, see update_texture_frames, only holds the Texture
+# widgets that are used by a widget
+texture_registry = {}
+# PNG data urls, keyed by the content of the frame
+texture_cache = utils.LRUCache(256 * 1024**2)
+
+
+# binary buffers of widgets larger than compression_min_bytes are compressed with this codec (e.g. 'zlib', 'lz4' or
+# 'zstd'), None means no compression, Figure.compression overrides this for the widgets of a figure
+compression = None
+compression_min_bytes = 1024**2
+# name -> compress function, lz4 and zstd are available when the lz4 or zstandard package is installed
+codecs = {'zlib': lambda data: zlib.compress(data, 1)}
+decompressors = {'zlib': zlib.decompress}
+try:
+    import lz4.frame
+
+    codecs['lz4'] = lambda data: lz4.frame.compress(data)
+    decompressors['lz4'] = lambda data: lz4.frame.decompress(data)
+except ImportError:
+    pass
+try:
+    import zstandard
+
+    codecs['zstd'] = lambda data: zstandard.ZstdCompressor(level=1).compress(data)
+    decompressors['zstd'] = lambda data: zstandard.ZstdDecompressor().decompress(data)
+except ImportError:
+    pass
+
+
+def _codec_for(obj, nbytes):
+    """Return the name of the codec to compress a buffer of nbytes for widget obj with, or None."""
+    if nbytes < compression_min_bytes:
+        return None
+    if obj is None:
+        return None
+    figure = getattr(obj, '_figure', None)  # passed on construction by pylab, or set by Figure._update_children
+    codec = (figure.compression if figure is not None else None) or compression
+    if codec in [None, 'none']:
+        return None
+    if codec not in codecs:
+        raise ValueError('codec %r is not available, choose from: %s' % (codec, ', '.join(codecs)))
+    return codec
+
+
+def _compress(data, obj):
+    """Return the (possibly compressed) buffer and codec name (or None) for a contiguous array or buffer."""
+    data = memoryview(data)
+    codec = _codec_for(obj, data.nbytes)
+    if codec is None:
+        return data, None
+    return codecs[codec](data.cast('B')), codec
 
 
 def _compute_tile_size(shape):
@@ -79,34 +236,152 @@ def _compute_tile_size(shape):
     return rows, columns, image_width, image_height
 
 
-def _cube_to_tiles(grid, vmin, vmax):
+def _atlas_tiles(atlas, slice_shape, columns):
+    """Return a (rows, columns, height, width, ...) view on the atlas, such that tiles[row, column] is a slice."""
+    height, width = slice_shape
+    rows = atlas.shape[0] // height
+    tiles = atlas[:, : columns * width].reshape((rows, height, columns, width) + atlas.shape[2:])
+    return tiles.swapaxes(1, 2)
+
+
+def _fill_tiles(tiles, cube, offset=0):
+    """Copy the slices of cube into the tiles view (see _atlas_tiles) in row major order, starting at slice offset."""
+    rows, columns = tiles.shape[:2]
+    cube = cube[: max(0, rows * columns - offset)]
+    row, column = divmod(offset, columns)
+    index = 0
+    if column:  # first fill up the current row
+        index = min(columns - column, len(cube))
+        tiles[row, column : column + index] = cube[:index]
+        row += 1
+    full_rows, remainder = divmod(len(cube) - index, columns)
+    tiles[row : row + full_rows] = cube[index : index + full_rows * columns].reshape((full_rows, columns) + cube.shape[1:])
+    if remainder:
+        tiles[row + full_rows, :remainder] = cube[index + full_rows * columns :]
+
+
+def _normalize(grid, vmin, vmax):
+    # floats are normalized in their own precision, other types as float64, without an intermediate copy
+    dtype = grid.dtype if grid.dtype.kind == 'f' else np.float64
+    grid_normalized = np.subtract(grid, vmin, dtype=dtype)
+    grid_normalized /= vmax - vmin
+    grid_normalized[~np.isfinite(grid_normalized)] = 0
+    return grid_normalized
+
+
+def _slab_to_tiles(grid, vmin, vmax, z0, z1, tiles, intensity_only):
+    # we take 1 slice extra on each side (if possible), so the gradient is the same as when computed over the full grid
+    begin = max(0, z0 - 1)
+    end = min(len(grid), z1 + 1)
+    inner = slice(z0 - begin, z1 - begin)
+    slab_normalized = _normalize(grid[begin:end], vmin, vmax)
+    if not intensity_only:
+        gradient = np.gradient(slab_normalized)
+    # all operations are done in place, to avoid temporary copies
+    slab_normalized *= 255
+    _fill_tiles(tiles if intensity_only else tiles[..., 3], slab_normalized[inner].astype(np.uint8), z0)
+    del slab_normalized
+    if intensity_only:
+        return
+    length = gradient[0] ** 2
+    length += gradient[1] ** 2
+    length += gradient[2] ** 2
+    np.sqrt(length, out=length)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i in range(3):
+            gradient_i = gradient[i]
+            gradient_i /= length
+            gradient_i /= 2.0
+            gradient_i += 0.5
+            gradient_i *= 255
+            _fill_tiles(tiles[..., i], gradient_i[inner].astype(np.uint8), z0)
+        # intensity_normalized = (np.log(self.data3d + 1.) - np.log(mi)) / (np.log(ma) - np.log(mi));
+
+
+def _cube_to_tiles(grid, vmin, vmax, intensity_only=False):
+    """Tile the normalized cube into a 2d atlas.
+
+    The atlas is RGBA, with the normalized gradient in RGB and the intensity in A, or, when intensity_only is
+    True, only contains the intensity (1 byte per voxel) and the gradient is not computed at all.
+
+    The work is done in slabs of slices by a pool of slab_workers threads, with at most slab_max_bytes
+    of temporary memory (fewer threads are used when their smallest slabs do not fit in that).
+    """
     slices = grid.shape[0]
     rows, columns, image_width, image_height = _compute_tile_size(grid.shape)
     image_height = rows * grid.shape[1]
-    data = np.zeros((image_height, image_width, 4), dtype=np.uint8)
+    channels = () if intensity_only else (4,)
+    data = np.zeros((image_height, image_width) + channels, dtype=np.uint8)
+    tiles = _atlas_tiles(data, grid.shape[1:], columns)
     # vmin, vmax = np.nanmin(grid), np.nanmax(grid)
-    grid_normalized = (grid * 1.0 - vmin) / (vmax - vmin)
-    grid_normalized[~np.isfinite(grid_normalized)] = 0
-    gradient = np.gradient(grid_normalized)
-    with np.errstate(divide='ignore'):
-        gradient = gradient / np.sqrt(gradient[0] ** 2 + gradient[1] ** 2 + gradient[2] ** 2)
-        # intensity_normalized = (np.log(self.data3d + 1.) - np.log(mi)) / (np.log(ma) - np.log(mi));
-    for y2d in range(rows):
-        for x2d in range(columns):
-            zindex = x2d + y2d * columns
-            if zindex < slices:
-                Im = grid_normalized[zindex]
-                subdata = data[y2d * Im.shape[0] : (y2d + 1) * Im.shape[0], x2d * Im.shape[1] : (x2d + 1) * Im.shape[1]]
-                subdata[..., 3] = (Im * 255).astype(np.uint8)
-                for i in range(3):
-                    subdata[..., i] = ((gradient[i][zindex] / 2.0 + 0.5) * 255).astype(np.uint8)
-                    # for i in range(3):
-                    # 	subdata[...,i+1] = subdata[...,0]
+
+    workers = slab_workers or os.cpu_count() or 1
+    itemsize = grid.dtype.itemsize if grid.dtype.kind == 'f' else 8
+    # normalized slab and its uint8 copy, and 3 gradients + length if needed
+    temporaries = 1.5 if intensity_only else 5.5
+    slice_bytes = grid.shape[1] * grid.shape[2] * itemsize * temporaries
+    # the slab needs at least 2 slices (including the halo) for the gradient
+    slab_size = max(1, int(slab_max_bytes // (workers * slice_bytes)) - 2)
+    workers = max(1, min(workers, int(slab_max_bytes // ((slab_size + 2) * slice_bytes))))
+    slabs = [(z0, min(slices, z0 + slab_size)) for z0 in range(0, slices, slab_size)]
+    if len(slabs) == 1 or workers == 1:
+        for z0, z1 in slabs:
+            _slab_to_tiles(grid, vmin, vmax, z0, z1, tiles, intensity_only)
+    else:
+        with ThreadPoolExecutor(min(workers, len(slabs))) as executor:
+            futures = [
+                executor.submit(_slab_to_tiles, grid, vmin, vmax, z0, z1, tiles, intensity_only) for z0, z1 in slabs
+            ]
+            for future in futures:
+                future.result()  # raise possible exceptions
     tile_shape = (grid.shape[2], grid.shape[1])
 
     return data, tile_shape, rows, columns, grid.shape[0]
 
 
+def _visible_bricks(grid, brick_size, threshold):
+    """Return a boolean array with, for each brick of brick_size^3 voxels of grid, whether it has values above threshold.
+
+    A sample between the last voxel of a brick and the first of the next brick belongs to the former, so that first
+    voxel counts for both bricks.
+    """
+    visible = np.greater(grid, threshold)  # NaN is not visible
+    for axis in range(3):
+        view = np.moveaxis(visible, axis, 0)
+        view[:-1] |= view[1:]
+    for axis in range(3):
+        visible = np.logical_or.reduceat(visible, np.arange(0, visible.shape[axis], brick_size), axis=axis)
+    return visible
+
+
+def _cube_to_bricks(grid, vmin, vmax, brick_size, threshold, intensity_only=False):
+    """Tile the bricks of the normalized cube with values above threshold into a 2d atlas, and return its lookup table.
+
+    Each visible brick is copied into a slot of (brick_size + 3)^3 voxels: the brick, 1 voxel before and 2 after it
+    along each axis (repeating the voxels at the faces of the cube), so the frontend can interpolate up to the first
+    voxel of the next brick, and the gradients are the same as for the full cube. The slots are stacked along the first
+    axis, and tiled like a cube by _cube_to_tiles.
+
+    The lookup table has the shape of the grid of bricks, and holds the slot + 1 of each brick, or 0 when it is not
+    sent.
+    """
+    visible = _visible_bricks(grid, brick_size, threshold)
+    bricks = np.argwhere(visible)
+    lookup = np.zeros(visible.shape, dtype='<u2')
+    if len(bricks) >= 2**16:
+        raise ValueError('%d bricks do not fit in the lookup table, use a larger brick_size' % len(bricks))
+    lookup[tuple(bricks.T)] = np.arange(1, len(bricks) + 1)
+    slot_size = brick_size + 3
+    slots = np.zeros((max(1, len(bricks)) * slot_size, slot_size, slot_size), dtype=grid.dtype)
+    for slot, brick in enumerate(bricks):
+        indices = [
+            np.clip(np.arange(index * brick_size - 1, (index + 1) * brick_size + 2), 0, length - 1)
+            for index, length in zip(brick, grid.shape)
+        ]
+        slots[slot * slot_size : (slot + 1) * slot_size] = grid[np.ix_(*indices)]
+    return _cube_to_tiles(slots, vmin, vmax, intensity_only) + (lookup,)
+
+
 def cube_to_png(grid, vmin, vmax, file):
     tiles_data, tile_shape, rows, columns, slices = _cube_to_tiles(grid, vmin, vmax)
     image_height, image_width, __ = tiles_data.shape
@@ -117,23 +392,18 @@ def cube_to_png(grid, vmin, vmax, file):
     return (image_width, image_height), tile_shape, rows, columns, slices
 
 
-def tile_volume(vol, tex_size, tile_shape, vol_size):
+def tile_volume(vol, tex_size, tile_shape, vol_size, obj=None):
     # now tiling is always square, if volume is for example a x/y ratio of 2/1 it will create a big texture
     # which will only be filled for half, needs to be changed based on ratio of x/y
-    tex = np.zeros(tex_size, dtype=vol.dtype)
-    for tileY in range(tile_shape[1]):
-        for tileX in range(tile_shape[0]):
-            z = tileX + tileY * tile_shape[0]
-            if z >= vol_size[2]:
-                break
-            slice_data = vol[z]
-            xoffset = tileX * vol_size[0]
-            yoffset = tileY * vol_size[1]
-            tex[yoffset : yoffset + vol_size[1], xoffset : xoffset + vol_size[0]] = slice_data
+    # allocate directly in the dtype that goes over the wire, so array_to_binary does not need to cast again
+    dtype = _wire_dtype(vol.dtype)
+    tex = np.zeros(tex_size, dtype=dtype)
+    tiles = _atlas_tiles(tex, (vol_size[1], vol_size[0]), tile_shape[0])
+    _fill_tiles(tiles, vol[: vol_size[2]])
     # debug image saving
     # scipy.misc.toimage(tex, cmin=tex.min(), cmax=tex.max()).save('outfile.png')
 
-    return array_to_binary(tex)
+    return array_to_binary(tex, obj)
 
 
 def volume_to_json_volume_tiled(vol, obj=None):
@@ -158,14 +428,14 @@ def volume_to_json_volume_tiled(vol, obj=None):
 
     if vol.ndim == 4:  # time series
         return {
-            "volume_data_tiled": [tile_volume(vol[t], tex_size, tile_shape, vol_shape) for t in range(vol.shape[0])],
+            "volume_data_tiled": [tile_volume(vol[t], tex_size, tile_shape, vol_shape, obj) for t in range(vol.shape[0])],
             "shape": vol_shape,
             "tile_shape": tile_shape,
             "vol_tex_size": tex_size,
         }
     else:
         return {
-            "volume_data_tiled": [tile_volume(vol, tex_size, tile_shape, vol_shape)],
+            "volume_data_tiled": [tile_volume(vol, tex_size, tile_shape, vol_shape, obj)],
             "shape": vol_shape,
             "tile_shape": tile_shape,
             "vol_tex_size": tex_size,
@@ -194,17 +464,56 @@ def cube_to_json(grid, obj=None):
 def cube_to_tiles(grid, obj=None):
     if grid is None or len(grid.shape) == 1:
         return None
-    tiles_data, slice_shape, rows, columns, slices = _cube_to_tiles(grid, obj.data_min, obj.data_max)
-    image_height, image_width, __ = tiles_data.shape
+    # the volume sets _data_key to identify the (reduced) data, so we can reuse the tiles when revisiting a view
+    data_key = None
+    if getattr(obj, '_data_key', None) is not None and obj._data_key[1] is grid:
+        data_key = obj._data_key[0]
+    return cube_to_tiles_cached(grid, obj, data_key)
+
+
+def cube_to_tiles_cached(grid, obj, data_key):
+    """Like cube_to_tiles, but if data_key is not None, the result is cached in the cache of the volume (obj)."""
+    # without lighting we do not need the gradients, and only send the intensity
+    lighting = obj.lighting
+    # with bricks, only the bricks with values above show_min are sent
+    brick_size = getattr(obj, 'brick_size', None)
+    threshold = obj.show_min if brick_size else None
+    cache = getattr(obj, '_cache', None)
+    key = None
+    if cache is not None and data_key is not None:
+        codec = _codec_for(obj, compression_min_bytes)
+        key = ('tiles', data_key, obj.data_min, obj.data_max, lighting, codec, brick_size, threshold)
+        json = cache.get(key)
+        if json is not None:
+            return json
+    if brick_size:
+        tiles_data, slice_shape, rows, columns, slices, lookup = _cube_to_bricks(
+            grid, obj.data_min, obj.data_max, brick_size, threshold, intensity_only=not lighting
+        )
+    else:
+        tiles_data, slice_shape, rows, columns, slices = _cube_to_tiles(
+            grid, obj.data_min, obj.data_max, intensity_only=not lighting
+        )
+    image_height, image_width = tiles_data.shape[:2]
     image_shape = image_width, image_height
+    tiles, codec = _compress(tiles_data, obj)
     json = {
-        "tiles": memoryview(tiles_data),
+        "tiles": tiles,
+        "compression": codec,
+        "format": "rgba" if lighting else "intensity",
         "image_shape": image_shape,
         "slice_shape": slice_shape,
         "rows": rows,
         "columns": columns,
         "slices": slices,
     }
+    if brick_size:
+        json["bricks"] = memoryview(lookup).cast('B')
+        json["brick_size"] = brick_size
+        json["brick_shape"] = lookup.shape[::-1]
+        json["shape"] = grid.shape[::-1]
+    if key is not None:
+        cache.set(key, json, memoryview(tiles).nbytes)
     return json
 
 
@@ -216,22 +525,127 @@ def array_to_json(ar, obj=None):
     return ar.tolist() if ar is not None else None
 
 
+def _wire_dtype(dtype):
+    if dtype == np.float64:  # WebGL does not support float64, case it here
+        return np.dtype(np.float32)
+    if dtype == np.int64:  # JS does not support int64
+        return np.dtype(np.int32)
+    return dtype
+
+
+def _cast(ar, dtype):
+    """Return ar as a C contiguous array of dtype, casting in chunks on a thread pool for large arrays."""
+    if ar.dtype == dtype and ar.flags["C_CONTIGUOUS"]:
+        return ar
+    workers = slab_workers or os.cpu_count() or 1
+    chunks = int(ar.size * max(ar.itemsize, dtype.itemsize) // cast_chunk_bytes)
+    if ar.ndim == 0 or workers == 1 or chunks < 2:
+        return np.ascontiguousarray(ar, dtype=dtype)
+    source = ar.reshape(-1) if ar.flags["C_CONTIGUOUS"] else ar
+    result = np.empty(source.shape, dtype=dtype)
+    bounds = np.linspace(0, len(source), min(chunks, len(source)) + 1).astype(int)
+
+    def cast(start, end):  # numpy releases the GIL while copying
+        np.copyto(result[start:end], source[start:end], casting='unsafe')
+
+    with ThreadPoolExecutor(min(workers, len(bounds) - 1)) as executor:
+        for future in [executor.submit(cast, start, end) for start, end in zip(bounds[:-1], bounds[1:])]:
+            future.result()
+    return result.reshape(ar.shape)
+
+
+def _wire_key(ar, obj, codec):
+    # views (slices, reshapes) are new objects each time, so we identify them by the array that owns the memory
+    owner = ar
+    while isinstance(owner.base, np.ndarray):
+        owner = owner.base
+    offset = ar.__array_interface__['data'][0] - owner.__array_interface__['data'][0]
+    return owner, (id(owner), id(obj), offset, ar.shape, ar.strides, ar.dtype.str, codec)
+
+
+def discard_cached(ar):
+    """Remove the cached wire buffers of (views of) ar from wire_cache, e.g. when a trait is set (to ar, or another)."""
+    if isinstance(ar, np.ndarray):
+        owner = _wire_key(ar, None, None)[0]
+        for key in wire_cache.keys():
+            if key[0] == id(owner):
+                wire_cache.discard(key)
+
+
 def array_to_binary(ar, obj=None, force_contiguous=True):
+    """Serialize an array as a buffer with its dtype and shape.
+
+    The buffer is cast to a dtype that WebGL/JS supports, made contiguous and possibly compressed. When that is
+    needed for arrays larger than wire_cache_min_bytes, the result is cached in wire_cache (serialize.wire_cache.info()
+    reports the memory usage), since the state of a widget is serialized each time it is displayed or embedded.
+    Entries are per widget (obj), and are discarded each time an array trait of a Mesh or Scatter is set, so after
+    modifying an array in place, assign it again (e.g. s.x = s.x), or use update_points.
+    """
     if ar is None:
         return None
     if ar.dtype.kind not in ['u', 'i', 'f']:  # ints and floats
         raise ValueError("unsupported dtype: %s" % (ar.dtype))
-    if ar.dtype == np.float64:  # WebGL does not support float64, case it here
-        ar = ar.astype(np.float32)
-    if ar.dtype == np.int64:  # JS does not support int64
-        ar = ar.astype(np.int32)
-    if force_contiguous and not ar.flags["C_CONTIGUOUS"]:  # make sure it's contiguous
-        ar = np.ascontiguousarray(ar)
-    return {'data': memoryview(ar), 'dtype': str(ar.dtype), 'shape': ar.shape}
+    dtype = _wire_dtype(ar.dtype)
+    if not force_contiguous and not ar.flags["C_CONTIGUOUS"]:
+        ar = ar.astype(dtype, copy=False)
+        return {'data': memoryview(ar), 'dtype': str(ar.dtype), 'shape': ar.shape}
+    codec = _codec_for(obj, ar.nbytes)
+    cache = obj is not None and ar.nbytes >= wire_cache_min_bytes
+    cache = cache and (codec is not None or ar.dtype != dtype or not ar.flags["C_CONTIGUOUS"])
+    if cache:
+        owner, key = _wire_key(ar, obj, codec)
+        cached = wire_cache.get(key)
+        if cached is not None and cached[0]() is owner:  # the id could be reused by a new array
+            return cached[1]
+    ar = _cast(ar, dtype)
+    data, codec = _compress(ar, obj)
+    json = {'data': data, 'dtype': str(ar.dtype), 'shape': ar.shape}
+    if codec is not None:
+        json['compression'] = codec
+    if cache:
+        wire_cache.set(key, (weakref.ref(owner), json), memoryview(data).nbytes)
+    return json
 
 
 def binary_to_array(value, obj=None):
-    return np.frombuffer(value['data'], dtype=value['dtype']).reshape(value['shape'])
+    data = value['data']
+    if value.get('compression'):
+        data = decompressors[value['compression']](data)
+    return np.frombuffer(data, dtype=value['dtype']).reshape(value['shape'])
+
+
+def rgba_to_binary(ar, obj=None):
+    """Serialize the raw RGBA pixels of a texture, compressed with texture_codec."""
+    if ar is None:
+        return None
+    ar = np.ascontiguousarray(ar, dtype=np.uint8)
+    json = {'data': memoryview(ar), 'dtype': 'uint8', 'shape': ar.shape}
+    if texture_codec:
+        json['data'] = codecs[texture_codec](json['data'].cast('B'))
+        json['compression'] = texture_codec
+    return json
+
+
+def selection_to_mask(selection, buffer):
+    """Decode a selection computed in the frontend to a boolean mask.
+
+    :param selection: dict with the number of points (length), and the encoding of the buffer, 'bitmask' (one bit per
+        point, least significant bit first) or 'ranges' (uint32 pairs of the start and end of runs of selected points)
+    :param buffer: bytes or memoryview of the encoded selection
+    :return: boolean numpy array of the given length
+    """
+    length = selection['length']
+    if selection['encoding'] == 'bitmask':
+        bits = np.frombuffer(buffer, dtype=np.uint8)
+        return np.unpackbits(bits, count=length, bitorder='little').astype(bool)
+    elif selection['encoding'] == 'ranges':
+        ranges = np.frombuffer(buffer, dtype='<u4').reshape(-1, 2).astype(np.intp)
+        edges = np.zeros(length + 1, dtype=np.int8)
+        np.add.at(edges, ranges[:, 0], 1)
+        np.add.at(edges, ranges[:, 1], -1)
+        return np.cumsum(edges[:-1]) > 0
+    else:
+        raise ValueError('unknown selection encoding: %r' % selection['encoding'])
 
 
 def array_sequence_to_binary_or_json(ar, obj=None):
@@ -258,13 +672,108 @@ def array_sequence_to_binary_or_json(ar, obj=None):
             return element
     if isinstance(ar, (list, tuple, np.ndarray)):  # ok, at least 1d
         if isinstance(ar[0], (list, tuple, np.ndarray)):  # ok, 2d
-            return [array_to_binary(ar[k]) for k in range(len(ar))]
+            return pack_sequence(ar, obj)
         else:
-            return [array_to_binary(ar)]
+            return [array_to_binary(ar, obj)]
     else:
         raise ValueError("Expected a sequence, got %r", ar)
 
 
+def pack_sequence(frames, obj=None):
+    """Serialize a sequence of 1d arrays, that can differ in length (ragged), as a single buffer and offsets.
+
+    Frame i is data[offsets[i]:offsets[i+1]], the frontend slices the frames from the buffer without copying.
+    """
+    if isinstance(frames, np.ndarray) and frames.dtype != object:  # uniform, a single cast (and copy) at most
+        offsets = np.arange(len(frames) + 1) * frames.shape[1]
+        data = frames.reshape(-1)
+    else:
+        frames = [np.asarray(frame) for frame in frames]
+        offsets = np.concatenate([[0], np.cumsum([len(frame) for frame in frames])])
+        data = np.empty(offsets[-1], dtype=_wire_dtype(np.result_type(*frames)))
+        for frame, start, end in zip(frames, offsets[:-1], offsets[1:]):
+            data[start:end] = frame
+    json = array_to_binary(data, obj)
+    json['offsets'] = offsets.tolist()
+    return json
+
+
+def quantize(ar):
+    """Quantize a float array to uint16 values with an offset and scale, such that ar ~= offset + values * scale.
+
+    Non-finite values are mapped to 65535, which decodes to NaN. The maximum error is scale / 2.
+
+    :return: values, offset, scale
+    """
+    ar = np.asarray(ar)
+    finite = np.isfinite(ar)
+    vmin = np.min(ar, where=finite, initial=np.inf)
+    vmax = np.max(ar, where=finite, initial=-np.inf)
+    if not np.isfinite(vmin):  # no finite values at all
+        vmin = vmax = 0.0
+    offset = float(vmin)
+    scale = float(vmax - vmin) / 65534 or 1.0
+    values = np.empty(ar.shape, dtype=np.uint16)
+    np.rint((ar - offset) / scale, out=values, casting='unsafe', where=finite)
+    values[~finite] = 65535
+    return values, offset, scale
+
+
+def _encode_positions(frames, quantized, keyframe_interval):
+    """Yield (values, extra json, maximum error) for each frame, see position_sequence_to_binary_or_json."""
+    previous = None
+    for index, frame in enumerate(frames):
+        if keyframe_interval and index % keyframe_interval and previous is not None:
+            delta = frame - previous
+            if np.all(np.isfinite(delta)):
+                scale = float(np.abs(delta).max()) / 32767 or 1.0
+                values = np.rint(delta / scale).astype(np.int16)
+                # the next delta is relative to what the frontend reconstructs, so errors do not accumulate
+                previous = (previous + values * scale).astype(np.float32)
+                yield values, {'delta_scale': scale}, scale / 2
+                continue
+        if quantized:
+            values, offset, scale = quantize(frame)
+            previous = np.where(values == 65535, np.nan, offset + values * scale).astype(np.float32)
+            yield values, {'offset': offset, 'scale': scale}, scale / 2
+        else:
+            previous = np.asarray(frame, dtype=np.float32)
+            yield previous, {}, 0.0
+
+
+def quantization_error(ar, quantized=True, keyframe_interval=None):
+    """Maximum error of the values of ar (with a sequence on the first axis for 2d arrays) when encoded.
+
+    See position_sequence_to_binary_or_json, the float32 rounding error is not included.
+    """
+    ar = np.asarray(ar)
+    if ar.dtype.kind != 'f' or ar.ndim == 0:
+        return 0.0
+    frames = ar if ar.ndim == 2 else [ar]
+    return max([error for values, extra, error in _encode_positions(frames, quantized, keyframe_interval)] or [0.0])
+
+
+def position_sequence_to_binary_or_json(ar, obj=None):
+    """Like array_sequence_to_binary_or_json, but can send positions in a more compact encoding.
+
+    When obj.quantize is True, values are sent as uint16 with an offset and scale. When obj.keyframe_interval is set,
+    for sequences only every keyframe_interval-th frame is sent in full (a keyframe), the other frames are sent as the
+    difference with the previous frame, quantized to int16 (with a scale). The frontend reconstructs the frames.
+    """
+    quantized = getattr(obj, 'quantize', False)
+    keyframe_interval = getattr(obj, 'keyframe_interval', None)
+    if ar is None or not (quantized or keyframe_interval) or np.asarray(ar).dtype.kind != 'f' or np.ndim(ar) == 0:
+        return array_sequence_to_binary_or_json(ar, obj)
+    ar = np.asarray(ar)
+    frames = ar if ar.ndim == 2 else [ar]
+    jsons = []
+    for values, extra, error in _encode_positions(frames, quantized, keyframe_interval):
+        json = array_to_binary(values, obj)
+        json.update(extra)
+        jsons.append(json)
+    return jsons
+
+
 def array_to_binary_or_json(ar, obj=None):
     if ar is None:
         return None
@@ -284,7 +793,7 @@ def array_to_binary_or_json(ar, obj=None):
         return array_to_json(ar)
     if dimension == 0:  # scalars are passed as is (json)
         return element
-    return [array_to_binary(ar)]
+    return [array_to_binary(ar, obj)]
 
 
 def from_json_to_array(value, obj=None):
@@ -316,44 +825,100 @@ def create_array_cube_png_serialization(attrname, update_from_js=False):
     return dict(to_json=cube_to_json, from_json=fixed)
 
 
+@functools.lru_cache(maxsize=1024)
+def _color_to_rgba(name):
+    import matplotlib.colors
+
+    return tuple(int(round(k * 255)) for k in matplotlib.colors.to_rgba(name))
+
+
+def strings_to_rgba(ar):
+    """Convert an array of color names or hex strings to uint8 RGBA (with an extra last axis).
+
+    Each unique string is looked up once, and the lookups of the 1024 most recently used strings are memoized.
+    """
+    ar = np.asarray(ar)
+    names, inverse = np.unique(ar, return_inverse=True)
+    lookup = np.array([_color_to_rgba(str(name)) for name in names], dtype=np.uint8).reshape(-1, 4)
+    return lookup[inverse.reshape(-1)].reshape(ar.shape + (4,))
+
+
+def rgb_to_rgba(ar):
+    """Convert an array of RGB or RGBA values in [0, 1] (values outside are clipped), to uint8 RGBA.
+
+    uint8 arrays are assumed to be in [0, 255] already (before 0.6, they were taken to be in [0, 1] as well).
+    """
+    rgba = np.full(ar.shape[:-1] + (4,), 255, dtype=np.uint8)
+    if ar.dtype == np.uint8:
+        rgba[..., : ar.shape[-1]] = ar
+    else:
+        rgba[..., : ar.shape[-1]] = np.clip(np.rint(np.multiply(ar, 255, dtype=np.float32)), 0, 255)
+    return rgba
+
+
 def color_to_binary_or_json(ar, obj=None):
+    """Serialize colors, arrays of colors are send as uint8 RGBA (4 bytes per color), which the frontend normalizes.
+
+    When obj has a color_scale, arrays of shape (N,) or (S, N) are scalars which are send as float32, or as uint16 when
+    obj.quantize is True. Since (S, 3) and (S, 4) arrays could also be rgb(a) colors, they raise a ValueError.
+    """
     if ar is None:
         return None
-    element = ar
-    dimension = 0
-    try:
-        while True:
-            element = element[0]
-            dimension += 1
-    except:
-        pass
-    try:
-        element = element.item()  # for instance get back the str from array('foo')
-    except:
-        pass
-    if isinstance(element, string_types):
-        return array_to_json(ar)
-    if dimension == 0:  # scalars are passed as is (json)
-        return ar
-    if ar.ndim > 1 and ar.shape[-1] == 3:
-        # we add an alpha channel
-        ones = np.ones(ar.shape[:-1])
-        ar = np.stack([ar[..., 0], ar[..., 1], ar[..., 2], ones], axis=-1)
-    elif ar.ndim > 1 and ar.shape[-1] != 4:
-        raise ValueError('array should be of shape (...,3) or (...,4), not %r' % (ar.shape,))
-
-    if dimension == 3:
-        return [array_to_binary(ar[k]) for k in range(len(ar))]
+    ar = np.asarray(ar)
+    if ar.dtype.kind in 'US':  # color names or hex strings
+        if ar.ndim == 0:  # a single color stays a string, so it can be linked to a color picker
+            return ar.item()
+        try:
+            ar = strings_to_rgba(ar)
+        except ValueError:  # a css color matplotlib does not know, the frontend can parse it
+            return array_to_json(ar)
+    elif ar.ndim == 0:  # scalars are passed as is (json)
+        return ar.item()
+    elif ar.ndim <= 2 and getattr(obj, 'color_scale', None) is not None:
+        # a scalar per vertex, shape (N,) or (S, N), mapped by the colormap of the color_scale in the shader
+        if ar.ndim == 2 and ar.shape[-1] in [3, 4]:
+            raise ValueError(
+                'color of shape %r is ambiguous with a color_scale: rgb(a) colors, or a sequence of scalars for %d '
+                'points, set color_scale to None for rgb(a) colors' % (ar.shape, ar.shape[-1])
+            )
+        frames = ar if ar.ndim == 2 else ar[np.newaxis]
+        if frames.dtype.kind != 'f':  # WebGL does not support all integer attribute types
+            frames = frames.astype(np.float32)
+        if getattr(obj, 'quantize', False):
+            return [dict(array_to_binary(values, obj), **extra) for values, extra, _ in _encode_positions(frames, True, None)]
+        return [array_to_binary(frame, obj) for frame in frames]
+    elif ar.ndim > 1:
+        if ar.shape[-1] not in [3, 4]:
+            raise ValueError('array should be of shape (...,3) or (...,4), not %r' % (ar.shape,))
+        ar = rgb_to_rgba(ar)
+
+    if ar.ndim == 3:
+        return [array_to_binary(ar[k], obj) for k in range(len(ar))]
     else:
-        return [array_to_binary(ar)]
+        return [array_to_binary(ar, obj)]
 
 
 def json_to_array(json, obj=None):
     return np.array(json)
 
 
+def selection_to_binary_or_json(selection, obj=None):
+    """Serialize a utils.Bitset as a bitmask of length/8 bytes, and index arrays like array_sequence_to_binary_or_json."""
+    if isinstance(selection, utils.Bitset):
+        return {'bitmask': array_to_binary(selection.bits[: selection.nbytes], obj), 'length': selection.length}
+    return array_sequence_to_binary_or_json(selection, obj)
+
+
+def json_to_selection(json, obj=None):
+    if isinstance(json, dict) and 'bitmask' in json:
+        return utils.Bitset(np.frombuffer(json['bitmask']['data'], dtype=np.uint8), json['length'])
+    return json_to_array(json, obj)
+
+
 color_serialization = dict(to_json=color_to_binary_or_json, from_json=None)
 array_sequence_serialization = dict(to_json=array_sequence_to_binary_or_json, from_json=json_to_array)
+selection_serialization = dict(to_json=selection_to_binary_or_json, from_json=json_to_selection)
+position_sequence_serialization = dict(to_json=position_sequence_to_binary_or_json, from_json=json_to_array)
 array_serialization = dict(to_json=array_to_binary_or_json, from_json=None)
 
 array_volume_tiled_serialization = dict(to_json=volume_to_json_volume_tiled, from_json=from_json)
@@ -364,3 +929,4 @@ image_serialization = dict(to_json=image_to_url, from_json=None)
 texture_serialization = dict(to_json=texture_to_json, from_json=None)
 
 ndarray_serialization = dict(to_json=array_to_binary, from_json=binary_to_array)
+rgba_serialization = dict(to_json=rgba_to_binary, from_json=binary_to_array)
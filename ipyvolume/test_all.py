@@ -4,9 +4,11 @@ import os
 import shutil
 import json
 import contextlib
+import itertools
 
 import numpy as np
 import pytest
+import traitlets
 
 import ipyvolume
 import ipyvolume.pylab as p3
@@ -56,6 +58,80 @@ def test_serialize_cube():
     assert len(f.getvalue()) > 0
 
 
+def test_serialize_cube_tile_layout():
+    # each slice has a constant value, so we can check where it ends up in the atlas
+    cube = np.ones((20, 8, 16)) * np.arange(20)[:, None, None]
+    tiles, tile_shape, rows, columns, slices = ipv.serialize._cube_to_tiles(cube, 0, 19)
+    assert tile_shape == (16, 8)
+    assert slices == 20
+    for z in range(slices):
+        row, column = divmod(z, columns)
+        tile = tiles[row * 8 : (row + 1) * 8, column * 16 : (column + 1) * 16]
+        assert np.all(tile[..., 3] == int(z / 19.0 * 255))
+    # unused tiles stay empty
+    assert np.all(tiles[(rows - 1) * 8 :, (slices % columns) * 16 :] == 0)
+
+    vol = np.arange(5 * 4 * 3, dtype=np.float64).reshape((5, 4, 3))
+    tex = ipv.serialize.tile_volume(vol, [4 * 2, 3 * 3], [3, 2], [3, 4, 5])
+    assert tex['dtype'] == 'float32'
+    tex = np.frombuffer(tex['data'], dtype=tex['dtype']).reshape(tex['shape'])
+    for z in range(5):
+        row, column = divmod(z, 3)
+        np.testing.assert_array_equal(tex[row * 4 : (row + 1) * 4, column * 3 : (column + 1) * 3], vol[z])
+    assert np.all(tex[4:, 6:] == 0)
+
+
+def test_serialize_cube_slabs():
+    cube = np.random.random((37, 20, 30))
+    cube[5, 5, 5] = np.nan
+    expected = ipv.serialize._cube_to_tiles(cube, 0.1, 0.9)[0]
+    expected_intensity = ipv.serialize._cube_to_tiles(cube, 0.1, 0.9, intensity_only=True)[0]
+    previous = ipv.serialize.slab_max_bytes, ipv.serialize.slab_workers
+    try:
+        for workers in [1, 3]:
+            for slab_slices in [1, 4, 7]:  # small enough to have many slabs and slabs that do not align with rows
+                ipv.serialize.slab_workers = workers
+                ipv.serialize.slab_max_bytes = workers * 20 * 30 * 8 * 5.5 * (slab_slices + 2)
+                tiles = ipv.serialize._cube_to_tiles(cube, 0.1, 0.9)[0]
+                np.testing.assert_array_equal(tiles, expected)
+                tiles = ipv.serialize._cube_to_tiles(cube, 0.1, 0.9, intensity_only=True)[0]
+                np.testing.assert_array_equal(tiles, expected_intensity)
+
+        # the memory of 3 slabs of 1 slice (and the halo) only allows for 3 workers
+        pools = []
+        executor = ipv.serialize.ThreadPoolExecutor
+        ipv.serialize.ThreadPoolExecutor = lambda workers: pools.append(workers) or executor(workers)
+        try:
+            ipv.serialize.slab_workers = 8
+            ipv.serialize.slab_max_bytes = 3 * 20 * 30 * 8 * 5.5 * 3
+            tiles = ipv.serialize._cube_to_tiles(cube, 0.1, 0.9)[0]
+        finally:
+            ipv.serialize.ThreadPoolExecutor = executor
+        np.testing.assert_array_equal(tiles, expected)
+        assert pools == [3]
+    finally:
+        ipv.serialize.slab_max_bytes, ipv.serialize.slab_workers = previous
+
+
+def test_serialize_cube_intensity_only():
+    cube = np.random.random((10, 20, 30))
+    rgba, _tile_shape, _rows, _columns, _slices = ipv.serialize._cube_to_tiles(cube, 0, 1)
+    intensity, _tile_shape, _rows, _columns, _slices = ipv.serialize._cube_to_tiles(cube, 0, 1, intensity_only=True)
+    assert intensity.shape == rgba.shape[:2]
+    np.testing.assert_array_equal(intensity, rgba[..., 3])
+
+    ipv.figure()
+    volume = ipv.volshow(cube, lighting=False)
+    assert volume.lighting is False
+    state = ipv.serialize.cube_to_tiles(volume.data, volume)
+    assert state['format'] == 'intensity'
+    assert state['tiles'].nbytes == rgba.nbytes // 4
+    volume.lighting = True
+    state = ipv.serialize.cube_to_tiles(volume.data, volume)
+    assert state['format'] == 'rgba'
+    assert state['tiles'].nbytes == rgba.nbytes
+
+
 def test_tile_size():
     rows, columns, image_width, image_height = ipyvolume.serialize._compute_tile_size((256, 256, 256))
     # expect 16x16,
@@ -312,6 +388,754 @@ def test_volshow_max_shape():
     # assert np.all(v.volume_data == I[::2,::2,0:16])
 
 
+def test_volshow_cache():
+    x, y, z = ipyvolume.examples.xyz(shape=32)
+    ipv.figure()
+    v = ipv.volshow(x * y * z, max_shape=16, extent=[[0, 32]] * 3)
+    tiles_full = ipv.serialize.cube_to_tiles(v.data, v)
+    data_full = v.data
+    ipv.xlim(0, 16)
+    assert v.data.shape == (16, 16, 16)
+    assert v.extent[0] == (0, 16)
+    tiles_zoom = ipv.serialize.cube_to_tiles(v.data, v)
+    misses = v.cache_info()['misses']
+    ipv.xlim(0, 32)
+    assert v.data is data_full
+    assert ipv.serialize.cube_to_tiles(v.data, v) is tiles_full
+    ipv.xlim(0, 16)
+    assert ipv.serialize.cube_to_tiles(v.data, v) is tiles_zoom
+    info = v.cache_info()
+    assert info['misses'] == misses
+    assert info['nbytes'] > 0
+    # a different normalization should not use the cached tiles
+    v.data_max = 2
+    assert ipv.serialize.cube_to_tiles(v.data, v) is not tiles_zoom
+    v.cache_max_bytes = 0
+    assert v.cache_info()['nbytes'] == 0
+
+
+def test_volshow_pyramid():
+    data = np.random.random((32, 32, 64))
+    ipv.figure()
+    v = ipv.volshow(data, max_shape=16, extent=[[0, 64], [0, 32], [0, 32]], pyramid=True)
+    assert v.data.shape == (8, 8, 16)
+    np.testing.assert_allclose(v.data, v._pyramid[2][0])
+    ipv.xlim(0, 32)  # view of (32, 32, 32) fits at level 1
+    assert v.data.shape == (16, 16, 16)
+    assert v.extent == [(0, 32), (0, 32), (0, 32)]
+    np.testing.assert_allclose(v.data, v._pyramid[1][0][:, :, :16])
+    ipv.xyzlim(8, 16)  # fits at full resolution
+    np.testing.assert_allclose(v.data, data[8:16, 8:16, 8:16])
+
+
+def test_volshow_bricks():
+    data = np.zeros((32, 32, 32))
+    data[9:12, 3:4, 20:30] = 1
+    mins, maxs = ipyvolume.utils.brick_minmax(data, 8)
+    assert maxs.shape == (4, 4, 4)
+    assert maxs.sum() == 2
+    assert maxs[1, 0, 2] == 1 and maxs[1, 0, 3] == 1
+    # a single box around the bricks above the threshold, including the empty bricks between them
+    corners = np.zeros((4, 4, 4))
+    corners[0, 0, 0] = corners[2, 3, 1] = 1
+    view = ipyvolume.utils.bounding_box_of_bricks([(0, 32)] * 3, corners, 8, 0.5)
+    assert view == [(0, 24), (0, 32), (0, 16)]
+    ipv.figure()
+    v = ipv.volshow(data, extent=[[0, 32]] * 3, data_min=0, data_max=1, brick_size=8)
+    assert v.data.shape == (8, 8, 16)
+    assert v.extent == [(16, 32), (0, 8), (8, 16)]
+    np.testing.assert_array_equal(v.data, data[8:16, 0:8, 16:32])
+    # of the box, only the bricks above show_min are sent
+    json = ipv.serialize.cube_to_tiles(v.data, v)
+    assert json['brick_shape'] == (2, 1, 1) and json['shape'] == (16, 8, 8)
+    assert np.frombuffer(json['bricks'], dtype='<u2').tolist() == [1, 2]
+    ipv.xlim(0, 24)
+    assert v.data.shape == (8, 8, 8)
+    v.show_min = 1  # nothing visible, we keep the view
+    assert v.data.shape == (32, 32, 24)
+    assert not np.frombuffer(ipv.serialize.cube_to_tiles(v.data, v)['bricks'], dtype='<u2').any()
+
+    # the box around two opposite corners is the full cube, but only 2 of its 64 bricks are sent
+    ipv.figure()
+    data = np.zeros((32, 32, 32))
+    data[1, 1, 1] = data[30, 30, 30] = 1
+    v = ipv.volshow(data, extent=[[0, 32]] * 3, data_min=0, data_max=1, brick_size=8)
+    assert v.data.shape == (32, 32, 32)
+    json = ipv.serialize.cube_to_tiles(v.data, v)
+    assert json['slices'] == 2 * 11
+    lookup = np.frombuffer(json['bricks'], dtype='<u2').reshape(4, 4, 4)
+    assert lookup[0, 0, 0] == 1 and lookup[3, 3, 3] == 2 and lookup.sum() == 3
+
+
+def test_serialize_bricks():
+    grid = np.random.random((20, 24, 40)) * 0.4
+    grid[1:3, 2:4, 3:5] = 0.8
+    grid[15, 20, 37] = 0.6
+    grid[16, 0, 0] = 0.9  # the first voxel of a brick, which is also needed to interpolate in the brick before it
+    atlas, slice_shape, rows, columns, slices, lookup = ipv.serialize._cube_to_bricks(grid, 0, 1, 8, 0.5)
+    assert lookup.shape == (3, 3, 5)
+    bricks = [tuple(brick) for brick in np.argwhere(lookup)]
+    assert bricks == [(0, 0, 0), (1, 0, 0), (1, 2, 4), (2, 0, 0)]
+    assert sorted(lookup[tuple(np.array(bricks).T)]) == [1, 2, 3, 4]
+    assert slices == 4 * 11 and slice_shape == (11, 11)
+
+    dense, dense_shape, dense_rows, dense_columns = ipv.serialize._cube_to_tiles(grid, 0, 1)[:4]
+    cube = ipv.serialize._atlas_tiles(dense, grid.shape[1:], dense_columns).reshape((-1,) + grid.shape[1:] + (4,))
+    slots = ipv.serialize._atlas_tiles(atlas, (11, 11), columns).reshape(-1, 11, 11, 4)[:slices]
+    slots = slots.reshape(-1, 11, 11, 11, 4)
+    for brick in bricks:
+        slot = slots[lookup[brick] - 1]
+        # the voxels of the brick, and the first of the next brick, are the same as for the full cube
+        for local in itertools.product(range(1, 10), repeat=3):
+            index = tuple(b * 8 + k - 1 for b, k in zip(brick, local))
+            if all(i < length for i, length in zip(index, grid.shape)):
+                assert slot[local][3] == cube[index][3]
+                if all(0 < i < length - 1 for i, length in zip(index, grid.shape)):
+                    np.testing.assert_array_equal(slot[local], cube[index])
+
+    # without visible bricks, we send a single empty slot
+    atlas, slice_shape, rows, columns, slices, lookup = ipv.serialize._cube_to_bricks(grid, 0, 1, 8, 1)
+    assert not lookup.any()
+    assert slices == 11
+
+
+def test_volshow_sequence():
+    data = np.random.random((5, 8, 8, 8))
+    ipv.figure()
+    v = ipv.volshow(data, max_shape=4)
+    assert v.extent == [(0, 8), (0, 8), (0, 8)]
+    assert v.data.shape == (4, 4, 4)
+    messages = []
+    v.send = lambda content, buffers=None: messages.append((content, buffers))
+    # frame 1 and 2 are already send when the volume was created
+    v.sequence_index = 1
+    assert [content['index'] for content, buffers in messages] == [3]
+    content, buffers = messages[0]
+    assert content['msg'] == 'frame'
+    assert content['buffer_paths'] == [['tiles']]
+    tiles = ipv.serialize.cube_to_tiles_cached(ipyvolume.utils.reduce_size(data[3], 4, v.extent)[0], v, None)
+    assert buffers[0] == tiles['tiles']
+    # frames the frontend already has are not send again
+    del messages[:]
+    v.sequence_index = 2
+    assert [content['index'] for content, buffers in messages] == [4]
+    v._handle_custom_msg({'event': 'frame_request', 'index': 2}, [])
+    assert [content['index'] for content, buffers in messages] == [4, 2]
+    # the tiles depend on data_min, so the frontend drops its frames, and they are sent again, with the current frame
+    del messages[:]
+    states = []
+    v.send_state = lambda key=None: states.append(key)
+    v.data_min = 0.5
+    assert [content['msg'] for content, buffers in messages] == ['drop_frames', 'frame', 'frame']
+    assert [content['index'] for content, buffers in messages[1:]] == [3, 4]
+    np.testing.assert_array_equal(v.data, ipyvolume.utils.reduce_size(data[2], 4, v.extent)[0])
+    assert states == ['data_min', 'data']
+    slider = ipv.animation_control(v, add=False).children[1]
+    assert slider.max == 4
+
+
+class _LazyArray(object):
+    """Array-like that records the size of what is read from it, like a h5py or zarr dataset."""
+
+    def __init__(self, data):
+        self._data = data
+        self.shape = data.shape
+        self.dtype = data.dtype
+        self.ndim = data.ndim
+        self.reads = []
+
+    def __getitem__(self, index):
+        result = self._data[index]
+        self.reads.append(result.nbytes)
+        return result
+
+
+def test_volshow_out_of_core():
+    data = np.random.random((16, 16, 16)).astype(np.float32)
+    lazy = _LazyArray(data)
+    ipyvolume.utils.chunk_bytes = data.nbytes // 4
+    try:
+        assert ipyvolume.utils.nanminmax(lazy) == (np.nanmin(data), np.nanmax(data))
+        assert max(lazy.reads) <= data.nbytes // 4
+        del lazy.reads[:]
+        ipv.figure()
+        v = ipv.volshow(lazy, max_shape=8)
+        assert max(lazy.reads) <= data.nbytes // 4
+        expected, extent = ipyvolume.utils.reduce_size(data, 8, [(0, 16), (0, 16), (0, 16)])
+        np.testing.assert_allclose(v.data, expected, rtol=1e-6)
+        assert v.extent == extent
+        assert v.data_original is lazy
+
+        data = np.random.random((3, 16, 16, 16)).astype(np.float32)
+        lazy = _LazyArray(data)
+        v = ipv.volshow(lazy, max_shape=8)
+        v.sequence_index = 2
+        assert max(lazy.reads) <= data[0].nbytes // 4
+        np.testing.assert_allclose(v._compute_data(2)[1], ipyvolume.utils.reduce_size(data[2], 8, extent)[0], rtol=1e-6)
+
+        # the bricks of a frame are read in chunks as well, and computed once
+        lazy = _LazyArray(data)
+        v = ipv.volshow(lazy, max_shape=8, brick_size=4)  # also sends frame 1 and 2 ahead
+        assert max(lazy.reads) <= data[0].nbytes // 4
+        np.testing.assert_array_equal(
+            v._cache.get(('bricks', v._data_version, 2, 4)), ipyvolume.utils.brick_minmax(data[2], 4)[1]
+        )
+        del lazy.reads[:]
+        v._compute_data(2)
+        assert lazy.reads == []
+    finally:
+        ipyvolume.utils.chunk_bytes = 64 * 1024**2
+
+
+def test_statistics():
+    data = np.random.normal(size=(20, 30, 40))
+    data[0, 0, 0] = np.nan
+    ipyvolume.utils.chunk_bytes = data[0].nbytes * 3
+    try:
+        # the first chunk has a smaller range
+        data[:3] *= 0.1
+        stats = ipyvolume.utils.statistics(data)
+        stats.counts  # the histogram is computed in a second chunked pass
+    finally:
+        ipyvolume.utils.chunk_bytes = 64 * 1024**2
+    assert stats.vmin == np.nanmin(data)
+    assert stats.vmax == np.nanmax(data)
+    assert stats.count == data.size - 1
+    assert stats.counts.sum() == stats.count
+    max_error = 2 * (stats.vmax - stats.vmin) / len(stats.counts)
+    for q in [0.01, 0.5, 0.99]:
+        assert abs(stats.quantile(q) - np.nanpercentile(data, q * 100)) < max_error
+    # cached per array
+    assert ipyvolume.utils.statistics(data) is stats
+    assert ipyvolume.utils.statistics(data.copy()) is not stats
+
+    # the first slab is constant, and (much) larger than the range of the other values
+    small = np.random.uniform(-1e-3, 1e-3, size=(20, 30, 40))
+    small[:5] = 0
+    ipyvolume.utils.chunk_bytes = small[0].nbytes * 3
+    try:
+        small_stats = ipyvolume.utils.Statistics(small)
+        small_stats.counts
+        # or added slab by slab, so the histogram range is set at the first slab that is not constant, and grows
+        slab_stats = ipyvolume.utils.Statistics(small[0])
+        for slab in small[1:]:
+            slab_stats.update(slab)
+    finally:
+        ipyvolume.utils.chunk_bytes = 64 * 1024**2
+    max_error = 2 * (small.max() - small.min()) / len(small_stats.counts)
+    for stats_ in [small_stats, slab_stats]:
+        assert stats_.counts.sum() == small.size
+        for q in [0.1, 0.5, 0.9]:
+            assert abs(stats_.quantile(q) - np.percentile(small, q * 100)) < max_error
+    assert ipyvolume.utils.Statistics(np.ones(10)).median() == 1
+
+    # the histogram is only computed when a quantile is needed
+    ipv.figure()
+    other = data[1:]
+    ipv.plot_isosurface(other, level=0.5, controls=False)
+    assert (id(other), 1024) not in ipyvolume.utils._statistics_cache
+    v = ipv.volshow(other)
+    other_stats = ipyvolume.utils.statistics(other)
+    assert other_stats._data is not None
+    assert v.data_min == np.nanmin(other)
+    ipv.plot_isosurface(other)
+    assert ipyvolume.utils.statistics(other) is other_stats
+    assert other_stats._data is None
+    v = ipv.volshow(data, level=None)
+    assert v.data_min == stats.vmin
+    assert v.tf.level2 == pytest.approx((stats.median() - stats.vmin) / (stats.vmax - stats.vmin))
+
+
+def test_reduce_size_modes():
+    data = np.random.random((10, 9, 7)).astype(np.float32)
+    reduced, extent = ipyvolume.utils.reduce_size(data, 4, [(0, 7), (0, 9), (0, 10)])
+    # factors of 3, 3 and 2, dropping the last voxel in x and z
+    assert reduced.shape == (3, 3, 3)
+    assert reduced.dtype == np.float32
+    assert extent == [(0, 6), (0, 9), (0, 9)]
+    np.testing.assert_allclose(reduced[1, 2, 0], data[3:6, 6:9, 0:2].mean(), rtol=1e-6)
+    reduced = ipyvolume.utils.reduce_size(data, 4, extent, mode='max')[0]
+    assert reduced[1, 2, 0] == data[3:6, 6:9, 0:2].max()
+    reduced = ipyvolume.utils.reduce_size(data, 4, extent, mode='min')[0]
+    assert reduced[1, 2, 0] == data[3:6, 6:9, 0:2].min()
+    data = (data * 100).astype(np.uint8)
+    assert ipyvolume.utils.reduce_size(data, 4, extent, mode='max')[0].dtype == np.uint8
+
+    # a thin feature survives in a maximum intensity render
+    data = np.zeros((16, 16, 16))
+    data[:, 5, 5] = 1
+    ipv.figure()
+    v = ipv.volshow(data, max_shape=8)
+    assert v.data.max() == 0.25
+    v.rendering_method = 'MAX_INTENSITY'
+    assert v.data.max() == 1
+
+
+def test_compression():
+    import zlib
+
+    x = np.zeros(1000, dtype=np.float32)
+    ipv.figure()
+    scatter = ipv.scatter(x, x, x)
+    assert ipv.serialize.array_to_binary(x, scatter)['data'].nbytes == x.nbytes
+    ipv.serialize.compression = 'zlib'
+    ipv.serialize.compression_min_bytes = 100
+    try:
+        json = ipv.serialize.array_to_binary(x, scatter)
+        assert json['compression'] == 'zlib'
+        assert zlib.decompress(json['data']) == x.tobytes()
+        # small buffers, and arrays without a widget, are not compressed, widgets without a figure use the default
+        assert 'compression' not in ipv.serialize.array_to_binary(x[:10], scatter)
+        assert 'compression' not in ipv.serialize.array_to_binary(x)
+        assert ipv.serialize.array_to_binary(x, ipv.Scatter(x=x, y=x, z=x))['compression'] == 'zlib'
+
+        fig = ipv.figure(compression='none')
+        scatter = ipv.scatter(x, x, x)
+        assert scatter._figure is fig
+        assert 'compression' not in ipv.serialize.array_to_binary(x, scatter)
+        with pytest.raises(traitlets.TraitError):
+            fig.compression = 'foo'
+
+        ipv.figure()
+        data = np.zeros((16, 16, 16))
+        v = ipv.volshow(data, lighting=True)
+        json = ipv.serialize.cube_to_tiles(v.data, v)
+        assert json['compression'] == 'zlib'
+        assert zlib.decompress(json['tiles']) == ipv.serialize._cube_to_tiles(data, v.data_min, v.data_max)[0].tobytes()
+    finally:
+        ipv.serialize.compression = None
+        ipv.serialize.compression_min_bytes = 1024**2
+
+
+def test_compression_comm_open():
+    import zlib
+    import comm
+
+    messages = []
+    publish_msg = comm.DummyComm.publish_msg
+
+    def capture(self, msg_type, data=None, metadata=None, buffers=None, **keys):
+        messages.append((self, msg_type, data, buffers))
+        return publish_msg(self, msg_type, data=data, metadata=metadata, buffers=buffers, **keys)
+
+    def states(widget):
+        # the (message type, state) pairs send by widget, with the buffers put back in place
+        states = []
+        for c, msg_type, data, buffers in messages:
+            if c is widget.comm and 'state' in data:
+                state = data['state']
+                for path, buffer in zip(data['buffer_paths'], buffers):
+                    obj = state
+                    for key in path[:-1]:
+                        obj = obj[key]
+                    obj[path[-1]] = buffer
+                states.append((msg_type, state))
+        return states
+
+    x = np.arange(1000, dtype=np.float32)
+    ipv.serialize.compression_min_bytes = 100
+    comm.DummyComm.publish_msg = capture
+    try:
+        ipv.figure(compression='zlib')
+        # the state that is sent when the comm opens, before the scatter is added to the figure, is compressed
+        scatter = ipv.scatter(x, x, x)
+        msg_type, state = states(scatter)[0]
+        assert msg_type == 'comm_open'
+        assert state['x'][0]['compression'] == 'zlib'
+        assert np.frombuffer(zlib.decompress(state['x'][0]['data']), dtype=np.float32).tolist() == x.tolist()
+
+        # the volume sends its data right after the comm opens
+        volume = ipv.volshow(np.zeros((16, 16, 16)))
+        state = [state for msg_type, state in states(volume) if state.get('data') is not None][0]
+        assert state['data']['compression'] == 'zlib'
+    finally:
+        comm.DummyComm.publish_msg = publish_msg
+        ipv.serialize.compression_min_bytes = 1024**2
+
+
+def test_quantize():
+    x = np.random.normal(size=(2, 1000))
+    x[0, 0] = np.nan
+    values, offset, scale = ipv.serialize.quantize(x[1])
+    assert values.dtype == np.uint16
+    assert np.abs(offset + values * scale - x[1]).max() <= scale / 2 * (1 + 1e-9)
+
+    ipv.figure()
+    s = ipv.scatter(x, x, x, quantize=True)
+    jsons = ipv.serialize.position_sequence_to_binary_or_json(s.x, s)
+    assert len(jsons) == 2
+    assert jsons[0]['dtype'] == 'uint16'
+    assert jsons[0]['data'].nbytes == 2 * 1000
+    assert np.frombuffer(jsons[0]['data'], dtype=np.uint16)[0] == 65535
+    errors = s.quantization_error()
+    assert errors['x'] == max(ipv.serialize.quantize(x[0])[2], ipv.serialize.quantize(x[1])[2]) / 2
+    s.quantize = False
+    assert ipv.serialize.position_sequence_to_binary_or_json(s.x, s)['dtype'] == 'float32'
+
+
+def test_keyframes():
+    x = np.cumsum(np.random.normal(scale=0.01, size=(10, 100)), axis=0)
+    x[5, 3] = np.nan
+    ipv.figure()
+    s = ipv.scatter(x, x, x, keyframe_interval=4)
+    jsons = ipv.serialize.position_sequence_to_binary_or_json(s.x, s)
+    # frame 5 has a NaN, so it and the frame after it are send in full, like the keyframes
+    keyframes = [index for index, serialized in enumerate(jsons) if serialized['dtype'] == 'float32']
+    assert keyframes == [0, 4, 5, 6, 8]
+    # reconstruct the frames like the frontend does
+    error = s.quantization_error()['x']
+    frame = None
+    for index, serialized in enumerate(jsons):
+        values = np.frombuffer(serialized['data'], dtype=serialized['dtype'])
+        if 'delta_scale' in serialized:
+            frame = (frame + values * serialized['delta_scale']).astype(np.float32)
+        else:
+            frame = values
+        np.testing.assert_array_less(np.abs(frame - x[index])[np.isfinite(x[index])], error + 1e-6)
+
+
+def test_pack_sequence():
+    x = np.arange(6, dtype=np.float64).reshape((2, 3))
+    json = ipv.serialize.array_sequence_to_binary_or_json(x)
+    assert json['offsets'] == [0, 3, 6]
+    assert json['dtype'] == 'float32'
+    assert np.frombuffer(json['data'], dtype=np.float32).tolist() == list(range(6))
+
+    ragged = [np.arange(2), np.arange(3, dtype=np.int8), [1.5]]
+    json = ipv.serialize.array_sequence_to_binary_or_json(ragged)
+    assert json['offsets'] == [0, 2, 5, 6]
+    assert json['dtype'] == 'float32'
+    assert np.frombuffer(json['data'], dtype=np.float32).tolist() == [0, 1, 0, 1, 2, 1.5]
+
+
+def test_wire_cache():
+    cache = ipv.serialize.wire_cache
+    cache.clear()
+    x = np.random.random((4, 200000))
+    ipv.figure()
+    s = ipv.scatter(x[0], x[1], x[2])
+    json = ipv.serialize.array_to_binary(s.x, s)
+    assert ipv.serialize.array_to_binary(s.x, s) is json
+    # views of the same memory are cached as well
+    assert ipv.serialize.pack_sequence(x, s) is ipv.serialize.pack_sequence(x, s)
+    assert cache.info()['nbytes'] == 3 * x[0].nbytes // 2 + x.nbytes // 2
+    s.x = x[3]
+    assert len(cache) == 1  # only the buffer of x[3], which was just sent
+    json = ipv.serialize.array_to_binary(s.x, s)
+    assert len(cache) == 1
+    assert json is not ipv.serialize.array_to_binary(s.x, ipv.scatter(s.x, s.y, s.z))  # cached per widget
+    # modified in place and assigned again
+    s.x[:] = 2
+    s.x = s.x
+    json = ipv.serialize.array_to_binary(s.x, s)
+    assert np.frombuffer(json['data'], dtype=json['dtype']).tolist() == [2] * len(x[3])
+
+    ipv.serialize.cast_chunk_bytes = 1024
+    ipv.serialize.slab_workers = 4
+    try:
+        x = np.random.random((3, 1000))
+        for ar in [x, x.T, x[1]]:
+            np.testing.assert_array_equal(ipv.serialize._cast(ar, np.dtype(np.float32)), ar.astype(np.float32))
+    finally:
+        ipv.serialize.cast_chunk_bytes = 16 * 1024**2
+        ipv.serialize.slab_workers = None
+
+
+def test_color_uint8():
+    json = ipv.serialize.color_to_binary_or_json(np.array(['red', '#00ff00', 'red', 'blue']))[0]
+    assert json['dtype'] == 'uint8'
+    rgba = np.frombuffer(json['data'], dtype=np.uint8).reshape(json['shape'])
+    assert rgba.tolist() == [[255, 0, 0, 255], [0, 255, 0, 255], [255, 0, 0, 255], [0, 0, 255, 255]]
+    assert ipv.serialize.color_to_binary_or_json(np.array('red')) == 'red'
+    # the memo of the lookups is bounded
+    ipv.serialize.strings_to_rgba(np.array(['#%06x' % k for k in range(2000)]))
+    assert ipv.serialize._color_to_rgba.cache_info().currsize == 1024
+
+    colors = np.random.random((2, 10, 3))
+    colors[0, 0, 0] = 1.5
+    jsons = ipv.serialize.color_to_binary_or_json(colors)
+    assert len(jsons) == 2
+    rgba = np.frombuffer(jsons[0]['data'], dtype=np.uint8).reshape(jsons[0]['shape'])
+    assert rgba.shape == (10, 4)
+    assert rgba[0, 0] == 255
+    assert (rgba[:, 3] == 255).all()
+    np.testing.assert_allclose(rgba[1:, :3] / 255.0, colors[0, 1:], atol=0.5 / 255 + 1e-7)
+    # uint8 colors are in [0, 255]
+    json = ipv.serialize.color_to_binary_or_json(rgba[:, :3].copy())[0]
+    assert (np.frombuffer(json['data'], dtype=np.uint8).reshape(json['shape']) == rgba).all()
+    # scalars for a colormap stay floats
+    assert ipv.serialize.color_to_binary_or_json(np.random.random(10))[0]['dtype'] == 'float32'
+
+
+def test_colormap():
+    x, y, z = np.random.random((3, 2, 100))
+    values = np.random.normal(size=(2, 100))
+    p3.figure()
+    s = p3.scatter(x, y, z, color=values, colormap='viridis', vmax=2)
+    assert s.color_scale.min == np.min(values)
+    assert s.color_scale.max == 2
+    assert len(s.color_scale.colors) == 32
+    # a sequence of scalars, one frame of (N,) per element
+    jsons = ipv.serialize.color_to_binary_or_json(s.color, s)
+    assert [json['shape'] for json in jsons] == [(100,), (100,)]
+    assert jsons[0]['dtype'] == 'float32'
+    s.quantize = True
+    jsons = ipv.serialize.color_to_binary_or_json(s.color, s)
+    assert jsons[0]['dtype'] == 'uint16'
+    decoded = jsons[1]['offset'] + np.frombuffer(jsons[1]['data'], dtype=np.uint16) * jsons[1]['scale']
+    np.testing.assert_allclose(decoded, values[1], atol=jsons[1]['scale'] / 2 + 1e-6)
+
+    # rgb colors, or 3 scalars for 100 frames?
+    with pytest.raises(ValueError):
+        ipv.serialize.color_to_binary_or_json(np.random.random((100, 3)), s)
+    assert len(ipv.serialize.color_to_binary_or_json(np.random.random((2, 100, 3)), s)) == 2  # rgb sequence
+
+    mesh = p3.plot_mesh(*np.random.random((3, 5, 6)), color=np.arange(30).reshape(5, 6), colormap='gray')
+    assert mesh.color.shape == (30,)
+    assert (mesh.color_scale.min, mesh.color_scale.max) == (0, 29)
+
+
+def test_texture_shared():
+    import PIL.Image
+    import ipywidgets.embed
+
+    pixels = np.zeros((4, 6, 3), dtype=np.uint8)
+    pixels[0] = 255  # top row white
+    image = PIL.Image.fromarray(pixels)
+    ipv.figure()
+    s1 = ipv.scatter(*np.random.random((3, 10)), texture=[image, image.copy()])
+    assert len(s1.texture_frames) == 2  # set on construction, before the comm opens
+    refs = ipv.serialize.texture_to_json(s1.texture, s1)
+    assert len(refs) == 2 and refs[0] == refs[1]
+    texture = s1.texture_frames[0]
+    assert ipv.serialize.texture_registry[ipv.serialize._image_hash(image)] is texture
+    assert refs[0] == 'IPY_MODEL_' + texture.model_id
+    assert texture.data.shape == (4, 8, 4)  # resized to a power of two
+    assert (texture.data[-1] == 255).all()  # flipped, the top row is the last one
+    assert (texture.data[0, :, 3] == 255).all() and (texture.data[0, :, :3] == 0).all()
+    serialized = ipv.serialize.rgba_to_binary(texture.data)
+    assert serialized['compression'] == 'zlib' and len(serialized['data']) < texture.data.nbytes
+    assert (ipv.serialize.binary_to_array(serialized) == texture.data).all()
+
+    # widgets with the same image content refer to the same texture, which is embedded
+    s2 = ipv.scatter(*np.random.random((3, 10)), texture=PIL.Image.fromarray(pixels))
+    assert ipv.serialize.texture_to_json(s2.texture, s2) == refs[:1]
+    state = ipywidgets.embed.dependency_state([s2])
+    assert state[texture.model_id]['model_name'] == 'TextureModel'
+
+    # the state of texture is sent after its observer updated texture_frames, in one message
+    s3 = ipv.scatter(*np.random.random((3, 10)))
+    states = []
+    s3.send_state = lambda key=None: states.append(s3.get_state(key))
+    s3.texture = PIL.Image.fromarray(255 - pixels)
+    assert len(states) == 1
+    assert states[0]['texture'] == states[0]['texture_frames'] == ['IPY_MODEL_' + s3.texture_frames[0].model_id]
+    s3.close()
+
+    # closed when no longer used
+    s1.texture = None
+    assert s1.texture_frames == [] and texture.comm is not None
+    s2.close()
+    assert texture.comm is None
+    assert ipv.serialize._image_hash(image) not in ipv.serialize.texture_registry
+
+    urls = ipv.serialize.texture_to_json(image, None)
+    assert urls[0].startswith('data:image/png;base64,')
+
+
+def test_update_points():
+    x, y, z = np.random.random((3, 2, 1000))
+    ipv.figure()
+    s = ipv.scatter(x, y, z, color=np.random.random((1000, 3)))
+    messages = []
+    s.send = lambda content, buffers: messages.append((content, buffers))
+    notifications = []
+    s.observe(notifications.append, 'x')
+    s.x = s.x  # same object, nothing to compare or send
+    assert notifications == []
+    # only the arrays that support update_points are compared by identity
+    assert isinstance(ipv.Scatter.x, ipv.traittypes.PointArray)
+    assert not isinstance(ipv.Mesh.triangles, ipv.traittypes.PointArray)
+
+    indices = np.array([5, 10, 600, 601])
+    s.update_points(indices, x=-1, color='red')
+    assert (s.x[:, indices] == -1).all()
+    assert (s.color[indices] == [1, 0, 0]).all()
+    assert notifications == []
+    # all arrays are sent in a single message
+    [(content, buffers)] = messages
+    content_x, content_color = content['arrays']
+    assert content_x['name'] == 'x'
+    # close points are merged in a single range, for each frame
+    ranges = [(r['frame'], r['start'], r['end']) for r in content_x['ranges']]
+    assert ranges == [(0, 5, 11), (0, 600, 602), (1, 5, 11), (1, 600, 602)]
+    assert len(buffers) == 4 + 2
+    np.testing.assert_array_equal(np.frombuffer(buffers[2], dtype=np.float32), x[1, 5:11].astype(np.float32))
+    assert content_color['ranges'][0]['dtype'] == 'uint8'
+    assert np.frombuffer(buffers[5], dtype=np.uint8).reshape(2, 4).tolist() == [[255, 0, 0, 255]] * 2
+
+    s.size = 5
+    with pytest.raises(ValueError):
+        s.update_points(slice(0, 10), size=1)
+
+
+def test_streaming_scatter():
+    stream = ipv.StreamingScatter(1000, color=np.zeros((1000, 3)))
+    messages = []
+    stream.send = lambda content, buffers: messages.append((content, buffers))
+    assert np.isnan(stream.x).all()
+    stream.append(*np.arange(3 * 600).reshape(3, 600), color='red')
+    assert stream.count == 600
+    assert (stream.x[:600] == np.arange(600)).all()
+    assert (stream.color[:600] == [1, 0, 0]).all()
+    assert len(messages) == 1  # a single message for all arrays
+    arrays = messages[0][0]['arrays']
+    assert sorted(array['name'] for array in arrays) == ['color', 'x', 'y', 'z']
+    assert all([(r['start'], r['end']) for r in array['ranges']] == [(0, 600)] for array in arrays)
+    # wraps around, the oldest points are replaced
+    stream.append(*np.arange(3 * 600).reshape(3, 600))
+    assert stream.count == 1000
+    assert (stream.x[:200] == np.arange(400, 600)).all()
+    assert (stream.x[600:] == np.arange(400)).all()
+    content = messages[-1][0]
+    assert [array['name'] for array in content['arrays']] == ['x', 'y', 'z']
+    assert [(r['start'], r['end']) for r in content['arrays'][2]['ranges']] == [(0, 200), (600, 1000)]
+    # appending more points than the capacity keeps the last ones
+    stream.append(*np.arange(3 * 2500).reshape(3, 2500))
+    assert sorted(stream.x.tolist()) == list(range(1500, 2500))
+    throughput = stream.throughput()
+    assert throughput['points'] == 3700
+    assert throughput['bytes'] == (600 + 600 + 1000) * 3 * 4 + 600 * 4  # float32 positions and uint8 rgba colors
+
+    # the color_scale example of the docstring: scalar colors are updated in place, and sent as float32
+    import bqplot.scales
+
+    stream = ipv.StreamingScatter(1000, color=np.zeros(1000), color_scale=bqplot.scales.ColorScale(min=0, max=1))
+    messages = []
+    stream.send = lambda content, buffers: messages.append((content, buffers))
+    color = stream.color
+    stream.append(*np.random.random((3, 10)), color=np.linspace(0, 1, 10))
+    assert stream.color is color
+    assert (stream.color[:10] == np.linspace(0, 1, 10)).all()
+    [(content, buffers)] = messages
+    [content_color] = [array for array in content['arrays'] if array['name'] == 'color']
+    assert content_color['ranges'][0]['dtype'] == 'float32'
+    index = content['buffer_paths'].index(['arrays', content['arrays'].index(content_color), 'ranges', 0, 'data'])
+    np.testing.assert_array_equal(np.frombuffer(buffers[index], dtype=np.float32), np.linspace(0, 1, 10, dtype=np.float32))
+
+
+def test_points_in_polygon():
+    import matplotlib.path
+
+    x, y = np.random.random((2, 100000)) * 3 - 1.5
+    angle = np.linspace(0, 2 * np.pi, 50, endpoint=False)
+    radius = 1 + 0.4 * np.sin(angle * 5)
+    polygon = np.array([radius * np.cos(angle), radius * np.sin(angle)]).T
+    expected = matplotlib.path.Path(polygon).contains_points(np.array([x, y]).T)
+    mask = ipyvolume.utils.points_in_polygon(x, y, polygon.tolist())
+    assert mask.dtype == bool
+    assert (mask == expected).all()
+    # self intersecting (bow tie) lasso, and 2d input
+    bowtie = [[-1, -1], [1, 1], [1, -1], [-1, 1]]
+    mask = ipyvolume.utils.points_in_polygon(x.reshape(100, -1), y.reshape(100, -1), bowtie)
+    assert mask.shape == (100, 1000)
+    assert (mask.ravel() == matplotlib.path.Path(bowtie).contains_points(np.array([x, y]).T)).all()
+    assert not ipyvolume.utils.points_in_polygon(x, y, [[0, 0], [1, 1]]).any()
+
+    mask = ipyvolume.utils.points_in_circle(x, y, (0.5, 0), 0.5)
+    assert (mask == (((x - 0.5) ** 2 + y ** 2) < 0.25)).all()
+    mask = ipyvolume.utils.points_in_rectangle(x, y, -0.5, 0.2, 0, 1)
+    assert (mask == ((x >= -0.5) & (x <= 0.2) & (y >= 0) & (y <= 1))).all()
+
+
+def test_selection_frontend():
+    mask = np.random.random(1000) > 0.5
+    bitmask = np.packbits(mask, bitorder='little').tobytes()
+    assert (ipyvolume.serialize.selection_to_mask({'encoding': 'bitmask', 'length': 1000}, bitmask) == mask).all()
+    ranges = np.array([[2, 5], [5, 7], [990, 1000]], dtype=np.uint32).tobytes()
+    mask = ipyvolume.serialize.selection_to_mask({'encoding': 'ranges', 'length': 1000}, memoryview(ranges))
+    assert np.where(mask)[0].tolist() == list(range(2, 7)) + list(range(990, 1000))
+
+    fig = p3.figure()
+    s = p3.scatter(*np.random.random((3, 16)))
+    selections = []
+    fig.on_selection(selections.append)
+    bitmask = np.packbits(np.arange(16) < 3, bitorder='little').tobytes()
+    content = {
+        'event': 'selection',
+        'data': {'type': 'lasso', 'scatters': [{'model': s.model_id, 'encoding': 'bitmask', 'length': 16}]},
+    }
+    fig._handle_custom_msg(content, [memoryview(bitmask)])
+    assert 'scatters' not in selections[0]
+    assert np.where(selections[0]['masks'][s.model_id])[0].tolist() == [0, 1, 2]
+
+
+def test_bitset_selection():
+    Bitset = ipyvolume.utils.Bitset
+    a = Bitset.from_indices([0, 3, 99, 100], 100)
+    b = Bitset.from_mask(np.arange(100) < 5)
+    assert a.indices().tolist() == [0, 3, 99]
+    assert a.nbytes == 13 and len(a.bits) == 16
+    assert (a | b).indices().tolist() == [0, 1, 2, 3, 4, 99]
+    assert (a & b).indices().tolist() == [0, 3]
+    assert (a - b).indices().tolist() == [99]
+    assert a.combine(b, 'replace') == b
+    assert np.asarray(a.combine(b, 'subtract')).tolist() == [99]
+    assert (a | b).count() == 6
+    with pytest.raises(ValueError):
+        a | Bitset.from_mask([True])
+
+    p3.figure()
+    s = p3.scatter(*np.random.random((3, 100)), selection=a)
+    json = ipyvolume.serialize.selection_to_binary_or_json(s.selected, s)
+    assert json['length'] == 100 and json['bitmask']['data'].nbytes == 13
+    assert ipyvolume.serialize.json_to_selection(json, s) == a
+    # index arrays (e.g. set by the bokeh link) are still supported
+    s.selected = [1, 2]
+    assert ipyvolume.serialize.json_to_selection([1, 2], s).tolist() == [1, 2]
+
+    fig = p3.gcf()
+    fig.selection_mode = 'or'
+    p3.selector_default()
+    mask = np.arange(100) >= 98
+    scatters = [{'model': s.model_id, 'encoding': 'bitmask', 'length': 100}]
+    selection = {'type': 'lasso', 'device': [], 'scatters': scatters}
+    fig._handle_custom_msg({'event': 'selection', 'data': selection}, [np.packbits(mask, bitorder='little')])
+    assert s.selected.indices().tolist() == [1, 2, 98, 99]
+
+
+def test_project_scatters():
+    fig = p3.figure()
+    x, y, z = np.random.random((3, 2, 1000)) * 2 - 1
+    s1 = p3.scatter(x, y, z)
+    s2 = p3.scatter(x[0] * 4, y[0], z[0])
+    s1.sequence_index = 3  # wraps around to frame 1
+    # some perspective projection and a translation in the world matrix
+    fig.matrix_world = [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0.1, 0, -3, 1]
+    fig.matrix_projection = [1.5, 0, 0, 0, 0, 2, 0, 0, 0, 0, -1.1, -1, 0, 0, -2.1, 0]
+    (xy1, depth1, in_frustum1), (xy2, depth2, in_frustum2) = fig.project_scatters()
+    assert xy1.dtype == np.float32 and xy1.shape == (2, 1000)
+
+    M = np.dot(np.reshape(fig.matrix_projection, (4, 4)).T, np.reshape(fig.matrix_world, (4, 4)).T)
+    expected = np.dot(M, [x[1], y[1], z[1], np.ones(1000)])
+    expected = expected[:3] / expected[3]
+    assert np.allclose(xy1, expected[:2], rtol=1e-5, atol=1e-6)
+    assert np.allclose(depth1, expected[2], rtol=1e-5, atol=1e-6)
+    assert (in_frustum1 == (np.abs(expected) <= 1).all(axis=0)).all()
+    assert in_frustum1.all() and not in_frustum2.all()
+    assert np.allclose(fig.project(x[0] * 4, y[0], z[0]), xy2)
+    assert np.array_equal(fig.project_scatters([s2])[0][0], xy2)
+
+    chunk_size, ipyvolume.utils.projection_chunk_size = ipyvolume.utils.projection_chunk_size, 100
+    try:
+        xy, depth, in_frustum = fig.project_scatters([s1])[0]
+        assert np.array_equal(xy, xy1) and np.array_equal(in_frustum, in_frustum1)
+    finally:
+        ipyvolume.utils.projection_chunk_size = chunk_size
+    # points behind the camera
+    assert not ipyvolume.utils.project_points(M, [0], [0], [10])[2][0]
+
+
 def test_bokeh():
     from bokeh.plotting import figure
     import ipyvolume.bokeh
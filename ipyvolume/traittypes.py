@@ -1,4 +1,8 @@
+from __future__ import absolute_import
+
 from traitlets import TraitType
+import traittypes
+import numpy as np
 import PIL.Image
 
 
@@ -12,3 +16,39 @@ class Image(TraitType):
         if isinstance(value, PIL.Image.Image):
             return value
         self.error(obj, value)
+
+
+class ArrayLike(TraitType):
+    """A trait for numpy arrays, or array-like objects that are sliced lazily, such as h5py/zarr datasets.
+
+    Objects with a shape, dtype and __getitem__ are kept as they are, other values are converted using np.asarray.
+    """
+
+    default_value = None
+    info_text = 'a numpy array or array-like object'
+
+    def validate(self, obj, value):
+        if value is None and self.allow_none:
+            return value
+        if all(hasattr(value, name) for name in ['shape', 'dtype', '__getitem__']):
+            return value
+        try:
+            return np.asarray(value)
+        except (TypeError, ValueError):
+            self.error(obj, value)
+
+
+class PointArray(traittypes.Array):
+    """Like traittypes.Array, but a change is detected by identity instead of comparing all elements.
+
+    Used for the arrays of Mesh and Scatter that support update_points. Assigning another array always notifies
+    observers (and syncs), assigning the same array object does not, which keeps assigning large arrays cheap. To
+    change part of an array in place, use update_points.
+    """
+
+    def set(self, obj, value):
+        new_value = self._validate(obj, value)
+        old_value = obj._trait_values.get(self.name, self.default_value)
+        obj._trait_values[self.name] = new_value
+        if new_value is not old_value:
+            obj._notify_trait(self.name, old_value, new_value)
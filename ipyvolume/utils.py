@@ -3,6 +3,7 @@ from __future__ import print_function
 import os
 import io
 import time
+import weakref
 import functools
 import collections
 
@@ -193,24 +194,362 @@ def download_to_file(url, filepath, resume=False, overwrite=False, chunk_size=10
     print("] Finished")
 
 
-def reduce_size(data, max_size, extent):
+# maximum size of a chunk read from array-like objects that may not be in memory (e.g. h5py/zarr arrays or memmaps)
+chunk_bytes = 64 * 1024**2
+
+
+def _chunk_length(dtype, item_shape, multiple=1):
+    """Number of items of item_shape that fit in chunk_bytes, rounded down to a multiple (but at least multiple)."""
+    item_bytes = np.dtype(dtype).itemsize * int(np.prod(item_shape))
+    length = chunk_bytes // max(1, item_bytes)
+    return max(multiple, length // multiple * multiple)
+
+
+def _iter_chunks(data, prefix=()):
+    """Yield chunks of an array-like as numpy arrays, of at most chunk_bytes when possible, along the first axes."""
+    shape = data.shape[len(prefix) :]
+    if len(shape) > 3 and _chunk_length(data.dtype, shape[1:]) == 1:
+        # a single item (e.g. a frame of a time series) does not fit in a chunk, go one axis deeper
+        for index in range(shape[0]):
+            for chunk in _iter_chunks(data, prefix + (index,)):
+                yield chunk
+        return
+    length = _chunk_length(data.dtype, shape[1:])
+    for start in range(0, shape[0], length):
+        yield np.asarray(data[prefix + (slice(start, start + length),)])
+
+
+def nanminmax(data):
+    """Compute the minimum and maximum, ignoring NaN, of an array-like in chunks along the first axes."""
+    vmin = vmax = np.nan
+    for chunk in _iter_chunks(data):
+        if chunk.size:
+            vmin = np.fmin(vmin, np.nanmin(chunk))
+            vmax = np.fmax(vmax, np.nanmax(chunk))
+    return vmin, vmax
+
+
+class Statistics(object):
+    """Minimum, maximum, histogram and approximate quantiles of (finite values of) an array, computed in chunks.
+
+    The minimum and maximum are computed in one pass on construction, the histogram in a second pass over the data
+    when it is first needed (e.g. for a quantile), with its range set to (vmin, vmax). For chunks added by
+    :any:`update`, the range grows by doubling when a chunk falls outside of it, so each bin is at most
+    2 * (vmax - vmin) / bins wide, which bounds the error of the quantiles.
+
+    :param data: numpy array or array-like (such as a h5py or zarr dataset)
+    :param int bins: number of bins of the histogram (even)
+    """
+
+    def __init__(self, data, bins=1024):
+        self.vmin = self.vmax = np.nan
+        self.count = 0
+        self._counts = np.zeros(bins, dtype=np.int64)
+        self._range = None
+        for chunk in _iter_chunks(data):
+            chunk = _finite(chunk)
+            if chunk.size:
+                self.vmin = np.fmin(self.vmin, chunk.min())
+                self.vmax = np.fmax(self.vmax, chunk.max())
+                self.count += chunk.size
+        self._data = lambda: data  # for the histogram, replaced by a weak reference when cached, see statistics
+
+    def _compute_histogram(self):
+        data = self._data()
+        self._data = None
+        if data is None:
+            raise ValueError('the data of these statistics no longer exists, so the histogram cannot be computed')
+        if self.vmax > self.vmin:  # otherwise all values are equal, and the range is set by update when they are not
+            self._range = (self.vmin, self.vmax)
+            for chunk in _iter_chunks(data):
+                self._counts += np.histogram(_finite(chunk), bins=len(self._counts), range=self._range)[0]
+
+    @property
+    def counts(self):
+        if self._data is not None:
+            self._compute_histogram()
+        return self._counts
+
+    @property
+    def range(self):
+        if self._data is not None:
+            self._compute_histogram()
+        return self._range
+
+    def update(self, chunk):
+        """Add the values of a chunk to the statistics."""
+        chunk = _finite(chunk)
+        if chunk.size == 0:
+            return
+        counts = self.counts  # the histogram of the values before this chunk
+        cmin, cmax = chunk.min(), chunk.max()
+        previous, previous_count = self.vmin, self.count
+        self.vmin = np.fmin(self.vmin, cmin)
+        self.vmax = np.fmax(self.vmax, cmax)
+        self.count += chunk.size
+        if self._range is None:
+            if self.vmin == self.vmax:  # all values so far are equal, the range is known when they are not
+                return
+            self._range = (self.vmin, self.vmax)
+            if previous_count:  # the values before this chunk, which all equal previous
+                weighted = np.histogram([previous], bins=len(counts), range=self._range, weights=[previous_count])[0]
+                counts = counts + weighted.astype(counts.dtype)
+        lo, hi = self._range
+        while cmin < lo or cmax > hi:
+            half = np.zeros(len(counts) // 2, dtype=counts.dtype)
+            merged = counts.reshape(-1, 2).sum(axis=1)
+            if cmin < lo:
+                counts = np.concatenate([half, merged])
+                lo -= hi - lo
+            else:
+                counts = np.concatenate([merged, half])
+                hi += hi - lo
+        self._range = (lo, hi)
+        self._counts = counts + np.histogram(chunk, bins=len(counts), range=self._range)[0]
+
+    @property
+    def edges(self):
+        return np.linspace(self.range[0], self.range[1], len(self.counts) + 1) if self.range else None
+
+    def quantile(self, q):
+        """Approximate q-th quantile (0 <= q <= 1), linearly interpolated within a histogram bin."""
+        if self.count == 0:
+            return np.nan
+        if self.range is None:  # all values are equal
+            return float(self.vmin)
+        cumulative = np.cumsum(self.counts)
+        target = q * self.count
+        index = min(np.searchsorted(cumulative, target), len(self.counts) - 1)
+        before = cumulative[index - 1] if index > 0 else 0
+        fraction = (target - before) / self.counts[index] if self.counts[index] else 0
+        edges = self.edges
+        value = edges[index] + fraction * (edges[index + 1] - edges[index])
+        return float(np.clip(value, self.vmin, self.vmax))
+
+    def median(self):
+        return self.quantile(0.5)
+
+
+def _finite(chunk):
+    chunk = np.asarray(chunk, dtype=np.float64).ravel()
+    return chunk[np.isfinite(chunk)]
+
+
+_statistics_cache = {}
+
+
+def statistics(data, bins=1024):
+    """Return the (cached) :any:`Statistics` of an array or array-like.
+
+    The cache holds a weak reference to the data, and assumes it is not modified in place. The histogram is computed
+    from the data when first needed, so keep a reference to the data until then.
+    """
+    key = (id(data), bins)
+    entry = _statistics_cache.get(key)
+    if entry is not None and entry[0]() is data:
+        return entry[1]
+    stats = Statistics(data, bins=bins)
+    try:
+        ref = weakref.ref(data, lambda _ref, key=key: _statistics_cache.pop(key, None))
+    except TypeError:  # e.g. a list, we do not cache
+        return stats
+    stats._data = ref  # a strong reference would keep the data, and so the cache entry, alive
+    _statistics_cache[key] = (ref, stats)
+    return stats
+
+
+_reductions = {'mean': np.mean, 'max': np.fmax.reduce, 'min': np.fmin.reduce}
+
+
+def block_reduce(data, factors, mode='mean'):
+    """Reduce a 3d array by integer factors along each axis, by taking the mean, max or min of each block.
+
+    Values at the end of an axis that do not fill a whole block are dropped. The max and min modes ignore NaN and keep
+    the dtype, the mean keeps floating point dtypes, integers are averaged into float64.
+
+    :param data: 3d numpy array
+    :param factors: block size (integer) for each axis
+    :param str mode: 'mean', 'max' or 'min'
+    """
+    if all(factor == 1 for factor in factors):
+        return data
+    lengths = [length // factor for length, factor in zip(data.shape, factors)]
+    data = data[tuple(slice(0, length * factor) for length, factor in zip(lengths, factors))]
+    blocks = data.reshape(lengths[0], factors[0], lengths[1], factors[1], lengths[2], factors[2])
+    if mode == 'mean':
+        dtype = data.dtype if np.issubdtype(data.dtype, np.floating) else np.float64
+        return np.mean(blocks, axis=(1, 3, 5), dtype=dtype)
+    return _reductions[mode](blocks, axis=(1, 3, 5))
+
+
+def _reduce_factor(length, max_size):
+    return 1 if max_size is None or length <= max_size else -(-length // max_size)
+
+
+def _reduced_extent(extent, lengths, factors):
+    """The extent of the data that remains after block_reduce drops the values that do not fill a whole block."""
     new_extent = []
-    for axis in range(3):
-        shape = data.shape
-        xmin, xmax = extent[2 - axis]
-        while shape[axis] > max_size:
-            slices1 = [slice(None, None, None)] * 3
-            slices1[axis] = slice(0, -1, 2)
-            slices2 = [slice(None, None, None)] * 3
-            slices2[axis] = slice(1, None, 2)
-            # print(data.shape, data.__getitem__(slices1).shape, data.__getitem__(slices2).shape)
-            data = (data[slices1] + data[slices2]) / 2
-            if shape[axis] % 2:
-                width = xmax - xmin
-                xmax = xmin + width / shape[axis] * (shape[axis] - 1)
-            shape = data.shape
-        new_extent.append((xmin, xmax))
-    return data, new_extent[::-1]
+    for (xmin, xmax), length, factor in zip(extent, lengths[::-1], factors[::-1]):
+        kept = length // factor * factor
+        new_extent.append((xmin, xmin + (xmax - xmin) / length * kept) if kept != length else (xmin, xmax))
+    return new_extent
+
+
+def reduce_size(data, max_size, extent, mode='mean'):
+    """Reduce data in blocks (see :any:`block_reduce`) such that each axis has a length of at most max_size.
+
+    :return: the reduced data and its extent
+    """
+    factors = [_reduce_factor(length, max_size) for length in data.shape]
+    return block_reduce(data, factors, mode), _reduced_extent(extent, data.shape, factors)
+
+
+def read_reduced(data, view, max_size, extent, factors=None, mode='mean'):
+    """Slice and reduce data like reduce_size(data[view], max_size, extent, mode), reading data in chunks.
+
+    Data can be any array-like that supports slicing, such as a h5py or zarr dataset, and only the (reduced) chunks
+    are in memory at any time. The first element of view can be an integer, e.g. to select a frame of 4d data.
+    Instead of max_size, the reduction factor for each axis can be given.
+    """
+    prefix = tuple(view[:-3])
+    view = tuple(view[-3:])
+    lengths = [len(range(*s.indices(n))) for s, n in zip(view, data.shape[-3:])]
+    factors = factors or [_reduce_factor(length, max_size) for length in lengths]
+    z_offset, z_end, z_step = view[0].indices(data.shape[-3])
+    if z_step != 1:
+        raise ValueError('only contiguous slices are supported, not %r' % (view[0],))
+    # chunks along z should contain a whole number of blocks
+    chunk_length = _chunk_length(data.dtype, data.shape[-2:], factors[0])
+    chunks = []
+    kept_z = lengths[0] // factors[0] * factors[0]
+    for start in range(0, kept_z, chunk_length):
+        end = min(kept_z, start + chunk_length)
+        chunk = np.asarray(data[prefix + (slice(z_offset + start, z_offset + end),) + view[1:]])
+        chunks.append(block_reduce(chunk, factors, mode))
+    return np.concatenate(chunks, axis=0), _reduced_extent(extent, lengths, factors)
+
+
+def build_pyramid(data, extent, max_size, mode='mean'):
+    """Build a list of (data, extent) levels, where each level is half the size of the previous.
+
+    The first level is the data itself, and levels are added until the data fits in max_size. Axes of length 1 are
+    not reduced further.
+    """
+    levels = [(data, extent)]
+    while max(data.shape) > max_size:
+        factors = [2 if length > 1 else 1 for length in data.shape]
+        if isinstance(data, np.ndarray):
+            data, extent = block_reduce(data, factors, mode), _reduced_extent(extent, data.shape, factors)
+        else:
+            # the first level is read in chunks, so that data does not need to fit in memory
+            data, extent = read_reduced(data, [slice(None)] * 3, None, extent, factors, mode)
+        levels.append((data, extent))
+    return levels
+
+
+def brick_minmax(data, brick_size, frame=None):
+    """Return the minimum and maximum (ignoring NaN) of each brick of brick_size^3 voxels.
+
+    The bricks at the upper edges can be smaller when the shape is not a multiple of brick_size.
+
+    :param data: 3d array(-like), or 4d for a time series
+    :param frame: for a time series, the index of the frame
+    """
+    all_mins = []
+    all_maxs = []
+    # data can be an array-like that is not in memory, so we read whole bricks in chunks along the first (spatial)
+    # axis, also for a frame of a time series, which may not fit in memory either
+    prefix = () if frame is None else (frame,)
+    shape = data.shape[-3:]
+    length = _chunk_length(data.dtype, shape[1:], brick_size)
+    for start in range(0, shape[0], length):
+        mins = maxs = np.asarray(data[prefix + (slice(start, start + length),)])
+        for axis in range(3):
+            indices = np.arange(0, mins.shape[axis], brick_size)
+            mins = np.fmin.reduceat(mins, indices, axis=axis)
+            maxs = np.fmax.reduceat(maxs, indices, axis=axis)
+        all_mins.append(mins)
+        all_maxs.append(maxs)
+    return np.concatenate(all_mins), np.concatenate(all_maxs)
+
+
+def bounding_box_of_bricks(view, brick_max, brick_size, threshold):
+    """Shrink view, a list of (start, end) index pairs, to the bounding box of the bricks with a maximum above threshold.
+
+    This crops a single box, the bricks inside the box that are below the threshold are kept (the volume leaves them
+    out when it sends the box, see ipyvolume.serialize._cube_to_bricks). If none of the bricks in view has a value
+    above the threshold, the view is returned unchanged.
+    """
+    brick_view = tuple(slice(start // brick_size, -(-end // brick_size)) for start, end in view)
+    visible = brick_max[brick_view] > threshold
+    if not visible.any():
+        return view
+    new_view = []
+    for axis, (start, end) in enumerate(view):
+        other_axes = tuple(k for k in range(3) if k != axis)
+        indices = np.nonzero(visible.any(axis=other_axes))[0]
+        first = (brick_view[axis].start + indices[0]) * brick_size
+        last = (brick_view[axis].start + indices[-1] + 1) * brick_size
+        new_view.append((max(start, first), min(end, last)))
+    return new_view
+
+
+class LRUCache(object):
+    """Least recently used cache, bounded by the total number of bytes of its values.
+
+    The size of each value is given when it is added, by the nbytes argument of set, and keeps track of the
+    number of hits and misses.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        if key in self._items:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return self._items[key][0]
+        self.misses += 1
+        return default
+
+    def set(self, key, value, nbytes):
+        if key in self._items:
+            self.nbytes -= self._items.pop(key)[1]
+        if nbytes > self.max_bytes:  # would evict everything, and still not fit
+            return
+        self._items[key] = (value, nbytes)
+        self.nbytes += nbytes
+        self.evict()
+
+    def discard(self, key):
+        if key in self._items:
+            self.nbytes -= self._items.pop(key)[1]
+
+    def keys(self):
+        return list(self._items)
+
+    def evict(self):
+        """Remove the least recently used items until we are within max_bytes."""
+        while self.nbytes > self.max_bytes:
+            _key, (_value, nbytes) = self._items.popitem(last=False)
+            self.nbytes -= nbytes
+
+    def clear(self):
+        self._items.clear()
+        self.nbytes = 0
+
+    def info(self):
+        return dict(hits=self.hits, misses=self.misses, items=len(self._items), nbytes=self.nbytes, max_bytes=self.max_bytes)
 
 
 def grid_slice(amin, amax, shape, bmin, bmax):
@@ -258,6 +597,263 @@ def grid_slice(amin, amax, shape, bmin, bmax):
     return (imin, imax), (amin + nmin * width, amin + nmax * width)
 
 
+# points are tested against a selection region in chunks of this many points, which bounds the temporary memory
+selection_chunk_size = 1024**2
+# number of cells (in each direction) of the grid used by points_in_polygon
+polygon_grid_size = 1024
+# points are projected in chunks of this many points, each chunk needs 4 float32 temporaries (homogeneous coordinates)
+projection_chunk_size = 1024**2
+
+
+def _in_bounding_box(x, y, xmin, xmax, ymin, ymax):
+    """Return the (flat) indices of the points inside the bounding box, tested in chunks."""
+    x, y = np.ravel(x), np.ravel(y)
+    indices = []
+    for start in range(0, len(x), selection_chunk_size):
+        cx, cy = x[start : start + selection_chunk_size], y[start : start + selection_chunk_size]
+        indices.append(np.nonzero((cx >= xmin) & (cx <= xmax) & (cy >= ymin) & (cy <= ymax))[0] + start)
+    return np.concatenate(indices) if indices else np.zeros(0, dtype=np.intp)
+
+
+def _crossings_parity(px, py, x1, y1, x2, y2):
+    """Even-odd rule: for each point, does a ray in the +x direction cross an odd number of edges."""
+    inside = np.zeros(len(px), dtype=bool)
+    for ex1, ey1, ex2, ey2 in zip(x1, y1, x2, y2):
+        if ey1 == ey2:  # horizontal edges are never crossed
+            continue
+        crossing = (ey1 > py) != (ey2 > py)
+        crossing &= px < ex1 + (py - ey1) * ((ex2 - ex1) / (ey2 - ey1))
+        inside ^= crossing
+    return inside
+
+
+def points_in_polygon(x, y, polygon):
+    """Return a boolean mask (with the shape of x) of the points inside a polygon, according to the even-odd rule.
+
+    Only points inside the bounding box of the polygon are considered. These are put on a grid of polygon_grid_size
+    cells. Cells the edges do not pass through are entirely inside or outside, which is tested for their centers only.
+    The remaining points, close to the edges, are tested against all edges, in chunks of selection_chunk_size.
+
+    :param x: numpy array with the x coordinates of the points
+    :param y: idem for y
+    :param polygon: sequence of (x, y) vertices, the last vertex is connected to the first
+    """
+    polygon = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+    mask = np.zeros(np.shape(x), dtype=bool)
+    if len(polygon) < 3:
+        return mask
+    x1, y1 = polygon.T
+    x2, y2 = np.roll(polygon, -1, axis=0).T
+    (xmin, ymin), (xmax, ymax) = polygon.min(axis=0), polygon.max(axis=0)
+    candidates = _in_bounding_box(x, y, xmin, xmax, ymin, ymax)
+    if len(candidates) == 0:
+        return mask
+    size = polygon_grid_size
+    cell_width, cell_height = (xmax - xmin) / size or 1.0, (ymax - ymin) / size or 1.0
+
+    # mark the cells the edges pass through, by sampling each edge at half the cell size, and their neighbours
+    boundary = np.zeros((size + 2, size + 2), dtype=bool)  # with a border, for the neighbours
+    for ex1, ey1, ex2, ey2 in zip(x1, y1, x2, y2):
+        samples = int(2 * max(abs(ex2 - ex1) / cell_width, abs(ey2 - ey1) / cell_height)) + 2
+        t = np.linspace(0, 1, samples)
+        i = np.clip(((ex1 + t * (ex2 - ex1) - xmin) / cell_width).astype(np.intp), 0, size - 1)
+        j = np.clip(((ey1 + t * (ey2 - ey1) - ymin) / cell_height).astype(np.intp), 0, size - 1)
+        boundary[j + 1, i + 1] = True
+    near = boundary.copy()
+    for dj in [-1, 0, 1]:
+        for di in [-1, 0, 1]:
+            near[1:-1, 1:-1] |= boundary[1 + dj : size + 1 + dj, 1 + di : size + 1 + di]
+    near = near[1:-1, 1:-1]
+
+    # for the centers of each row of cells, find where the edges cross, and count the crossings to the right
+    centers_x = xmin + (np.arange(size) + 0.5) * cell_width
+    cell_inside = np.zeros((size, size), dtype=bool)
+    for j in range(size):
+        center_y = ymin + (j + 0.5) * cell_height
+        crossing = (y1 > center_y) != (y2 > center_y)
+        crossing_x = x1[crossing] + (center_y - y1[crossing]) * (x2 - x1)[crossing] / (y2 - y1)[crossing]
+        right = len(crossing_x) - np.searchsorted(np.sort(crossing_x), centers_x, side='right')
+        cell_inside[j] = right % 2 == 1
+
+    # 0: outside, 1: inside, 2: close to an edge. Neighbouring cells that are not close to an edge are both inside or
+    # outside, so computing the cell of a point in the precision of x and y is fine
+    cell_state = np.where(near, 2, cell_inside).astype(np.uint8).reshape(-1)
+    flat_mask = mask.reshape(-1)
+    x, y = np.ravel(x), np.ravel(y)
+    for start in range(0, len(candidates), selection_chunk_size):
+        indices = candidates[start : start + selection_chunk_size]
+        px, py = x[indices], y[indices]
+        i = np.minimum(((px - float(xmin)) * float(1 / cell_width)).astype(np.intp), size - 1)
+        j = np.minimum(((py - float(ymin)) * float(1 / cell_height)).astype(np.intp), size - 1)
+        state = cell_state[j * size + i]
+        inside = state == 1
+        close = np.nonzero(state == 2)[0]
+        inside[close] = _crossings_parity(
+            px[close].astype(np.float64), py[close].astype(np.float64), x1, y1, x2, y2
+        )
+        flat_mask[indices] = inside
+    return mask
+
+
+def points_in_circle(x, y, center, radius):
+    """Return a boolean mask (with the shape of x) of the points inside a circle."""
+    cx, cy = center
+    mask = np.zeros(np.shape(x), dtype=bool)
+    candidates = _in_bounding_box(x, y, cx - radius, cx + radius, cy - radius, cy + radius)
+    px, py = np.ravel(x)[candidates], np.ravel(y)[candidates]
+    mask.reshape(-1)[candidates] = ((px - cx) ** 2 + (py - cy) ** 2) < radius ** 2
+    return mask
+
+
+def points_in_rectangle(x, y, xmin, xmax, ymin, ymax):
+    """Return a boolean mask (with the shape of x) of the points inside a rectangle."""
+    mask = np.zeros(np.shape(x), dtype=bool)
+    mask.reshape(-1)[_in_bounding_box(x, y, xmin, xmax, ymin, ymax)] = True
+    return mask
+
+
+def projection_matrix(matrix_world, matrix_projection):
+    """Combine the world and projection matrix of a Figure (column major, like three.js) into one 4x4 matrix."""
+    W = np.asarray(matrix_world, dtype=np.float64).reshape((4, 4)).T
+    P = np.asarray(matrix_projection, dtype=np.float64).reshape((4, 4)).T
+    return np.dot(P, W)
+
+
+def project_points(matrix, x, y, z):
+    """Project points with a 4x4 matrix to normalized device coordinates, in float32 and chunks of projection_chunk_size.
+
+    :param matrix: 4x4 matrix, e.g. from projection_matrix
+    :param x: numpy array with the x coordinates of the points
+    :param y: idem for y
+    :param z: idem for z
+    :return: tuple of screen coordinates of shape (2,) + x.shape, depth (the z device coordinate) with the shape of x,
+        and a boolean mask that is True for the points inside the view frustum (x, y and depth in [-1, 1])
+    """
+    shape = np.shape(x)
+    x, y, z = np.ravel(x), np.ravel(y), np.ravel(z)
+    rows = np.asarray(matrix, dtype=np.float32)
+    xy = np.empty((2, len(x)), dtype=np.float32)
+    depth = np.empty(len(x), dtype=np.float32)
+    in_frustum = np.empty(len(x), dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for start in range(0, len(x), projection_chunk_size):
+            end = start + projection_chunk_size
+            cx, cy, cz = [np.asarray(ar[start:end], dtype=np.float32) for ar in [x, y, z]]
+            w = rows[3, 0] * cx + rows[3, 1] * cy + rows[3, 2] * cz + rows[3, 3]
+            inside = w > 0  # in front of the camera
+            for i, out in enumerate([xy[0, start:end], xy[1, start:end], depth[start:end]]):
+                np.multiply(rows[i, 0], cx, out=out)
+                out += rows[i, 1] * cy
+                out += rows[i, 2] * cz
+                out += rows[i, 3]
+                out /= w
+                inside &= np.abs(out) <= 1
+            in_frustum[start:end] = inside
+    return xy.reshape((2,) + shape), depth.reshape(shape), in_frustum.reshape(shape)
+
+
+class Bitset(object):
+    """Set of point indices, stored as one bit per point, packed in uint8 (least significant bit first).
+
+    This is the layout of the bitmasks computed in the frontend (see Figure.selection_frontend), and it is send to the
+    frontend as is, using length/8 bytes. Set operations work on 64 bit words, which is why the bits are padded to a
+    multiple of 8 bytes (the padding bits are always 0).
+
+    >>> selection = Bitset.from_indices([1, 5], 10) | Bitset.from_mask(x > 0.5)
+    >>> selection.indices()
+    """
+
+    def __init__(self, bits, length):
+        self.length = int(length)
+        nbytes = (self.length + 63) // 64 * 8
+        self.bits = np.zeros(nbytes, dtype=np.uint8)
+        bits = np.asarray(bits, dtype=np.uint8).reshape(-1)[: (self.length + 7) // 8]
+        self.bits[: len(bits)] = bits
+        if self.length % 8:  # clear the bits past length
+            self.bits[self.length // 8] &= (1 << (self.length % 8)) - 1
+
+    @classmethod
+    def from_mask(cls, mask):
+        mask = np.asarray(mask, dtype=bool).reshape(-1)
+        return cls(np.packbits(mask, bitorder='little'), len(mask))
+
+    @classmethod
+    def from_indices(cls, indices, length):
+        """Create a Bitset from the indices of the selected points, indices >= length are ignored."""
+        mask = np.zeros(length, dtype=bool)
+        indices = np.asarray(indices, dtype=np.intp).reshape(-1)
+        mask[indices[indices < length]] = True
+        return cls.from_mask(mask)
+
+    @property
+    def nbytes(self):
+        """Number of bytes needed for length bits, without the padding."""
+        return (self.length + 7) // 8
+
+    def mask(self):
+        return np.unpackbits(self.bits, count=self.length, bitorder='little').astype(bool)
+
+    def indices(self):
+        return np.flatnonzero(self.mask())
+
+    def count(self):
+        return int(np.unpackbits(self.bits).sum(dtype=np.int64))
+
+    def __array__(self, dtype=None, copy=None):
+        # code that expects the selection to be an array of indices keeps working
+        return self.indices() if dtype is None else self.indices().astype(dtype)
+
+    def _words(self):
+        return self.bits.view(np.uint64)
+
+    def _check(self, other):
+        if self.length != other.length:
+            raise ValueError('bitsets of different length: %d and %d' % (self.length, other.length))
+
+    def _from_words(self, words):
+        bitset = Bitset.__new__(Bitset)
+        bitset.length = self.length
+        bitset.bits = words.view(np.uint8)
+        return bitset
+
+    def __and__(self, other):
+        self._check(other)
+        return self._from_words(self._words() & other._words())
+
+    def __or__(self, other):
+        self._check(other)
+        return self._from_words(self._words() | other._words())
+
+    def __sub__(self, other):
+        self._check(other)
+        return self._from_words(self._words() & ~other._words())
+
+    def __eq__(self, other):
+        return isinstance(other, Bitset) and self.length == other.length and np.array_equal(self.bits, other.bits)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def combine(self, other, mode):
+        """Combine with another selection, mode is one of 'replace', 'and', 'or' or 'subtract' (Figure.selection_mode)."""
+        if mode == 'replace':
+            self._check(other)
+            return other
+        elif mode == 'and':
+            return self & other
+        elif mode == 'or':
+            return self | other
+        elif mode == 'subtract':
+            return self - other
+        else:
+            raise ValueError('unknown selection mode: %r' % mode)
+
+    def __repr__(self):
+        return 'Bitset(length=%d, count=%d)' % (self.length, self.count())
+
+
 def get_ioloop():
     ipython = IPython.get_ipython()
     if ipython and hasattr(ipython, 'kernel'):
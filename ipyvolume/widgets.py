@@ -2,10 +2,12 @@
 
 from __future__ import absolute_import
 
-__all__ = ['Mesh', 'Scatter', 'Volume', 'Figure', 'quickquiver', 'quickscatter', 'quickvolshow']
+__all__ = ['Mesh', 'Scatter', 'StreamingScatter', 'Texture', 'Volume', 'Figure', 'quickquiver', 'quickscatter', 'quickvolshow']
 
 import logging
+import time
 import warnings
+import weakref
 
 import numpy as np
 import ipywidgets as widgets  # we should not have widgets under two names
@@ -13,27 +15,54 @@ import ipywebrtc
 import pythreejs
 import traitlets
 from traitlets import Unicode, Integer
-from traittypes import Array
+from ipywidgets.widgets.widget import _remove_buffers
 from bqplot import scales
+from traittypes import Array
 
 import ipyvolume
 import ipyvolume as ipv  # we should not have ipyvolume under two names either
 import ipyvolume._version
-from ipyvolume.traittypes import Image
+from ipyvolume.traittypes import ArrayLike, Image, PointArray
 from ipyvolume.serialize import (
     array_cube_tile_serialization,
     array_serialization,
     array_sequence_serialization,
+    array_to_binary,
     color_serialization,
+    color_to_binary_or_json,
+    cube_to_tiles_cached,
+    discard_cached,
+    position_sequence_serialization,
+    quantization_error,
+    release_texture_frames,
+    rgba_serialization,
+    selection_serialization,
+    selection_to_mask,
+    strings_to_rgba,
     texture_serialization,
+    update_texture_frames,
 )
 from ipyvolume.transferfunction import TransferFunction
-from ipyvolume.utils import debounced, grid_slice, reduce_size
+from ipyvolume.utils import (
+    Bitset,
+    LRUCache,
+    bounding_box_of_bricks,
+    brick_minmax,
+    build_pyramid,
+    debounced,
+    grid_slice,
+    project_points,
+    projection_matrix,
+    read_reduced,
+    reduce_size,
+)
 
 
 _last_figure = None
 logger = logging.getLogger("ipyvolume")
 semver_range_frontend = "~" + ipyvolume._version.__version_js__
+# runs of updated points that are at most this many points apart are sent as a single range, see Scatter.update_points
+update_points_gap = 256
 
 
 def _typefix(value):
@@ -47,19 +76,174 @@ def _typefix(value):
         return value
 
 
+def _current_frame(ar, sequence_index):
+    """Return the frame of an (S, N) sequence at sequence_index (like the frontend does), or the array itself."""
+    ar = np.asarray(ar)
+    return ar[sequence_index % len(ar)] if ar.ndim == 2 else ar
+
+
+def _point_ranges(length, index):
+    """Return the (start, end) ranges of the points selected by index (a slice, indices or a mask)."""
+    changed = np.unique(np.arange(length)[index])
+    if len(changed) == 0:
+        return []
+    breaks = np.nonzero(np.diff(changed) > update_points_gap)[0] + 1
+    starts = changed[np.r_[0, breaks]]
+    ends = changed[np.r_[breaks - 1, len(changed) - 1]] + 1
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def _update_points(widget, index, values):
+    """Implements Scatter.update_points and Mesh.update_points, returns the number of bytes sent.
+
+    The changed ranges of all arrays are sent in a single message, so the frontend redraws (or rebuilds) once.
+    """
+    arrays = []
+    resend = []
+    for name, value in values.items():
+        ar = getattr(widget, name)
+        if not isinstance(ar, np.ndarray) or ar.ndim == 0:
+            raise ValueError('%s is not an array, assign a full array first' % name)
+        # for rgb(a) colors, the last axis is the color, otherwise the points are on the last axis
+        rgb = name.startswith('color') and ar.dtype.kind not in 'US' and widget.color_scale is None
+        points = (Ellipsis, index, slice(None)) if rgb else (Ellipsis, index)
+        if rgb and np.asarray(value).dtype.kind in 'US':  # color names for an array of rgb(a) values
+            value = strings_to_rgba(np.asarray(value))[..., : ar.shape[-1]]
+            value = value / 255.0 if ar.dtype.kind == 'f' else value
+        ar[points] = value
+        discard_cached(ar)  # all cached buffers of ar (and of previously sent ranges) are outdated after this change
+        frames = ar.reshape((-1,) + ar.shape[-2:]) if rgb else ar.reshape(-1, ar.shape[-1])
+        if name in ['x', 'y', 'z'] and widget.keyframe_interval and len(frames) > 1:
+            resend.append(name)  # the frontend reconstructs these frames from differences, so resend them all
+            continue
+        encode = (lambda part, obj: color_to_binary_or_json(part, obj)[0]) if name.startswith('color') else array_to_binary
+        ranges = []
+        for frame_index, frame in enumerate(frames):
+            for start, end in _point_ranges(frame.shape[0], index):
+                ranges.append(dict(encode(frame[start:end], widget), frame=frame_index, start=start, end=end))
+        arrays.append(dict(name=name, ranges=ranges))
+    if resend:
+        widget.send_state(resend)
+    if not arrays:
+        return 0
+    content, buffer_paths, buffers = _remove_buffers(dict(msg='update_points', arrays=arrays))
+    content['buffer_paths'] = buffer_paths
+    widget.send(content, buffers)
+    return sum(memoryview(buffer).nbytes for buffer in buffers)
+
+
+@widgets.register
+class Texture(widgets.Widget):
+    """One frame of an image texture as raw RGBA pixels (with the bottom row first).
+
+    Created for Scatter.texture and Mesh.texture and held by their texture_frames trait. Images with the same content
+    share the same Texture widget (see ipyvolume.serialize.texture_registry), so they are sent and uploaded to the GPU
+    once. It is closed when no widget uses it anymore.
+    """
+
+    _model_name = Unicode('TextureModel').tag(sync=True)
+    _model_module = Unicode('ipyvolume').tag(sync=True)
+    _model_module_version = Unicode(semver_range_frontend).tag(sync=True)
+    data = Array(default_value=None).tag(sync=True, **rgba_serialization)
+
+    def __init__(self, **kwargs):
+        super(Texture, self).__init__(**kwargs)
+        self._users = weakref.WeakSet()  # the widgets whose texture_frames hold this texture
+
+
+class _PointsMixin(traitlets.HasTraits):
+    """Traits and methods that Mesh and Scatter share: quantization of the positions and partial updates."""
+
+    quantize = traitlets.Bool(
+        False,
+        help='Send x, y and z (and color, when mapped by color_scale) as 16 bit integers (with an offset and scale), '
+        'which halves the data send to the browser, see quantization_error for the resulting precision',
+    )
+    keyframe_interval = traitlets.CInt(
+        None,
+        allow_none=True,
+        help='For sequences of x, y and z, only send every keyframe_interval-th frame in full, and the frames in '
+        'between as 16 bit differences with the previous frame, see quantization_error for the resulting precision',
+    )
+
+    texture_frames = traitlets.List(
+        traitlets.Instance(Texture),
+        help='The Texture widgets of the frames of texture (when it is an image), set when texture is serialized',
+    ).tag(sync=True, **widgets.widget_serialization)
+
+    # the color traits, which are sent as scalars when color_scale is set
+    _color_names = []
+
+    def __init__(self, figure=None, **kwargs):
+        # the comm sends the full state on construction, so the figure (for its compression) is known before that
+        self._figure = figure
+        super(_PointsMixin, self).__init__(**kwargs)
+
+    def notify_change(self, change):
+        if change['name'] == 'texture':
+            # texture is serialized as the texture_frames its observer sets, so we send its state after that
+            with self.hold_sync():
+                super(_PointsMixin, self).notify_change(change)
+        else:
+            super(_PointsMixin, self).notify_change(change)
+
+    @traitlets.observe('texture')
+    def _update_texture(self, change):
+        update_texture_frames(self)  # also called on construction, before the comm opens
+
+    def close(self):
+        release_texture_frames(self)
+        super(_PointsMixin, self).close()
+
+    @traitlets.observe('quantize', 'keyframe_interval')
+    def _update_quantize(self, change):
+        self.send_state(['x', 'y', 'z'] + self._color_names)
+
+    @traitlets.observe('color_scale')
+    def _update_color_scale(self, change):
+        if (change['old'] is None) != (change['new'] is None):  # color changes from rgb(a) to scalars or vice versa
+            self.send_state(self._color_names)
+
+    def _discard_cached_arrays(self, proposal):
+        # called on each set, also when the same array is assigned again after modifying it in place
+        discard_cached(self._trait_values.get(proposal['trait'].name))
+        discard_cached(proposal['value'])
+        return proposal['value']
+
+    def quantization_error(self):
+        """Return the maximum error of the x, y and z coordinates due to quantize and keyframe_interval, as a dict."""
+        return {
+            name: quantization_error(getattr(self, name), self.quantize, self.keyframe_interval)
+            for name in ['x', 'y', 'z']
+        }
+
+    def update_points(self, index, **values):
+        """Assign values to part of the points in place, and only send the changed points to the frontend.
+
+        Example, to move and recolor the first 100 points::
+
+            >>> scatter.update_points(slice(0, 100), x=x_new, color='red')
+
+        :param index: slice, integer indices or boolean mask that selects the points (the last axis of x, y, z etc.)
+        :param values: name=value pairs, the value is assigned to e.g. self.x[..., index], so it can be a scalar, an
+               array for the selected points, or for sequences an array of shape (S, number of selected points)
+        """
+        _update_points(self, index, values)
+
+
 @widgets.register
-class Mesh(widgets.Widget):
+class Mesh(_PointsMixin, widgets.Widget):
     _view_name = Unicode('MeshView').tag(sync=True)
     _view_module = Unicode('ipyvolume').tag(sync=True)
     _model_name = Unicode('MeshModel').tag(sync=True)
     _model_module = Unicode('ipyvolume').tag(sync=True)
     _view_module_version = Unicode(semver_range_frontend).tag(sync=True)
     _model_module_version = Unicode(semver_range_frontend).tag(sync=True)
-    x = Array(default_value=None).tag(sync=True, **array_sequence_serialization)
-    y = Array(default_value=None).tag(sync=True, **array_sequence_serialization)
-    z = Array(default_value=None).tag(sync=True, **array_sequence_serialization)
-    u = Array(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization)
-    v = Array(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization)
+    x = PointArray(default_value=None).tag(sync=True, **position_sequence_serialization)
+    y = PointArray(default_value=None).tag(sync=True, **position_sequence_serialization)
+    z = PointArray(default_value=None).tag(sync=True, **position_sequence_serialization)
+    u = PointArray(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization)
+    v = PointArray(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization)
     triangles = Array(default_value=None, allow_none=True).tag(sync=True, **array_serialization)
     lines = Array(default_value=None, allow_none=True).tag(sync=True, **array_serialization)
     color_scale = traitlets.Instance(scales.ColorScale, default_value=None, allow_none=True)\
@@ -75,7 +259,7 @@ class Mesh(widgets.Widget):
     ).tag(sync=True, **texture_serialization)
 
     sequence_index = Integer(default_value=0).tag(sync=True)
-    color = Array(default_value="red", allow_none=True).tag(sync=True, **color_serialization)
+    color = PointArray(default_value="red", allow_none=True).tag(sync=True, **color_serialization)
     visible = traitlets.CBool(default_value=True).tag(sync=True)
 
     material = traitlets.Instance(
@@ -94,38 +278,49 @@ class Mesh(widgets.Widget):
     def _default_line_material(self):
         return pythreejs.ShaderMaterial()
 
+    _color_names = ['color']
+
+    @traitlets.validate('x', 'y', 'z', 'u', 'v', 'triangles', 'lines', 'color')
+    def _discard_cached(self, proposal):
+        return self._discard_cached_arrays(proposal)
+
 
 @widgets.register
-class Scatter(widgets.Widget):
+class Scatter(_PointsMixin, widgets.Widget):
     _view_name = Unicode('ScatterView').tag(sync=True)
     _view_module = Unicode('ipyvolume').tag(sync=True)
     _model_name = Unicode('ScatterModel').tag(sync=True)
     _model_module = Unicode('ipyvolume').tag(sync=True)
     _view_module_version = Unicode(semver_range_frontend).tag(sync=True)
     _model_module_version = Unicode(semver_range_frontend).tag(sync=True)
-    x = Array(default_value=None).tag(sync=True, **array_sequence_serialization)
-    y = Array(default_value=None).tag(sync=True, **array_sequence_serialization)
-    z = Array(default_value=None).tag(sync=True, **array_sequence_serialization)
-    aux = Array(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization)
+    x = PointArray(default_value=None).tag(sync=True, **position_sequence_serialization)
+    y = PointArray(default_value=None).tag(sync=True, **position_sequence_serialization)
+    z = PointArray(default_value=None).tag(sync=True, **position_sequence_serialization)
+    aux = PointArray(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization)
     aux_scale = traitlets.Instance(scales.Scale, default_value=None,
                                    allow_none=True).tag(sync=True, **widgets.widget_serialization)
-    vx = Array(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization)
-    vy = Array(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization)
-    vz = Array(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization)
+    vx = PointArray(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization)
+    vy = PointArray(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization)
+    vz = PointArray(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization)
     color_scale = traitlets.Instance(scales.ColorScale, default_value=None, allow_none=True)\
         .tag(sync=True, **widgets.widget_serialization)
-    selected = Array(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization)
+    selected = traitlets.Union(
+        [traitlets.Instance(Bitset), Array(default_value=None, allow_none=True)],
+        default_value=None,
+        allow_none=True,
+        help="Selected points, a Bitset, or an array with the indices (or for sequences, of shape (S, N))",
+    ).tag(sync=True, **selection_serialization)
     sequence_index = Integer(default_value=0).tag(sync=True)
     size = traitlets.Union(
         [
-            Array(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization),
+            PointArray(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization),
             traitlets.Float().tag(sync=True),
         ],
         default_value=5,
     ).tag(sync=True)
     size_selected = traitlets.Union(
         [
-            Array(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization),
+            PointArray(default_value=None, allow_none=True).tag(sync=True, **array_sequence_serialization),
             traitlets.Float().tag(sync=True),
         ],
         default_value=7,
@@ -136,9 +331,9 @@ class Scatter(widgets.Widget):
                                       allow_none=True).tag(sync=True, **widgets.widget_serialization)
     size_z_scale = traitlets.Instance(scales.Scale, default_value=None,
                                       allow_none=True).tag(sync=True, **widgets.widget_serialization)
-    color = Array(default_value="red", allow_none=True).tag(sync=True, **color_serialization)
+    color = PointArray(default_value="red", allow_none=True).tag(sync=True, **color_serialization)
     color_selected = traitlets.Union(
-        [Array(default_value=None, allow_none=True).tag(sync=True, **color_serialization), Unicode().tag(sync=True)],
+        [PointArray(default_value=None, allow_none=True).tag(sync=True, **color_serialization), Unicode().tag(sync=True)],
         default_value="green",
     ).tag(sync=True)
     geo = traitlets.Unicode('diamond').tag(sync=True)
@@ -173,6 +368,79 @@ class Scatter(widgets.Widget):
     def _default_line_material(self):
         return pythreejs.ShaderMaterial()
 
+    _color_names = ['color', 'color_selected']
+
+    @traitlets.validate(
+        'x', 'y', 'z', 'aux', 'vx', 'vy', 'vz', 'selected', 'size', 'size_selected', 'color', 'color_selected'
+    )
+    def _discard_cached(self, proposal):
+        return self._discard_cached_arrays(proposal)
+
+
+@widgets.register
+class StreamingScatter(Scatter):
+    """A Scatter with a fixed number of points (the capacity), which is filled by appending points, like a ring buffer.
+
+    When it is full, the oldest points are replaced. Each append only sends the new points of all arrays to the
+    frontend in a single message (see update_points), which updates its buffers in place. Places that are not filled
+    yet have NaN coordinates, and are not drawn. With a color_scale without a min or max, the frontend extends the
+    color domain with the appended values (it does not shrink when points are replaced).
+
+    Example, for a stream of 2 million points, colored by intensity::
+
+        >>> stream = StreamingScatter(2000000, color=np.zeros(2000000), color_scale=bqplot.ColorScale(min=0, max=1))
+        >>> stream.append(x, y, z, color=intensity)
+    """
+
+    def __init__(self, capacity, **kwargs):
+        for name in ['x', 'y', 'z']:
+            kwargs.setdefault(name, np.full(capacity, np.nan, dtype=np.float32))
+        super(StreamingScatter, self).__init__(**kwargs)
+        self.count = 0  # number of points, at most the capacity
+        self.points_appended = 0
+        self.bytes_sent = 0
+        self._write_index = 0
+        self._first_append = None
+
+    @property
+    def capacity(self):
+        return self.x.shape[-1]
+
+    def append(self, x, y, z, **values):
+        """Append points, replacing the oldest points when full.
+
+        :param x: numpy array of shape (N,) with the x positions of the new points
+        :param y: idem for y
+        :param z: idem for z
+        :param values: values for the other arrays with a value for each point, such as color=... or size=..., of length
+               N, or a single value for all new points
+        """
+        length = np.size(x)
+        keep = min(length, self.capacity)  # when more points than the capacity are appended, the first ones are skipped
+        values = dict(values, x=x, y=y, z=z)
+        values = {
+            name: value[length - keep:] if np.ndim(value) and len(value) == length else value
+            for name, value in values.items()
+        }
+        indices = (self._write_index + np.arange(keep)) % self.capacity
+        if self._first_append is None:
+            self._first_append = time.time()
+        self.bytes_sent += _update_points(self, indices, values)
+        self._write_index = (self._write_index + keep) % self.capacity
+        self.count = min(self.count + keep, self.capacity)
+        self.points_appended += length
+
+    def throughput(self):
+        """Return the number of points appended and bytes sent, in total and per second since the first append."""
+        seconds = time.time() - self._first_append if self._first_append is not None else 0.0
+        return dict(
+            points=self.points_appended,
+            bytes=self.bytes_sent,
+            seconds=seconds,
+            points_per_second=self.points_appended / seconds if seconds else 0.0,
+            bytes_per_second=self.bytes_sent / seconds if seconds else 0.0,
+        )
+
 
 @widgets.register
 class Volume(widgets.Widget):
@@ -185,8 +453,14 @@ class Volume(widgets.Widget):
     _view_module_version = Unicode(semver_range_frontend).tag(sync=True)
     _model_module_version = Unicode(semver_range_frontend).tag(sync=True)
 
-    data = Array(default_value=None, allow_none=True).tag(sync=True, **array_cube_tile_serialization)
-    data_original = Array(default_value=None, allow_none=True)
+    data = Array(
+        default_value=None,
+        allow_none=True,
+        help='The (reduced) data that is sent to the frontend. For 4d data_original, this is the frame at sequence_index '
+        'when the view was last computed (e.g. after zooming), it does not follow sequence_index, since the other '
+        'frames are sent in separate messages (see prefetch).',
+    ).tag(sync=True, **array_cube_tile_serialization)
+    data_original = ArrayLike(default_value=None, allow_none=True)
     data_max_shape = traitlets.CInt(None, allow_none=True)  # TODO: allow this to be a list
     data_min = traitlets.CFloat(0).tag(sync=True)
     data_max = traitlets.CFloat(1).tag(sync=True)
@@ -209,13 +483,101 @@ class Volume(widgets.Widget):
     extent = traitlets.Any().tag(sync=True)
     extent_original = traitlets.Any()
 
-    def __init__(self, **kwargs):
+    sequence_index = Integer(default_value=0).tag(sync=True)
+    prefetch = traitlets.CInt(
+        2, help='For 4d data (time series), the number of frames after sequence_index to send ahead of time.'
+    ).tag(sync=True)
+
+    cache_max_bytes = traitlets.CInt(
+        256 * 1024**2,
+        help='Maximum memory used for caching the (reduced) data and its encoded tiles for each zoom level.',
+    )
+    pyramid = traitlets.Bool(
+        False,
+        help='Precompute downsampled levels (1/2, 1/4, ...) of data_original, and crop the finest level that fits '
+        'data_max_shape when zooming, instead of reducing the full resolution data each time.',
+    )
+    brick_size = traitlets.CInt(
+        None,
+        allow_none=True,
+        help='If set, data_original is divided in bricks of brick_size^3 voxels, and the view is cropped to the bounding '
+        'box of the bricks that have values above show_min. Of the (reduced) data in that box, again divided in '
+        'bricks, only the bricks with values above show_min are sent, with a lookup table for the frontend, which '
+        'saves bandwidth and texture memory for sparse data.',
+    )
+
+    def __init__(self, figure=None, **kwargs):
+        self._figure = figure  # before the comm sends the full state, for the figure's compression
         super(Volume, self).__init__(**kwargs)
+        self._cache = LRUCache(self.cache_max_bytes)
+        self._data_version = 0
+        self._data_key = None
+        self._pyramid = None
+        self._brick_max = None
+        self._frames_sent = set()
         self._update_data()
-        self.observe(self.update_data, ['data_original', 'data_max_shape'])
+        self.on_msg(self._handle_custom_msg)
+        self.observe(self._update_sequence_index, 'sequence_index')
+        self.observe(self._update_data_version, 'data_original')
+        self.observe(
+            self._reset_pyramid, ['data_original', 'data_max_shape', 'extent_original', 'pyramid', 'rendering_method']
+        )
+        self.observe(self._reset_bricks, ['data_original', 'brick_size'])
+        self.observe(self.update_data, ['data_original', 'data_max_shape', 'brick_size', 'rendering_method', 'pyramid'])
+        self.observe(self._update_show_min, 'show_min')
+        self.observe(self._update_encoding, ['data_min', 'data_max', 'lighting'])
+
+    @traitlets.observe('cache_max_bytes')
+    def _update_cache_max_bytes(self, change):
+        self._cache.max_bytes = change['new']
+        self._cache.evict()
+
+    def _update_data_version(self, change):
+        self._data_version += 1
+        self._cache.clear()
+
+    def _reset_pyramid(self, change):
+        self._pyramid = None
+
+    def _reset_bricks(self, change):
+        self._brick_max = None
+
+    def _reduce_mode(self):
+        # averaging would wash out thin features in a maximum intensity projection
+        return 'max' if self.rendering_method == 'MAX_INTENSITY' else 'mean'
+
+    def _update_show_min(self, change):
+        if self.brick_size:  # bricks may become (in)visible, which changes the view and the bricks that are sent
+            self._update_encoding(change)
+
+    def cache_info(self):
+        """Return the hits, misses, number of items and memory usage of the cache of reduced and encoded data.
+
+        Note that the cache does not detect inplace modification of data_original, call clear_cache in that case.
+        """
+        return self._cache.info()
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def _update_encoding(self, change):
+        # the tiles are normalized by data_min and data_max, without lighting, data is sent without gradients, and with
+        # bricks, only those above show_min are sent (see serialize.cube_to_tiles), so the data and frames the frontend
+        # has are outdated
+        if change['name'] == 'lighting' and not change['new']:
+            return
+        if self.data_original is None:
+            self.send_state('data')
+            return
+        data_key = self._data_key
+        self._update_data()  # for sequences, data becomes the frame at sequence_index, and the frames are sent again
+        if data_key is not None and self._data_key[0] == data_key[0]:  # data did not change, so it was not sent
+            self.send_state('data')
 
     def _listen_to(self, fig):
-        fig.observe(self.update_data, ['xlim', 'ylim', 'zlim'])
+        self._figure = fig
+        for scale in fig.scales.values():
+            scale.observe(self.update_data, ['min', 'max'])
 
     @debounced(method=True)
     def update_data(self, change=None):
@@ -224,25 +586,124 @@ class Volume(widgets.Widget):
     def _update_data(self):
         if self.data_original is None:
             return
-        if all([k <= self.data_max_shape for k in self.data_original.shape]):
-            self.data = self.data_original
-            self.extent = self.extent_original
-            return
-        current_figure = ipv.gcf()
+        key, data, extent = self._compute_data(self.sequence_index if self._is_sequence() else None)
+        # the key is used by serialize.cube_to_tiles to find the encoded tiles in the cache
+        self._data_key = (key, data)
+        self.data = data
+        self.extent = extent
+        if self._is_sequence():
+            self._reset_frames()
+
+    def _is_sequence(self):
+        return self.data_original is not None and len(self.data_original.shape) == 4
+
+    def _compute_data(self, frame=None):
+        """Return the key, (reduced) data and extent of the current view, of a frame if data_original is 4d."""
+        # data_original can be an array-like that is not in memory, so we only index it, in chunks, when needed
+        prefix = () if frame is None else (frame,)
+        shape = self.data_original.shape[-3:]
+        if not self.brick_size and all([k <= self.data_max_shape for k in shape]):
+            if frame is None and isinstance(self.data_original, np.ndarray):
+                data = self.data_original
+            else:
+                data = np.asarray(self.data_original[prefix + (Ellipsis,)])
+            return (self._data_version, frame, None), data, self.extent_original
+        current_figure = self._figure or ipv.gcf()
         xlim = current_figure.xlim
         ylim = current_figure.ylim
         zlim = current_figure.zlim
-        shape = self.data_original.shape
         ex = self.extent_original
         viewx, xt = grid_slice(ex[0][0], ex[0][1], shape[2], *xlim)
         viewy, yt = grid_slice(ex[1][0], ex[1][1], shape[1], *ylim)
         viewz, zt = grid_slice(ex[2][0], ex[2][1], shape[0], *zlim)
-        view = [slice(*viewz), slice(*viewy), slice(*viewx)]
-        data_view = self.data_original[view]
-        extent = [xt, yt, zt]
-        data_view, extent = reduce_size(data_view, self.data_max_shape, extent)
-        self.data = np.array(data_view)
-        self.extent = extent
+        if self.brick_size:
+            if frame is not None:  # for sequences, the bricks are different for each frame
+                brick_key = ('bricks', self._data_version, frame, self.brick_size)
+                brick_max = self._cache.get(brick_key)
+                if brick_max is None:
+                    brick_max = brick_minmax(self.data_original, self.brick_size, frame)[1]
+                    self._cache.set(brick_key, brick_max, brick_max.nbytes)
+            else:
+                if self._brick_max is None:
+                    self._brick_max = brick_minmax(self.data_original, self.brick_size)[1]
+                brick_max = self._brick_max
+            viewz, viewy, viewx = bounding_box_of_bricks((viewz, viewy, viewx), brick_max, self.brick_size, self.show_min)
+            # the limits of the bounding box in world coordinates
+            xlim, ylim, zlim = xt, yt, zt = [
+                (amin + (amax - amin) * start / length, amin + (amax - amin) * end / length)
+                for (amin, amax), (start, end), length in zip(ex, (viewx, viewy, viewz), shape[::-1])
+            ]
+        pyramid = self.pyramid and frame is None
+        mode = self._reduce_mode()
+        key = (self._data_version, frame, (viewz, viewy, viewx), self.data_max_shape, pyramid, mode)
+        cached = self._cache.get(('data',) + key)
+        if cached is None:
+            if pyramid:
+                view_shape = [viewz[1] - viewz[0], viewy[1] - viewy[0], viewx[1] - viewx[0]]
+                data_view, extent = self._pyramid_view(view_shape, xlim, ylim, zlim)
+                data_view, extent = reduce_size(data_view, self.data_max_shape, extent, mode)
+                data = np.array(data_view)
+            else:
+                view = prefix + (slice(*viewz), slice(*viewy), slice(*viewx))
+                data, extent = read_reduced(self.data_original, view, self.data_max_shape, [xt, yt, zt], mode=mode)
+            self._cache.set(('data',) + key, (data, extent), data.nbytes)
+        else:
+            data, extent = cached
+        return key, data, extent
+
+    def _update_sequence_index(self, change):
+        if self._is_sequence():
+            self._send_frames()
+
+    def _reset_frames(self):
+        # the frames the frontend has are outdated (another view, or encoding), it drops them, and we send them again
+        self._frames_sent = set()
+        self.send(dict(msg='drop_frames'))
+        self._send_frames()
+
+    def _send_frames(self):
+        """Send the next prefetch frames, if the frontend does not have them yet.
+
+        The frontend requests the current frame itself when it does not have it.
+        """
+        index = self.sequence_index
+        window = range(max(0, index - 1), min(self.data_original.shape[0], index + self.prefetch + 1))
+        # the frontend evicts frames outside of the window
+        self._frames_sent.intersection_update(window)
+        for frame in window:
+            if frame > index and frame not in self._frames_sent:
+                self._send_frame(frame)
+
+    def _send_frame(self, frame):
+        key, data, extent = self._compute_data(frame)
+        state = cube_to_tiles_cached(data, self, key)
+        state, buffer_paths, buffers = _remove_buffers(state)
+        content = dict(msg='frame', index=frame, volume=state, extent=_typefix(extent), buffer_paths=buffer_paths)
+        self.send(content, buffers)
+        self._frames_sent.add(frame)
+
+    def _handle_custom_msg(self, content, buffers):
+        if content.get('event', '') == 'frame_request' and self._is_sequence():  # the frontend is missing a frame
+            if 0 <= content['index'] < self.data_original.shape[0]:
+                self._send_frame(content['index'])
+
+    def _pyramid_view(self, view_shape, xlim, ylim, zlim):
+        if self._pyramid is None:
+            self._pyramid = build_pyramid(
+                self.data_original, self.extent_original, self.data_max_shape, self._reduce_mode()
+            )
+        # the finest level at which the view fits in data_max_shape, or the coarsest level
+        level = 0
+        while level < len(self._pyramid) - 1 and max(view_shape) > self.data_max_shape:
+            level += 1
+            view_shape = [(k + 1) // 2 for k in view_shape]
+        data, ex = self._pyramid[level]
+        shape = data.shape
+        viewx, xt = grid_slice(ex[0][0], ex[0][1], shape[2], *xlim)
+        viewy, yt = grid_slice(ex[1][0], ex[1][1], shape[1], *ylim)
+        viewz, zt = grid_slice(ex[2][0], ex[2][1], shape[0], *zlim)
+        view = (slice(*viewz), slice(*viewy), slice(*viewx))
+        return data[view], [xt, yt, zt]
 
 
 @widgets.register
@@ -268,6 +729,29 @@ class Figure(ipywebrtc.MediaStream):
         sync=True, **widgets.widget_serialization
     )
 
+    compression = traitlets.Unicode(
+        None,
+        allow_none=True,
+        help='Codec (zlib, or lz4 and zstd when installed) used to compress the large array buffers of the scatters, '
+        'meshes and volumes in this figure, \'none\' disables compression, None uses ipyvolume.serialize.compression. '
+        'Widgets that are not (yet) in a figure are not compressed',
+    )
+
+    @traitlets.validate('compression')
+    def _valid_compression(self, proposal):
+        codec = proposal['value']
+        codecs = ipyvolume.serialize.codecs
+        if codec not in [None, 'none'] and codec not in codecs:
+            raise traitlets.TraitError('codec %r is not available, choose from: %s' % (codec, ', '.join(codecs)))
+        return codec
+
+    @traitlets.observe('scatters', 'meshes', 'volumes')
+    def _update_children(self, change):
+        # the serializers of the children use the compression setting of the figure they are in
+        for child in change['new']:
+            if getattr(child, '_figure', None) is None:
+                child._figure = self
+
     animation = traitlets.Float(1000.0).tag(sync=True)
     animation_exponent = traitlets.Float(1.0).tag(sync=True)
 
@@ -365,6 +849,9 @@ class Figure(ipywebrtc.MediaStream):
     render_continuous = traitlets.Bool(False).tag(sync=True)
     selector = traitlets.Unicode(default_value='lasso').tag(sync=True)
     selection_mode = traitlets.Unicode(default_value='replace').tag(sync=True)
+    selection_frontend = traitlets.Bool(
+        False, help="Compute which points of the scatters are selected in the browser, and send them as a bitmask"
+    ).tag(sync=True)
     mouse_mode = traitlets.Unicode(default_value='normal').tag(sync=True)
     panorama_mode = traitlets.Enum(values=['no', '360', '180'], default_value='no').tag(sync=True)
 
@@ -405,20 +892,35 @@ class Figure(ipywebrtc.MediaStream):
         if content.get('event', '') == 'screenshot':
             self._screenshot_handlers(content['data'])
         elif content.get('event', '') == 'selection':
-            self._selection_handlers(content['data'])
+            data = content['data']
+            if 'scatters' in data:
+                # computed by the frontend (see selection_frontend), one buffer per scatter
+                selections = data.pop('scatters')
+                data['masks'] = {
+                    selection['model']: selection_to_mask(selection, buffer)
+                    for selection, buffer in zip(selections, buffers)
+                }
+            self._selection_handlers(data)
 
     def on_selection(self, callback, remove=False):
         self._selection_handlers.register_callback(callback, remove=remove)
 
     def project(self, x, y, z):
-        W = np.matrix(self.matrix_world).reshape((4, 4)).T
-        P = np.matrix(self.matrix_projection).reshape((4, 4)).T
-        M = np.dot(P, W)
-        x = np.asarray(x)
-        vertices = np.array([x, y, z, np.ones(x.shape)])
-        screen_h = np.tensordot(M, vertices, axes=(1, 0))
-        xy = screen_h[:2] / screen_h[3]
-        return xy
+        """Return the screen (normalized device) coordinates of points, of shape (2,) + x.shape."""
+        return project_points(projection_matrix(self.matrix_world, self.matrix_projection), x, y, z)[0]
+
+    def project_scatters(self, scatters=None):
+        """Project the current frame (given by sequence_index) of the scatters of this figure.
+
+        :param scatters: list of Scatter objects, or None for self.scatters
+        :return: list with a (xy, depth, in_frustum) tuple for each scatter, see ipyvolume.utils.project_points
+        """
+        matrix = projection_matrix(self.matrix_world, self.matrix_projection)
+        scatters = self.scatters if scatters is None else scatters
+        return [
+            project_points(matrix, *[_current_frame(getattr(scatter, name), scatter.sequence_index) for name in 'xyz'])
+            for scatter in scatters
+        ]
 
 
 def volshow(*args, **kwargs):
@@ -458,8 +960,8 @@ def quickvolshow(
 
     :param data: 3d numpy array
     :param lighting: boolean, to use lighting or not, if set to false, lighting parameters will be overriden
-    :param data_min: minimum value to consider for data, if None, computed using np.nanmin
-    :param data_max: maximum value to consider for data, if None, computed using np.nanmax
+    :param data_min: minimum value to consider for data, if None, computed from the data, see :any:`volshow`
+    :param data_max: maximum value to consider for data, if None, computed from the data, see :any:`volshow`
     :param int max_shape: maximum shape for the 3d cube, if larger, the data is reduced by skipping/slicing (data[::N]),
                           set to None to disable.
     :param extent: list of [[xmin, xmax], [ymin, ymax], [zmin, zmax]] values that define the bounds of the volume,
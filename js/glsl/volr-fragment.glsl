@@ -20,10 +20,16 @@ struct Volume
     vec3 scale;
     vec3 offset;
     bool lighting;
+    // for volumes sent as bricks, see sample_bricks
+    bool bricked;
+    float brick_size;
+    vec3 brick_shape;
+    vec3 shape;
 };
 
 #if (VOLUME_COUNT > 0)
 uniform sampler2D data[VOLUME_COUNT];
+uniform sampler2D bricks[VOLUME_COUNT];
 uniform sampler2D transfer_function[VOLUME_COUNT];
 uniform Volume volumes[VOLUME_COUNT];
 #endif
@@ -31,6 +37,7 @@ uniform Volume volumes[VOLUME_COUNT];
 #if (VOLUME_COUNT_MAX_INT > 0)
 uniform Volume volumes_max_int[VOLUME_COUNT_MAX_INT];
 uniform sampler2D data_max_int[VOLUME_COUNT_MAX_INT];
+uniform sampler2D bricks_max_int[VOLUME_COUNT_MAX_INT];
 uniform sampler2D transfer_function_max_int[VOLUME_COUNT_MAX_INT];
 float max_values[VOLUME_COUNT_MAX_INT];
 float max_depth[VOLUME_COUNT_MAX_INT];
@@ -97,6 +104,36 @@ vec4 sample_as_3d_texture(sampler2D tex, vec2 tex_size, vec3 texCoord, vec2 slic
   return mix(slice0_color, slice1_color, slice_z_offset);
 }
 
+// For volumes sent as bricks (see ipyvolume.serialize._cube_to_bricks), the atlas only has the bricks with visible
+// values, each in a slot of brick_size + 3 slices, with 1 voxel before and 2 after the brick along each axis. The
+// lookup table has a row for each (z, y) brick index, and holds the slot + 1 of each brick, or 0 if it was not sent.
+bool sample_bricks(sampler2D tex, sampler2D bricks, Volume volume, vec3 texCoord, out vec4 color) {
+  // voxel i is at i/(shape-1), like in sample_as_3d_texture
+  vec3 voxel = texCoord * (volume.shape - 1.);
+  vec3 brick = min(floor(voxel / volume.brick_size), volume.brick_shape - 1.);
+  vec2 lookup_size = vec2(volume.brick_shape.x, volume.brick_shape.y * volume.brick_shape.z);
+  vec4 entry = texture2D(bricks, (vec2(brick.x, brick.z * volume.brick_shape.y + brick.y) + 0.5) / lookup_size);
+  // the entries are 16 bit, the low byte ends up in rgb (luminance), the high byte in a
+  float slot = floor(entry.r * 255. + 0.5) + floor(entry.a * 255. + 0.5) * 256. - 1.;
+  if(slot < 0.)
+    return false;
+  vec3 local = voxel - brick * volume.brick_size + 1.;
+  float slice = slot * (volume.brick_size + 3.) + local.z;
+  float slice_z = floor(slice);
+
+  vec2 pixel = 1./volume.size;
+  vec2 uv_slice_spacing = volume.slice_size/volume.size;
+  vec2 uv = (local.xy + 0.5) * pixel;
+
+  vec2 slice0_offset = compute_slice_offset(slice_z, volume.columns, uv_slice_spacing);
+  vec2 slice1_offset = compute_slice_offset(slice_z + 1.0, volume.columns, uv_slice_spacing);
+
+  vec4 slice0_color = texture2D(tex, slice0_offset + uv);
+  vec4 slice1_color = texture2D(tex, slice1_offset + uv);
+  color = mix(slice0_color, slice1_color, fract(slice));
+  return true;
+}
+
 uniform float ambient_coefficient;
 uniform float diffuse_coefficient;
 uniform float specular_coefficient;
@@ -113,11 +150,17 @@ mat3 transpose3(mat3 m) {
         );
 }
 
-vec2 sample(sampler2D data, Volume volume, vec3 ray_pos, inout vec3 normal) {
+vec2 sample(sampler2D data, sampler2D bricks, Volume volume, vec3 ray_pos, inout vec3 normal) {
     vec3 pos_relative = (ray_pos+volume.offset)*volume.scale;
     if(any(lessThan(pos_relative, vec3(0.))) || any(greaterThan(pos_relative, vec3(1.))))
         return vec2(0.0);
-    vec4 sample = sample_as_3d_texture(data, volume.size, pos_relative, volume.slice_size, volume.slices, volume.rows, volume.columns);
+    vec4 sample;
+    if(volume.bricked) {
+        if(!sample_bricks(data, bricks, volume, pos_relative, sample))
+            return vec2(0.0); // a brick without visible values
+    } else {
+        sample = sample_as_3d_texture(data, volume.size, pos_relative, volume.slice_size, volume.slices, volume.rows, volume.columns);
+    }
     normal = (-sample.xyz)*2.+1.;
     float raw_data_value = sample.a; //(sample.a - data_min) * data_scale;
     float scaled_data_value = (raw_data_value*(volume.data_range[1] - volume.data_range[0])) + volume.data_range[0];
@@ -138,7 +181,7 @@ vec4 apply_lighting(vec4 color, vec3 normal) {
     return result;
 }
 
-vec4 add_sample(sampler2D data, sampler2D transfer_function, Volume volume, vec3 ray_pos, vec4 color_in) {
+vec4 add_sample(sampler2D data, sampler2D bricks, sampler2D transfer_function, Volume volume, vec3 ray_pos, vec4 color_in) {
     vec4 color;
     vec3 pos_relative = (ray_pos+volume.offset)*volume.scale;
     /*vec4 sample_x = sample_as_3d_texture(volume, size, pos + vec3(delta, 0, 0), slice_size, slices, rows, columns);
@@ -151,7 +194,7 @@ vec4 add_sample(sampler2D data, sampler2D transfer_function, Volume volume, vec3
     float cosangle_eye = max((dot(eye, normal)), 0.);*/
 
     vec3 normal;
-    vec2 sample = sample(data, volume, ray_pos, normal);
+    vec2 sample = sample(data, bricks, volume, ray_pos, normal);
     float data_value = sample[0];
     if(sample[1] == 0.0)
         return color_in;
@@ -219,7 +262,7 @@ vec4 cast_ray(vec3 ray_begin, vec3 ray_end, vec4 color) {
         }
 
         {{#volumes}}
-            color = add_sample(data[{{.}}], transfer_function[{{.}}], volumes[{{.}}], ray_pos, color);
+            color = add_sample(data[{{.}}], bricks[{{.}}], transfer_function[{{.}}], volumes[{{.}}], ray_pos, color);
         {{/volumes}}
         if(color.a >= 1.)
             break;
@@ -353,7 +396,7 @@ void cast_ray_max(vec3 ray_begin, vec3 ray_end) {
         {{#volumes_max_int}}
         {
             vec3 normal;
-            vec2 sample = sample(data_max_int[{{.}}], volumes_max_int[{{.}}], ray_pos, normal);
+            vec2 sample = sample(data_max_int[{{.}}], bricks_max_int[{{.}}], volumes_max_int[{{.}}], ray_pos, normal);
             if(sample.x > max_values[{{.}}] && sample.y > 0.0) {
                 max_values[{{.}}] = sample.x;
                 has_values[{{.}}] = true;
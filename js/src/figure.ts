@@ -12,7 +12,7 @@ import { semver_range} from "./utils";
 import { VolumeModel, VolumeView } from "./volume.js";
 
 import { mapValues, range } from "lodash";
-import { selectors } from "./selectors";
+import { encode_selection, select_points, selectors } from "./selectors";
 import { Transition } from "./transition";
 
 // tslint:disable-next-line: no-var-requires
@@ -146,6 +146,7 @@ class FigureModel extends widgets.DOMWidgetModel {
             render_continuous: false,
             selector: "lasso",
             selection_mode: "replace",
+            selection_frontend: false,
             mouse_mode: "normal",
             panorama_mode: "no",
             capture_fps: null,
@@ -834,6 +835,10 @@ class FigureView extends widgets.DOMWidgetView {
                     type: "tv",
                     value: [],
                 },
+                bricks: {
+                    type: "tv",
+                    value: [],
+                },
                 transfer_function: {
                     type: "tv",
                     value: [],
@@ -847,6 +852,10 @@ class FigureView extends widgets.DOMWidgetView {
                     type: "tv",
                     value: [],
                 },
+                bricks_max_int: {
+                    type: "tv",
+                    value: [],
+                },
                 transfer_function_max_int: {
                     type: "tv",
                     value: [],
@@ -1278,10 +1287,27 @@ class FigureView extends widgets.DOMWidgetView {
     _mouse_up(e) {
         if (this.selector) {
             const canvas = this.renderer.domElement;
+            const data = this.selector.getData(canvas.clientWidth, canvas.clientHeight);
+            const buffers = [];
+            if (this.model.get("selection_frontend")) {
+                // we have the positions, so we compute the selection here, instead of projecting all points in Python
+                const inside = this.selector.inside(canvas.clientWidth, canvas.clientHeight);
+                const matrix = this.camera.projectionMatrix.clone().multiply(this._get_view_matrix()).elements;
+                data.scatters = [];
+                for (const scatter_view of Object.values(this.scatter_views)) {
+                    const sequence_index = scatter_view.model.get("sequence_index");
+                    const [x, y, z] = ["x", "y", "z"].map((name) => scatter_view.get_current(name, sequence_index, []));
+                    const bitmask = select_points(x, y, z, matrix, inside);
+                    const selection = encode_selection(bitmask, Math.min(x.length, y.length, z.length));
+                    data.scatters.push({model: scatter_view.model.model_id, encoding: selection.encoding,
+                                        length: selection.length});
+                    buffers.push(selection.buffer);
+                }
+            }
             this.send({
                     event: "selection",
-                    data: this.selector.getData(canvas.clientWidth, canvas.clientHeight),
-                });
+                    data,
+                }, buffers);
                 // send event..
             this.mouse_trail = [];
             this.selector.close();
@@ -2111,6 +2137,8 @@ class FigureView extends widgets.DOMWidgetView {
         material.uniforms.volumes_max_int.value = [];
         material.uniforms.data.value = [];
         material.uniforms.data_max_int.value = [];
+        material.uniforms.bricks.value = [];
+        material.uniforms.bricks_max_int.value = [];
         material.uniforms.transfer_function.value = [];
         material.uniforms.transfer_function_max_int.value = [];
         material.uniforms.steps.value = volumes.map((volume) => {
@@ -2128,11 +2156,13 @@ class FigureView extends widgets.DOMWidgetView {
                     count_normal++;
                     material.uniforms.volumes.value.push(volume_view.uniform_volumes_values);
                     material.uniforms.data.value.push(volume_view.uniform_data.value[0]);
+                    material.uniforms.bricks.value.push(volume_view.uniform_bricks.value[0]);
                     material.uniforms.transfer_function.value.push(volume_view.uniform_transfer_function.value[0]);
                 } else {
                     count_max_int++;
                     material.uniforms.volumes_max_int.value.push(volume_view.uniform_volumes_values);
                     material.uniforms.data_max_int.value.push(volume_view.uniform_data.value[0]);
+                    material.uniforms.bricks_max_int.value.push(volume_view.uniform_bricks.value[0]);
                     material.uniforms.transfer_function_max_int.value.push(volume_view.uniform_transfer_function.value[0]);
                 }
             }
@@ -14,3 +14,4 @@ export * from "./tf";
 export * from "./scatter";
 export * from "./volume";
 export * from "./mesh";
+export * from "./texture";
@@ -4,7 +4,7 @@ import * as THREE from "three";
 import { FigureView } from "./figure";
 import { createColormap, patchMaterial, scaleTypeMap } from "./scales";
 import * as serialize from "./serialize.js";
-import { semver_range } from "./utils";
+import { extend_domain, min_max, semver_range } from "./utils";
 import * as values from "./values.js";
 
 export
@@ -99,8 +99,55 @@ class MeshView extends widgets.WidgetView {
             this.on_change, this);
         this.model.on("change:geo change:connected", this.update_, this);
         this.model.on("change:color_scale", this._update_color_scale, this);
-        this.model.on("change:texture", this._load_textures, this);
+        this.model.on("change:color", () => {
+            if (this.model.get("color_scale")) {
+                this._update_color_scale_domain(); // the domain can depend on the data
+            }
+        }, this);
+        this.model.on("change:texture", () => {
+            this._load_textures();
+            this._update_materials();
+            this.update_();
+        }, this);
         this.model.on("change:visible", this.update_visibility, this);
+        this.model.on("update_points", this.update_points, this);
+    }
+
+    public update_points(updates) {
+        // parts of frames were updated in place (see serialize.update_arrays), only upload those parts if the frame is
+        // used, x, y and z are merged into the position attribute, so we copy them, other attributes can use the frame
+        // directly, when a copy is used instead, we rebuild once
+        let rebuild = false;
+        const color_scale = this.model.get("color_scale");
+        for (const {name, frame, start, end} of updates) {
+            const frames = this.model.get(name);
+            const array = frames[frame];
+            const current = array === frames[this.model.get("sequence_index") % frames.length];
+            const component = ["x", "y", "z"].indexOf(name);
+            if (name === "color" && color_scale && current) {
+                this.uniforms.domain_color.value = extend_domain(this.uniforms.domain_color.value, color_scale, array, start, end);
+            }
+            let found = false;
+            for (const mesh of this.meshes) {
+                const position = mesh.geometry.attributes.position;
+                if (component !== -1 && current && position.count >= end) {
+                    for (let i = start; i < end; i++) {
+                        position.array[i * 3 + component] = array[i];
+                    }
+                    position.updateRange = {offset: start * 3, count: (end - start) * 3};
+                    position.needsUpdate = true;
+                    found = true;
+                } else if (component === -1) {
+                    found = values.update_attribute_range(mesh.geometry, array, start, end) || found;
+                }
+            }
+            rebuild = rebuild || (!found && current);
+        }
+        if (rebuild) {
+            this.update_();
+        } else {
+            this.renderer.update();
+        }
     }
 
     public update_visibility() {
@@ -126,14 +173,17 @@ class MeshView extends widgets.WidgetView {
                 this.update_();
             });
         } else {
-            this.textures = this.model.get("texture").map((texture_url) =>
-                this.texture_loader.load(texture_url, (threejs_texture) => {
+            this.textures = this.model.get("texture").map((texture) => {
+                if (typeof texture !== "string") { // a TextureModel, shared with other widgets
+                    return texture.get("data");
+                }
+                return this.texture_loader.load(texture, (threejs_texture) => {
                     threejs_texture.wrapS = THREE.RepeatWrapping;
                     threejs_texture.wrapT = THREE.RepeatWrapping;
                     this._update_materials();
                     this.update_();
-                }),
-            );
+                });
+            });
         }
     }
 
@@ -213,8 +263,11 @@ class MeshView extends widgets.WidgetView {
         if (isArray(value) && !isNumber(value[0])) {
             // check whether alpha component was provided or not
             const out_index = index % value.length;
-            const rows = (value as any).original_data[out_index].shape[0];
-            const cols = (value as any).original_data[out_index].shape[1];
+            const original_data = (value as any).original_data;
+            // a sequence packed in a single buffer (see serialize.pack_sequence) only has 1d frames
+            const shape = isArray(original_data) ? original_data[out_index].shape : [value[out_index].length];
+            const rows = shape[0];
+            const cols = shape[1];
 
             if ((cols === 3) && isNumber(value[out_index][0])) {
                 // for rbg colors add alphas
@@ -303,18 +356,13 @@ class MeshView extends widgets.WidgetView {
     _update_color_scale_domain() {
         const color_scale = this.model.get("color_scale");
         const color = this.model.get("color");
-        if (color) {
-            let min;
-            let max;
-            if (color_scale.min !== null) {
-                min = color_scale.min;
-            } else {
-                min = Math.min(...color);
-            }
-            if (color_scale.max !== null) {
-                max = color_scale.max;
-            } else {
-                max = Math.max(...color);
+        if (color && typeof color !== "string") {
+            let min = color_scale.min;
+            let max = color_scale.max;
+            if (min === null || max === null) {
+                const [data_min, data_max] = min_max(color);
+                min = min !== null ? min : data_min;
+                max = max !== null ? max : data_max;
             }
             this.uniforms.domain_color.value = [min, max];
         } else {
@@ -483,8 +531,8 @@ class MeshView extends widgets.WidgetView {
                 geometry.addAttribute("color", new THREE.BufferAttribute(current.array.color, 1));
                 geometry.addAttribute("color_previous", new THREE.BufferAttribute(previous.array.color, 1));
             } else {
-                geometry.addAttribute("color", new THREE.BufferAttribute(current.array_vec4.color, 4));
-                geometry.addAttribute("color_previous", new THREE.BufferAttribute(previous.array_vec4.color, 4));
+                geometry.addAttribute("color", new THREE.BufferAttribute(current.array_vec4.color, 4, true));
+                geometry.addAttribute("color_previous", new THREE.BufferAttribute(previous.array_vec4.color, 4, true));
             }
             geometry.setIndex(new THREE.BufferAttribute(triangles, 1));
             const texture = this.model.get("texture");
@@ -524,8 +572,8 @@ class MeshView extends widgets.WidgetView {
                 color = new THREE.BufferAttribute(current.array.color, 1);
                 color_previous = new THREE.BufferAttribute(previous.array.color, 1);
             } else {
-                color = new THREE.BufferAttribute(current.array_vec4.color, 4);
-                color_previous = new THREE.BufferAttribute(previous.array_vec4.color, 4);
+                color = new THREE.BufferAttribute(current.array_vec4.color, 4, true);
+                color_previous = new THREE.BufferAttribute(previous.array_vec4.color, 4, true);
             }
             color.normalized = true;
             geometry.addAttribute("color", color);
@@ -580,6 +628,15 @@ class MeshModel extends widgets.WidgetModel {
         material: { deserialize: widgets.unpack_models },
         line_material: { deserialize: widgets.unpack_models },
     };
+    initialize(attributes, options) {
+        super.initialize(attributes, options);
+        this.on("msg:custom", (content, buffers) => {
+            if (content.msg === "update_points") {
+                serialize.update_arrays(this, content, buffers);
+            }
+        });
+    }
+
     defaults() {
         return {
             ...super.defaults(),
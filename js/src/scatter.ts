@@ -3,7 +3,7 @@ import { isArray, isEqual, isNumber } from "lodash";
 import * as THREE from "three";
 import { createColormap, patchMaterial, scaleTypeMap } from "./scales";
 import * as serialize from "./serialize.js";
-import { semver_range } from "./utils";
+import { extend_domain, min_max, semver_range } from "./utils";
 import * as values from "./values.js";
 // tslint:disable-next-line: no-var-requires
 const cat_data = require("../data/cat.json");
@@ -157,8 +157,17 @@ class ScatterView extends widgets.WidgetView {
             this.on_change, this);
         this.model.on("change:geo change:connected", this.update_, this);
         this.model.on("change:color_scale", this._update_color_scale, this);
-        this.model.on("change:texture", this._load_textures, this);
+        this.model.on("change:color", () => {
+            if (this.model.get("color_scale")) {
+                this._update_color_scale_domain(); // the domain can depend on the data
+            }
+        }, this);
+        this.model.on("change:texture", () => {
+            this._load_textures();
+            this.update_();
+        }, this);
         this.model.on("change:visible", this.update_visibility, this);
+        this.model.on("update_points", this.update_points, this);
         this.model.on("change:geo", () => {
             this._update_materials();
             this.renderer.update();
@@ -232,13 +241,38 @@ class ScatterView extends widgets.WidgetView {
                 this.update_();
             });
         } else {
-            this.textures = this.model.get("texture").map((texture_url) =>
-                this.texture_loader.load(texture_url, (threejs_texture) => {
+            this.textures = this.model.get("texture").map((texture) => {
+                if (typeof texture !== "string") { // a TextureModel, shared with other widgets
+                    return texture.get("data");
+                }
+                return this.texture_loader.load(texture, (threejs_texture) => {
                     threejs_texture.wrapS = THREE.RepeatWrapping;
                     threejs_texture.wrapT = THREE.RepeatWrapping;
                     this.update_();
-                }),
-            );
+                });
+            });
+        }
+    }
+    update_points(updates) {
+        // parts of frames were updated in place (see serialize.update_arrays), only upload those parts if an attribute
+        // uses the frame directly, otherwise a copy is used (e.g. due to selection), and we rebuild once
+        let rebuild = false;
+        const color_scale = this.model.get("color_scale");
+        for (const {name, frame, start, end} of updates) {
+            const frames = this.model.get(name);
+            const array = frames[frame];
+            const current = array === frames[this.model.get("sequence_index") % frames.length];
+            if (name === "color" && color_scale && current) {
+                this.uniforms.domain_color.value = extend_domain(this.uniforms.domain_color.value, color_scale, array, start, end);
+            }
+            if (this.line_segments || !values.update_attribute_range(this.mesh.geometry, array, start, end)) {
+                rebuild = rebuild || current;
+            }
+        }
+        if (rebuild) {
+            this.update_();
+        } else {
+            this.renderer.update();
         }
     }
     update_visibility() {
@@ -375,18 +409,13 @@ class ScatterView extends widgets.WidgetView {
     _update_color_scale_domain() {
         const color_scale = this.model.get("color_scale");
         const color = this.model.get("color");
-        if (color) {
-            let min;
-            let max;
-            if (color_scale.min !== null) {
-                min = color_scale.min;
-            } else {
-                min = Math.min(...color);
-            }
-            if (color_scale.max !== null) {
-                max = color_scale.max;
-            } else {
-                max = Math.max(...color);
+        if (color && typeof color !== "string") {
+            let min = color_scale.min;
+            let max = color_scale.max;
+            if (min === null || max === null) {
+                const [data_min, data_max] = min_max(color);
+                min = min !== null ? min : data_min;
+                max = max !== null ? max : data_max;
             }
             this.uniforms.domain_color.value = [min, max];
         } else {
@@ -554,8 +583,8 @@ class ScatterView extends widgets.WidgetView {
                 geometry.addAttribute("color", new THREE.BufferAttribute(current.array.color, 1));
                 geometry.addAttribute("color_previous", new THREE.BufferAttribute(previous.array.color, 1));
             } else {
-                geometry.addAttribute("color", new THREE.BufferAttribute(current.array_vec4.color, 4));
-                geometry.addAttribute("color_previous", new THREE.BufferAttribute(previous.array_vec4.color, 4));
+                geometry.addAttribute("color", new THREE.BufferAttribute(current.array_vec4.color, 4, true));
+                geometry.addAttribute("color_previous", new THREE.BufferAttribute(previous.array_vec4.color, 4, true));
             }
 
             this.line_segments = new THREE.Line(geometry, this.line_material);
@@ -595,7 +624,7 @@ class ScatterModel extends widgets.WidgetModel {
         vx: serialize.array_or_json,
         vy: serialize.array_or_json,
         vz: serialize.array_or_json,
-        selected: serialize.array_or_json,
+        selected: serialize.selection,
         size: serialize.array_or_json,
         size_selected: serialize.array_or_json,
         size_x_scale: { deserialize: widgets.unpack_models },
@@ -609,6 +638,15 @@ class ScatterModel extends widgets.WidgetModel {
         line_material: { deserialize: widgets.unpack_models },
     };
 
+    initialize(attributes, options) {
+        super.initialize(attributes, options);
+        this.on("msg:custom", (content, buffers) => {
+            if (content.msg === "update_points") {
+                serialize.update_arrays(this, content, buffers);
+            }
+        });
+    }
+
     defaults() {
         return {...super.defaults(),
             _model_name : "ScatterModel",
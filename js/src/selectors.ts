@@ -42,6 +42,31 @@ class LassoSelector {
         };
         return data;
     }
+    // returns a function that tests if a point (in device coordinates) is inside the lasso, using the even-odd rule
+    inside(width, height) {
+        const polygon = this.points.map((xy) => _scale_point(xy, width, height));
+        if (polygon.length < 3) {
+            return (x, y) => false;
+        }
+        const xs = polygon.map((xy) => xy[0]);
+        const ys = polygon.map((xy) => xy[1]);
+        const xmin = Math.min(...xs);
+        const xmax = Math.max(...xs);
+        const ymin = Math.min(...ys);
+        const ymax = Math.max(...ys);
+        return (x, y) => {
+            if (x < xmin || x > xmax || y < ymin || y > ymax) {
+                return false;
+            }
+            let inside = false;
+            for (let i = 0, j = polygon.length - 1; i < polygon.length; j = i++) {
+                if ((ys[i] > y) !== (ys[j] > y) && x < xs[i] + (y - ys[i]) * (xs[j] - xs[i]) / (ys[j] - ys[i])) {
+                    inside = !inside;
+                }
+            }
+            return inside;
+        };
+    }
 }
 
 export
@@ -93,6 +118,16 @@ class CircleSelector {
         };
         return data;
     }
+    inside(width, height) {
+        if (!this.begin || !this.end) {
+            return (x, y) => false;
+        }
+        // like the Python side, the radius is in device coordinates
+        const [x1, y1] = _scale_point(this.begin, width, height);
+        const [x2, y2] = _scale_point(this.end, width, height);
+        const r2 = (x2 - x1) * (x2 - x1) + (y2 - y1) * (y2 - y1);
+        return (x, y) => (x - x1) * (x - x1) + (y - y1) * (y - y1) < r2;
+    }
 }
 
 export
@@ -140,6 +175,65 @@ class RectangleSelector {
             device: { begin: _scale_point(this.begin, width, height), end: _scale_point(this.end, width, height) },
         };
     }
+    inside(width, height) {
+        if (!this.begin || !this.end) {
+            return (x, y) => false;
+        }
+        const [x1, y1] = _scale_point(this.begin, width, height);
+        const [x2, y2] = _scale_point(this.end, width, height);
+        const xmin = Math.min(x1, x2);
+        const xmax = Math.max(x1, x2);
+        const ymin = Math.min(y1, y2);
+        const ymax = Math.max(y1, y2);
+        return (x, y) => x >= xmin && x <= xmax && y >= ymin && y <= ymax;
+    }
+}
+// project the points with matrix (column major, as THREE.Matrix4.elements) to device coordinates, and return a bitmask
+// of the visible points for which inside(x, y) is true, one bit per point, least significant bit first
+// (like ipyvolume.utils.project_points, points outside of the view frustum are never selected)
+export
+function select_points(x, y, z, matrix, inside) {
+    const e = matrix;
+    const length = Math.min(x.length, y.length, z.length);
+    const bitmask = new Uint8Array(Math.ceil(length / 8));
+    for (let i = 0; i < length; i++) {
+        const w = e[3] * x[i] + e[7] * y[i] + e[11] * z[i] + e[15];
+        const device_x = (e[0] * x[i] + e[4] * y[i] + e[8] * z[i] + e[12]) / w;
+        const device_y = (e[1] * x[i] + e[5] * y[i] + e[9] * z[i] + e[13]) / w;
+        const depth = (e[2] * x[i] + e[6] * y[i] + e[10] * z[i] + e[14]) / w;
+        if (w > 0 && Math.abs(depth) <= 1 && inside(device_x, device_y)) {
+            bitmask[i >> 3] |= 1 << (i & 7);
+        }
+    }
+    return bitmask;
+}
+
+// a selection is often a few runs of consecutive points (e.g. for sorted data), in which case the start and end of
+// the runs are smaller than the bitmask, see ipyvolume.serialize.selection_to_mask for the Python side
+export
+function encode_selection(bitmask, length) {
+    const ranges = [];
+    let start = -1;
+    for (let i = 0; i < length; i++) {
+        const selected = (bitmask[i >> 3] >> (i & 7)) & 1;
+        if (selected && start === -1) {
+            start = i;
+        } else if (!selected && start !== -1) {
+            ranges.push(start, i);
+            start = -1;
+        }
+        if (ranges.length * 4 >= bitmask.byteLength) {
+            return {encoding: "bitmask", length, buffer: bitmask};
+        }
+    }
+    if (start !== -1) {
+        ranges.push(start, length);
+    }
+    if (ranges.length * 4 >= bitmask.byteLength) {
+        return {encoding: "bitmask", length, buffer: bitmask};
+    }
+    return {encoding: "ranges", length, buffer: new Uint32Array(ranges)};
 }
+
 export
 let selectors = { lasso: LassoSelector, circle: CircleSelector, rectangle: RectangleSelector };
@@ -80,6 +80,29 @@ const arrayToTypes = {
     Float64Array: "float64",
 };
 
+// large buffers can be compressed by the kernel, see ipyvolume.serialize.compression
+const decompressors = {
+    zlib: (bytes) => require("pako").inflate(bytes),
+    lz4: (bytes) => require("lz4js").decompress(bytes),
+    zstd: (bytes) => require("fzstd").decompress(bytes),
+};
+
+export
+function decompress(data, compression): ArrayBuffer {
+    if (!compression) {
+        return data.buffer;
+    }
+    if (!decompressors[compression]) {
+        throw new Error("unknown compression: " + compression);
+    }
+    const bytes = new Uint8Array(data.buffer, data.byteOffset, data.byteLength);
+    const result = decompressors[compression](bytes);
+    if (result.byteOffset === 0 && result.byteLength === result.buffer.byteLength) {
+        return result.buffer;
+    }
+    return result.slice().buffer;
+}
+
 function deserialize_typed_array(data, manager) {
     const type = typesToArray[data.dtype];
     if (data == null) {
@@ -91,8 +114,58 @@ function deserialize_typed_array(data, manager) {
     if (!data.data.buffer) {
         console.log("data.data.buffer is null");
     }
-    return new type(data.data.buffer); //
+    const array = new type(decompress(data.data, data.compression));
+    if (typeof data.scale !== "undefined") {
+        return dequantize(array, data.offset, data.scale);
+    }
+    return array;
+}
 
+function dequantize(values, offset, scale) {
+    // see ipyvolume.serialize.quantize, 65535 encodes non-finite values
+    const result = new Float32Array(values.length);
+    for (let i = 0; i < values.length; i++) {
+        result[i] = values[i] === 65535 ? NaN : offset + values[i] * scale;
+    }
+    return result;
+}
+
+function delta_sequence(data, decoded) {
+    // frames with a delta_scale are the quantized difference with the previous frame, the others are keyframes
+    // (see ipyvolume.serialize.position_sequence_to_binary_or_json), frames are reconstructed when accessed
+    let cached_index = -1;
+    let cached = null;
+    function reconstruct(index) {
+        if (index === cached_index) {
+            return cached;
+        }
+        let keyframe = index;
+        while (typeof data[keyframe].delta_scale !== "undefined") {
+            keyframe--;
+        }
+        if (keyframe === index) {
+            return decoded[index];
+        }
+        // continue from the last reconstructed frame when playing forward, the frames are copied since views keep
+        // a reference to the previous frame for the animation
+        let i = (cached_index >= keyframe && cached_index < index) ? cached_index : keyframe;
+        const frame = Float32Array.from(i === keyframe ? decoded[keyframe] : cached);
+        for (i++; i <= index; i++) {
+            const delta = decoded[i];
+            const scale = data[i].delta_scale;
+            for (let j = 0; j < frame.length; j++) {
+                frame[j] += delta[j] * scale;
+            }
+        }
+        cached_index = index;
+        cached = frame;
+        return frame;
+    }
+    const frames = [];
+    for (let index = 0; index < decoded.length; index++) {
+        Object.defineProperty(frames, index, { get: () => reconstruct(index), enumerable: true });
+    }
+    return frames;
 }
 
 export
@@ -103,8 +176,17 @@ function deserialize_array_or_json(data, manager) {
     let arrays = null;
     if (isNumber(data)) { // plain number
         return data;
+    } else if (typeof data.offsets !== "undefined") { // a sequence packed in a single buffer, see pack_sequence
+        const packed = deserialize_typed_array(data, manager);
+        arrays = [];
+        for (let i = 0; i < data.offsets.length - 1; i++) {
+            arrays.push(packed.subarray(data.offsets[i], data.offsets[i + 1]));
+        }
     } else { // should be an array of buffer+dtype+shape
         arrays = data.map((element) => deserialize_typed_array(element, manager));
+        if (data.some((element) => typeof element.delta_scale !== "undefined")) {
+            arrays = delta_sequence(data, arrays);
+        }
     }
     arrays.original_data = data;
     return arrays;
@@ -139,6 +221,33 @@ function deserialize_array_or_json(data, manager) {
     return arrays;*/
 }
 
+// a selection is either a bitmask (ipyvolume.utils.Bitset), or indices like deserialize_array_or_json
+export
+function deserialize_selection(data, manager) {
+    if (data != null && typeof data.bitmask !== "undefined") {
+        return {bitmask: deserialize_typed_array(data.bitmask, manager), length: data.length, original_data: data};
+    }
+    return deserialize_array_or_json(data, manager);
+}
+
+export
+function update_arrays(model, content, buffers) {
+    // apply a partial update of the frames of array attributes in place, see ipyvolume.widgets.Scatter.update_points
+    // all arrays are updated first, and then a single update_points event is triggered with the changed ranges
+    widgets.put_buffers(content, content.buffer_paths, buffers);
+    const updates = [];
+    for (const {name, ranges} of content.arrays) {
+        const frames = model.get(name);
+        for (const range of ranges) {
+            const values = deserialize_typed_array(range, null);
+            const item_size = values.length / (range.end - range.start);
+            frames[range.frame].set(values, range.start * item_size);
+            updates.push({name, frame: range.frame, start: range.start, end: range.end});
+        }
+    }
+    model.trigger("update_points", updates);
+}
+
 export
 function deserialize_color_or_json(data, manager) {
     if (data == null) {
@@ -218,8 +327,34 @@ function deserialize_texture(data, manager) {
             return widgets.unpack_models(data, manager);
         }
     }
+    if (isArray(data)) { // urls, or references to shared textures (see ipyvolume.serialize.update_texture_frames)
+        return widgets.unpack_models(data, manager);
+    }
     return data;
 }
+
+function deserialize_data_texture(data, manager) {
+    if (data === null) {
+        return null;
+    }
+    const pixels = new Uint8Array(decompress(data.data, data.compression));
+    const [height, width] = data.shape;
+    const texture = new THREE.DataTexture(pixels, width, height, THREE.RGBAFormat, THREE.UnsignedByteType);
+    texture.wrapS = THREE.RepeatWrapping;
+    texture.wrapT = THREE.RepeatWrapping;
+    // like the TextureLoader path for images, the kernel sends power of two sizes (see serialize._encode_rgba)
+    texture.magFilter = THREE.LinearFilter;
+    texture.minFilter = THREE.LinearMipMapLinearFilter;
+    texture.generateMipmaps = true;
+    texture.needsUpdate = true;
+    (texture as any).original_data = data;
+    return texture;
+}
+
+function serialize_data_texture(texture, manager) {
+    return texture === null ? null : texture.original_data;
+}
+
 function deserialize_ndarray(data, manager) {
     if (data === null) {
         return null;
@@ -240,16 +375,18 @@ function serialize_ndarray(data, manager) {
 }
 
 function serialize_texture(data, manager) {
-    return data;
+    return widgets.pack_models(data, manager);
 }
 
 // (window as any).ndarray = ndarray;
 
 export const texture = { deserialize: deserialize_texture, serialize: serialize_texture };
+export const data_texture = { deserialize: deserialize_data_texture, serialize: serialize_data_texture };
 // export const serialize_array_or_json = serialize_array_or_json;
 // export const deserialize_array_or_json = deserialize_array_or_json;
 // export const deserialize_color_or_json = deserialize_color_or_json;
 export const array_or_json = { deserialize: deserialize_array_or_json, serialize: serialize_array_or_json };
 export const color_or_json = { deserialize: deserialize_color_or_json, serialize: serialize_array_or_json };
+export const selection = { deserialize: deserialize_selection, serialize: serialize_array_or_json };
 const _ndarray = {deserialize: deserialize_ndarray, serialize: serialize_ndarray };
 export {_ndarray as ndarray};
@@ -27,6 +27,22 @@ describe("mesh >", () => {
         expect(blue).to.eq(0);
         expect(alpha).to.eq(255);
     });
+    it("sequence packed in a single buffer", async function() {
+        // 2 frames of 4 vertices, like ipyvolume.serialize.pack_sequence sends (S, N) arrays
+        const packed = (ar) => ({ dtype: "float32", data: new Float32Array([...ar, ...ar]), shape: [8], offsets: [0, 4, 8] });
+        const x = packed([0.0, 0, 1., 1.]);
+        const y = packed([0.1, 1000.0, 0.1, 1000.0]);
+        const z = packed([0.5, 0.5, 0.5, 0.5]);
+        const { mesh, figure } = await create_figure_mesh_triangles(this.manager, x, y, z, [data_uint32([0, 2, 3, 0, 3, 1])],
+                                                                    {sequence_index: 1});
+        expect(mesh.model.get("x").length).to.eq(2);
+        figure._real_update();
+        const [red, green, blue, alpha] = await figure.readPixel(test_x, test_y);
+        expect(red).to.be.gt(150);
+        expect(green).to.eq(0);
+        expect(blue).to.eq(0);
+        expect(alpha).to.eq(255);
+    });
     it("with color scale", async function() {
         const x = data_float32([0.0, 0, 1., 1.]);
         const y = data_float32([0.1, 1000.0, 0.1, 1000.0]);
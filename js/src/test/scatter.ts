@@ -3,6 +3,7 @@
 import * as bqplot from "bqplot";
 import { expect } from "chai";
 import * as ipyvolume from "../";
+import {update_arrays} from "../serialize";
 import {DummyManager} from "./dummy-manager";
 import {create_color_scale, create_figure_scatter, create_model, data_float32} from "./widget-utils";
 
@@ -90,4 +91,28 @@ describe("scatter >", () => {
         expect(alpha).to.eq(255);
 
     });
+    it("update_points with a color scale in place", async function() {
+        // like the ipyvolume.widgets.StreamingScatter example, x and color are updated in a single message
+        const x = data_float32([0.5, 0.5]);
+        const y = data_float32([10, 10]);
+        const z = data_float32([0.5, 0.5]);
+        const color = data_float32([0.5, 0.5]);
+        const color_scale = await create_color_scale(this.manager, "color_scale", null, null);
+        const { scatter, figure } = await create_figure_scatter(this.manager, [x], [y], [z], {color_scale: "IPY_MODEL_color_scale", color});
+        let rebuilds = 0;
+        const update_ = scatter.update_.bind(scatter);
+        scatter.update_ = () => { rebuilds += 1; update_(); };
+        const geometry = scatter.mesh.geometry;
+        update_arrays(scatter.model, {msg: "update_points", buffer_paths: [], arrays: [
+            {name: "x", ranges: [{...data_float32([0.25]), frame: 0, start: 1, end: 2}]},
+            {name: "color", ranges: [{...data_float32([2.0]), frame: 0, start: 1, end: 2}]},
+        ]}, []);
+        expect(rebuilds).to.eq(0);
+        expect(scatter.mesh.geometry).to.eq(geometry);
+        expect(geometry.attributes.x.array[1]).to.eq(0.25);
+        expect(geometry.attributes.color.array[1]).to.eq(2.0);
+        expect(geometry.attributes.color.updateRange).to.deep.equal({offset: 1, count: 1});
+        // the domain grows with the updated values only
+        expect(scatter.uniforms.domain_color.value).to.deep.equal([0.5, 2.0]);
+    });
 });
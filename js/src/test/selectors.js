@@ -1,4 +1,4 @@
-import { LassoSelector, CircleSelector, RectangleSelector } from "../selectors";
+import { LassoSelector, CircleSelector, RectangleSelector, select_points, encode_selection } from "../selectors";
 import { expect } from 'chai';
 
 const color_inside = [255, 0, 0, 128];
@@ -101,4 +101,24 @@ describe("Selector", () => {
         expect(Array.prototype.slice.call(data_inside.data)).to.deep.equals(color_outside)
         expect(Array.prototype.slice.call(data_outside.data)).to.deep.equals(color_outside)
     });
+    it("select points", () => {
+        let canvas = document.createElement('canvas');
+        let selector = new RectangleSelector(canvas);
+        selector.mouseMove(0, 0);
+        selector.mouseMove(5, 10);
+        // identity projection, so x and y are device coordinates, only the first 3 and last point are inside
+        const identity = [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1];
+        const x = [-0.9, -0.5, -0.1, 0.5, 0.9, 0.5, 0.5, 0.5, 0.5, -0.5];
+        const y = x.map(() => 0);
+        const bitmask = select_points(x, y, y, identity, selector.inside(10, 10));
+        expect(Array.prototype.slice.call(bitmask)).to.deep.equals([1 + 2 + 4, 2]);
+        const selection = encode_selection(bitmask, x.length);
+        expect(selection.encoding).to.equal('bitmask');
+        const many = new Uint8Array(100);
+        many[1] = 255;
+        many[2] = 1;
+        const ranges = encode_selection(many, 800);
+        expect(ranges.encoding).to.equal('ranges');
+        expect(Array.prototype.slice.call(ranges.buffer)).to.deep.equals([8, 17]);
+    });
 });
@@ -0,0 +1,22 @@
+import * as widgets from "@jupyter-widgets/base";
+import * as serialize from "./serialize.js";
+import { semver_range } from "./utils";
+
+// one frame of an image texture, shared by all scatters and meshes that use an image with the same content
+// (see ipyvolume.widgets.Texture), data is deserialized to a THREE.DataTexture, so it is uploaded to the GPU once
+export
+class TextureModel extends widgets.WidgetModel {
+    static serializers = {
+        ...widgets.WidgetModel.serializers,
+        data: serialize.data_texture,
+    };
+
+    defaults() {
+        return {...super.defaults(),
+            _model_name : "TextureModel",
+            _model_module : "ipyvolume",
+            _model_module_version: semver_range,
+            data: null,
+        };
+    }
+}
@@ -24,6 +24,37 @@ function get_array_dimension(array) {
     return dimension;
 }
 
+export
+function min_max(arrays, start = 0, end = Infinity) {
+    // minimum and maximum of a (sequence of) typed array(s), ignoring NaN, without spreading them as arguments
+    // start and end limit it to a range of each array
+    let min = Infinity;
+    let max = -Infinity;
+    for (const array of (is_typedarray(arrays) ? [arrays] : arrays)) {
+        for (let i = start; i < Math.min(end, array.length); i++) {
+            if (array[i] < min) {
+                min = array[i];
+            }
+            if (array[i] > max) {
+                max = array[i];
+            }
+        }
+    }
+    return [min, max];
+}
+
+export
+function extend_domain(domain, scale, array, start, end) {
+    // grow a [min, max] domain with the values in a range of array, for the bounds that the scale does not fix, which
+    // avoids scanning all values after a partial update
+    if (scale.min !== null && scale.max !== null) {
+        return domain;
+    }
+    const [data_min, data_max] = min_max(array, start, end);
+    return [scale.min !== null ? domain[0] : Math.min(domain[0], data_min),
+            scale.max !== null ? domain[1] : Math.max(domain[1], data_max)];
+}
+
 export
 function download_image(data) {
     const a = document.createElement("a");
@@ -16,6 +16,30 @@ interface IArrayValues {
     z?: [];
 }
 
+// colors are either floats in [0, 1], or uint8 values in [0, 255] (normalized by WebGL), this returns the factor
+// to go from the source to the target representation
+function color_factor(target, source) {
+    const target_uint8 = target instanceof Uint8Array;
+    const source_uint8 = source instanceof Uint8Array;
+    return target_uint8 === source_uint8 ? 1 : (target_uint8 ? 255 : 1 / 255);
+}
+
+// after a partial update of array (see serialize.update_arrays), only upload the updated range of the attributes that
+// use it to the GPU, returns false when no attribute uses it (because it was copied)
+export
+function update_attribute_range(geometry, array, start, end) {
+    let found = false;
+    for (const name of Object.keys(geometry.attributes)) {
+        const attribute = geometry.attributes[name];
+        if (attribute.array === array) {
+            attribute.updateRange = {offset: start * attribute.itemSize, count: (end - start) * attribute.itemSize};
+            attribute.needsUpdate = true;
+            found = true;
+        }
+    }
+    return found;
+}
+
 /* Manages a list of scalar and arrays for use with WebGL instanced rendering
 */
 export
@@ -190,14 +214,18 @@ class Values {
             if (typeof other.array_vec4[name] === "undefined") {
                 // then other must be a scalar
                 const other_scalar = other.scalar_vec4[name];
+                const factor = color_factor(new_array, other_scalar);
                 for (let i = this.length; i < other.length; i++) {
-                    new_array[i * 4 + 0] = other_scalar[0];
-                    new_array[i * 4 + 1] = other_scalar[1];
-                    new_array[i * 4 + 2] = other_scalar[2];
-                    new_array[i * 4 + 3] = other_scalar[3];
+                    new_array[i * 4 + 0] = other_scalar[0] * factor;
+                    new_array[i * 4 + 1] = other_scalar[1] * factor;
+                    new_array[i * 4 + 2] = other_scalar[2] * factor;
+                    new_array[i * 4 + 3] = other_scalar[3] * factor;
                 }
             } else {
-                new_array.set(other.array_vec4[name].slice(this.length * 4), this.length * 4);
+                const other_array = other.array_vec4[name].slice(this.length * 4);
+                const factor = color_factor(new_array, other_array);
+                new_array.set(factor === 1 ? other_array : Float32Array.from(other_array, (value) => value * factor),
+                              this.length * 4);
             }
             new_array.set(array_vec4);
             return new_array;
@@ -212,16 +240,31 @@ class Values {
         // copy since we will modify
         const color = (this.array_vec4.color as any) = this.array_vec4.color.slice();
         const color_selected = this.array_vec4.color_selected;
+        const factor = color_factor(color, color_selected);
         // this assumes, and requires that color_selected is an array, maybe a bit inefficient
-        selected.forEach((element, index) => {
+        const select_index = (index) => {
             if (index < this.length) {
                 sizes[index] = size_selected[index];
-                color[index * 4 + 0] = color_selected[index * 4 + 0];
-                color[index * 4 + 1] = color_selected[index * 4 + 1];
-                color[index * 4 + 2] = color_selected[index * 4 + 2];
-                color[index * 4 + 3] = color_selected[index * 4 + 3];
+                color[index * 4 + 0] = color_selected[index * 4 + 0] * factor;
+                color[index * 4 + 1] = color_selected[index * 4 + 1] * factor;
+                color[index * 4 + 2] = color_selected[index * 4 + 2] * factor;
+                color[index * 4 + 3] = color_selected[index * 4 + 3] * factor;
             }
-        });
+        };
+        if (selected.bitmask) { // see serialize.deserialize_selection
+            const bitmask = selected.bitmask;
+            for (let byte = 0; byte < bitmask.length; byte++) {
+                if (bitmask[byte] !== 0) { // skip 8 unselected points at once
+                    for (let bit = 0; bit < 8; bit++) {
+                        if ((bitmask[byte] >> bit) & 1) {
+                            select_index(byte * 8 + bit);
+                        }
+                    }
+                }
+            }
+        } else {
+            selected.forEach((index) => select_index(index));
+        }
     }
 
     merge_to_vec3(names, new_name) {
@@ -38,11 +38,18 @@ class VolumeView extends widgets.WidgetView {
         slice_size?: any,
         scale?: any,
         offset?: any,
+        bricked?: any,
+        brick_size?: any,
+        brick_shape?: any,
+        shape?: any,
     };
     uniform_data: { type: string; value: any[]; };
+    uniform_bricks: { type: string; value: any[]; };
     uniform_transfer_function: { type: string; value: any[]; };
     volume: any;
+    frame_extent: any;
     texture_volume: THREE.DataTexture;
+    texture_bricks: THREE.DataTexture;
     box_geo: THREE.BoxBufferGeometry;
     render() {
         this.renderer = this.options.parent;
@@ -75,6 +82,7 @@ class VolumeView extends widgets.WidgetView {
 
         this.uniform_volumes_values = {};
         this.uniform_data = {type: "tv", value: []};
+        this.uniform_bricks = {type: "tv", value: []};
         this.uniform_transfer_function = {type: "tv", value: []};
 
         // var update_volr_defines = () => {
@@ -102,6 +110,7 @@ class VolumeView extends widgets.WidgetView {
         this.add_to_scene();
 
         this.model.on("change:data", this.data_set, this);
+        this.model.on("frame change:sequence_index", this.frame_set, this);
 
         const update_minmax = () => {
             this.uniform_volumes_values.data_range = [this.model.get("data_min"), this.model.get("data_max")];
@@ -180,12 +189,30 @@ class VolumeView extends widgets.WidgetView {
     }
 
     data_set() {
-        this.volume = this.model.get("data");
+        this.frame_extent = null;
+        this.volume_set(this.model.get("data"));
+    }
+
+    frame_set() {
+        // for time series, frames are send (ahead of time) using custom messages
+        const frame = (this.model as VolumeModel).frames[Math.round(this.model.get("sequence_index"))];
+        if (frame) {
+            this.frame_extent = frame.extent;
+            this.volume_set(frame.volume);
+        }
+    }
+
+    volume_set(volume) {
+        this.volume = volume;
         const data = new Uint8Array(this.volume.tiles.buffer);
+        // without lighting, only the intensity is send, which ends up in the alpha channel just like the rgba format
+        const format = this.volume.format === "intensity" ? THREE.AlphaFormat : THREE.RGBAFormat;
         this.texture_volume = new THREE.DataTexture(data, this.volume.image_shape[0], this.volume.image_shape[1],
-                                                    THREE.RGBAFormat, THREE.UnsignedByteType);
+                                                    format, THREE.UnsignedByteType);
         this.texture_volume.magFilter = THREE.LinearFilter;
         this.texture_volume.minFilter = THREE.LinearFilter;
+        // rows of the 1 byte per pixel intensity atlas are not padded to 4 bytes, its width need not be a multiple of 4
+        this.texture_volume.unpackAlignment = 1;
         this.uniform_volumes_values.rows = this.volume.rows;
         this.uniform_volumes_values.columns = this.volume.columns;
         this.uniform_volumes_values.slices = this.volume.slices;
@@ -197,10 +224,39 @@ class VolumeView extends widgets.WidgetView {
         this.uniform_volumes_values.show_range = [this.model.get("show_min"), this.model.get("show_max")];
         this.texture_volume.needsUpdate = true; // without this it doesn't seem to work
         this.data_shape = [this.volume.slice_shape[0], this.volume.slice_shape[1], this.volume.slices];
+        this.bricks_set();
         this.renderer.rebuild_multivolume_rendering_material();
         this.renderer.update();
     }
 
+    bricks_set() {
+        // with bricks (see ipyvolume.serialize._cube_to_bricks), the atlas only has the bricks with visible values, and
+        // the lookup table has the slot of each brick in the atlas (+ 1, 0 when it was not sent) as 16 bit integers
+        const bricks = this.volume.bricks;
+        let lookup = new Uint8Array(2);
+        let width = 1;
+        let height = 1;
+        if (bricks) {
+            lookup = new Uint8Array(bricks.buffer, bricks.byteOffset, bricks.byteLength);
+            width = this.volume.brick_shape[0];
+            height = this.volume.brick_shape[1] * this.volume.brick_shape[2];
+            // the view box spans the whole cube, not the slots in the atlas
+            this.data_shape = this.volume.shape;
+        }
+        // the low byte ends up in the luminance, the high byte in the alpha channel
+        this.texture_bricks = new THREE.DataTexture(lookup, width, height, THREE.LuminanceAlphaFormat,
+                                                    THREE.UnsignedByteType);
+        this.texture_bricks.magFilter = THREE.NearestFilter;
+        this.texture_bricks.minFilter = THREE.NearestFilter;
+        this.texture_bricks.unpackAlignment = 1;
+        this.texture_bricks.needsUpdate = true;
+        this.uniform_bricks.value = [this.texture_bricks];
+        this.uniform_volumes_values.bricked = Boolean(bricks);
+        this.uniform_volumes_values.brick_size = bricks ? this.volume.brick_size : 1;
+        this.uniform_volumes_values.brick_shape = bricks ? this.volume.brick_shape : [1, 1, 1];
+        this.uniform_volumes_values.shape = bricks ? this.volume.shape : [1, 1, 1];
+    }
+
     tf_set() {
         // TODO: remove listeners from previous
         if (this.model.get("tf")) {
@@ -232,7 +288,7 @@ class VolumeView extends widgets.WidgetView {
         const sy = createD3Scale(scales.y).range([0, 1]);
         const sz = createD3Scale(scales.z).range([0, 1]);
 
-        const extent = this.model.get("extent");
+        const extent = this.frame_extent || this.model.get("extent");
 
        // normalized coordinates of the corners of the box
         const x0n = sx(extent[0][0]);
@@ -279,13 +335,64 @@ class VolumeView extends widgets.WidgetView {
     }
 }
 
+function deserialize_volume(volume) {
+    if (!volume || !volume.compression) {
+        return volume;
+    }
+    // we decompress the tiles once, instead of for each view
+    return {...volume, tiles: new DataView(serialize.decompress(volume.tiles, volume.compression)), compression: null};
+}
+
 export
 class VolumeModel extends widgets.WidgetModel {
     static serializers = {
         ...widgets.WidgetModel.serializers,
         tf: { deserialize: widgets.unpack_models },
-        data: { serialize: (x) => x},
+        data: { serialize: (x) => x, deserialize: deserialize_volume},
     };
+    frames: {[index: number]: any} = {};
+
+    initialize(attributes, options) {
+        super.initialize(attributes, options);
+        this.on("msg:custom", this.custom_msg, this);
+        this.on("change:data", () => { this.frames = {}; });
+        this.on("change:sequence_index change:prefetch", this.sequence_index_changed, this);
+    }
+
+    custom_msg(content, buffers) {
+        if (content.msg === "frame") {
+            widgets.put_buffers(content.volume, content.buffer_paths, buffers);
+            content.volume = deserialize_volume(content.volume);
+            this.frames[content.index] = content;
+            this.evict_frames();
+            if (content.index === Math.round(this.get("sequence_index"))) {
+                this.trigger("frame");
+            }
+        } else if (content.msg === "drop_frames") {
+            // the frames are outdated (e.g. data_min or the view changed), the kernel sends them again
+            this.frames = {};
+        }
+    }
+
+    sequence_index_changed() {
+        this.evict_frames();
+        const index = Math.round(this.get("sequence_index"));
+        if (!this.frames[index]) {
+            // the kernel ignores this if the data is not a time series
+            this.send({event: "frame_request", index}, {});
+        }
+    }
+
+    evict_frames() {
+        // we keep the previous frame, and the frames the kernel sends ahead of time
+        const index = Math.round(this.get("sequence_index"));
+        for (const key of Object.keys(this.frames)) {
+            const frame_index = Number(key);
+            if ((frame_index < index - 1) || (frame_index > index + this.get("prefetch"))) {
+                delete this.frames[frame_index];
+            }
+        }
+    }
     defaults() {
         return {
             ...super.defaults(),
@@ -311,6 +418,7 @@ class VolumeModel extends widgets.WidgetModel {
             data_min: 0,
             data_max: 1,
             ray_steps: null,
+            prefetch: 2,
         };
     }
 }